@@ -42,6 +42,9 @@ IMPLEMENTED R12 WRITING:
 - ATTDEF
 - ATTRIB
 
+IMPLEMENTED R2000 WRITING (minimal, see module r2000.py):
+- LWPOLYLINE
+
 NOT IMPLEMENTED:
 - DIMENSION (use LinearDimension, AngularDimension, ArcDimension or
              RadialDimension)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#coding:utf-8
+# Purpose: POLYLINE entity written straight from coordinate arrays
+# module belongs to package: dxfwrite.py
+# Created: 19.10.2026
+# License: MIT License
+"""
+POLYLINE and LWPOLYLINE entities for large coordinate arrays, without
+per-vertex objects
+"""
+
+import numpy as np
+
+from . import const
+from .base import DXFAtom, tags2str
+from .entities import LWPolyline, Polyline, _Entity
+from .util import to_string
+
+
+class _VertexChunk(object):
+    """ A run of VERTEX entities, formatted only when serialized. """
+
+    def __init__(self, template, coords):
+        self.template = template
+        self.coords = coords
+
+    def __dxf__(self):
+        # one % operation for the whole chunk, floats are formatted like DXFFloat
+        return (self.template * len(self.coords)) % tuple(self.coords.ravel().tolist())
+
+
+class ArrayPolyline(_Entity):
+    """ 3D POLYLINE entity whose vertices are given as coordinate arrays.
+
+    Produces the same POLYLINE/VERTEX/SEQEND group codes as
+    :class:`~dxfwrite.entities.Polyline`, but no Vertex entity is created:
+    the vertices are formatted CHUNK_SIZE at a time while the drawing is
+    written, so memory use does not grow with the vertex count.
+    """
+    DXF_ENTITY_NAME = 'POLYLINE'
+    DXF_ATTRIBUTES = Polyline.DXF_ATTRIBUTES
+    CHUNK_SIZE = 10000
+
+    def __init__(self, x, y, z=None, **kwargs):
+        """ ArrayPolyline constructor.
+
+        :param x: sequence of x-coordinates
+        :param y: sequence of y-coordinates
+        :param z: sequence of z-coordinates, z-value is 0 if None
+        """
+        default = {
+            'vertices_follow': 1,
+            'polyline_elevation': (0, 0, 0),
+            'flags': const.POLYLINE_3D_POLYLINE,
+        }
+        default.update(kwargs)
+        super(ArrayPolyline, self).__init__(**default)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        z = np.zeros(len(x)) if z is None else np.asarray(z, dtype=float)
+        self.coords = np.column_stack((x, y, z))
+
+    def _vertex_template(self):
+        layer = to_string(self['layer']).replace('%', '%%')
+        return "  0\nVERTEX\n  8\n%s\n 10\n%%r\n 20\n%%r\n 30\n%%r\n" % layer
+
+    def __dxf__(self):
+        return tags2str(self)
+
+    def __dxftags__(self):
+        # a generator: vertex chunks are created while the tags are written
+        template = self._vertex_template()
+        yield DXFAtom(self.DXF_ENTITY_NAME)
+        for atom in self.get_attribs():
+            yield atom
+        for start in range(0, len(self.coords), self.CHUNK_SIZE):
+            yield _VertexChunk(template, self.coords[start:start + self.CHUNK_SIZE])
+        yield DXFAtom('SEQEND')
+
+
+class ArrayLWPolyline(LWPolyline):
+    """ LWPOLYLINE entity whose vertices are given as coordinate arrays.
+
+    Vertices are formatted CHUNK_SIZE at a time while the drawing is written,
+    like :class:`ArrayPolyline`. Requires a DXF R2000 drawing.
+    """
+    CHUNK_SIZE = 10000
+    VERTEX_TEMPLATE = " 10\n%r\n 20\n%r\n"
+
+    def __init__(self, x, y, **kwargs):
+        """ ArrayLWPolyline constructor.
+
+        :param x: sequence of x-coordinates
+        :param y: sequence of y-coordinates
+        """
+        super(ArrayLWPolyline, self).__init__(**kwargs)
+        self.coords = np.column_stack((np.asarray(x, dtype=float), np.asarray(y, dtype=float)))
+
+    def vertex_count(self):
+        return len(self.coords)
+
+    def get_vertex_tags(self):
+        return _VertexChunks(self.VERTEX_TEMPLATE, self.coords, self.CHUNK_SIZE)
+
+
+class _VertexChunks(object):
+    """ Yields the vertices as _VertexChunk objects while the tags are written. """
+
+    def __init__(self, template, coords, chunk_size):
+        self.template = template
+        self.coords = coords
+        self.chunk_size = chunk_size
+
+    def __dxftags__(self):
+        for start in range(0, len(self.coords), self.chunk_size):
+            yield _VertexChunk(self.template, self.coords[start:start + self.chunk_size])
@@ -27,13 +27,24 @@ def dxfstr(obj):
     return obj.__dxf__()
 
 
+# writetags() collects the formatted tags until this count of characters
+# is reached and writes them by one fileobj.write() call.
+WRITE_CHUNK_SIZE = 1 << 16
+
+
 def iterdxftags(dxfobj):
-    if hasattr(dxfobj, '__dxftags__'):
-        for tag in dxfobj.__dxftags__():
-            for subtag in iterdxftags(tag):
-                    yield subtag
-    else:
-        yield dxfobj
+    """ Iterates over all dxf tags of `dxfobj`, the tag tree is flattened with
+    an explicit stack of iterators, without recursive generator chains.
+    """
+    stack = [iter((dxfobj, ))]
+    while stack:
+        for tag in stack[-1]:
+            if hasattr(tag, '__dxftags__'):
+                stack.append(iter(tag.__dxftags__()))
+                break
+            yield tag
+        else:
+            stack.pop()
 
 
 def tags2str(dxfobj):
@@ -48,14 +59,28 @@ def tags2str(dxfobj):
     return "".join( (tag.__dxf__() for tag in iterdxftags(dxfobj)) )
 
 
-def writetags(fileobj, dxfobj, encoding=None):        
+def writetags(fileobj, dxfobj, encoding=None):
+    """ Write all dxf tags of `dxfobj` to `fileobj`, the tags are formatted
+    into a buffer, which is written in chunks of WRITE_CHUNK_SIZE characters.
+    """
     if PYTHON3 or (encoding is None):
-        write = lambda tag: fileobj.write(tag)
+        write = fileobj.write
     else:
-        write = lambda tag: fileobj.write(tag.encode(encoding))
-        
+        write = lambda chunk: fileobj.write(chunk.encode(encoding))
+
+    buffer = []
+    append = buffer.append
+    size = 0
     for dxftag in iterdxftags(dxfobj):
-        write(dxftag.__dxf__())
+        tagstr = dxftag.__dxf__()
+        append(tagstr)
+        size += len(tagstr)
+        if size >= WRITE_CHUNK_SIZE:
+            write("".join(buffer))
+            del buffer[:]
+            size = 0
+    if buffer:
+        write("".join(buffer))
 
 
 class DXFValidationError(Exception):
@@ -142,6 +167,7 @@ class _DXFType(object):
 
 class DXFAtom(object):
     """ The basic dxf object """
+    __slots__ = ('_group_code', '_value')
     _dxftype = _DXFType()
 
     def __init__(self, value, group_code=0):
@@ -194,6 +220,8 @@ class DXFAtom(object):
 
 class DXFList(list):
     """ Collection of DXFAtoms. """
+    __slots__ = ()
+
     def __dxf__(self):
         """ Returns a valid DXF String. """
         return "".join((atom.__dxf__() for atom in self))
@@ -219,52 +247,97 @@ class DXFList(list):
         return False
 
 
+def _group_codes(type_str):
+    return frozenset(code for code, typestr in DXFAtom._dxftype._group_code_types.items()
+                     if typestr == type_str)
+
+# group codes, which need no typecast for values of the matching Python type
+_STRING_CODES = _group_codes('string')
+_FLOAT_CODES = _group_codes('float')
+_INT_CODES = _group_codes('int')
+
+
 class DXFString(DXFAtom):
     """ String with group code 1 """
+    __slots__ = ()
+
     def __init__(self, value, group_code=1):
-        super(DXFString, self).__init__(to_string(value), group_code)
+        value = to_string(value)
+        if group_code in _STRING_CODES:
+            self._group_code = group_code
+            self._value = value
+        else:
+            super(DXFString, self).__init__(value, group_code)
 
 
-class DXFName(DXFAtom):
+class DXFName(DXFString):
     """ String with group code 2 """
+    __slots__ = ()
+
     def __init__(self, value, group_code=2):
-        super(DXFName, self).__init__(to_string(value), group_code)
+        super(DXFName, self).__init__(value, group_code)
 
 
 class DXFFloat(DXFAtom):
     """ float with group code 40 """
+    __slots__ = ()
+
     def __init__(self, value, group_code=40):
-        super(DXFFloat, self).__init__(float(value), group_code)
+        value = float(value)
+        if group_code in _FLOAT_CODES:
+            self._group_code = group_code
+            self._value = value
+        else:
+            super(DXFFloat, self).__init__(value, group_code)
 
 
-class DXFAngle(DXFAtom):
+class DXFAngle(DXFFloat):
     """ float with group code 50, angle in degrees """
+    __slots__ = ()
+
     def __init__(self, value, group_code=50):
-        super(DXFAngle, self).__init__(float(value), group_code)
+        super(DXFAngle, self).__init__(value, group_code)
 
 
 class DXFInt(DXFAtom):
     """ 16 bit integer with group code 70 """
+    __slots__ = ()
+
     def __init__(self, value, group_code=70):
-        super(DXFInt, self).__init__(int(value), group_code)
+        value = int(value)
+        if group_code in _INT_CODES:
+            self._group_code = group_code
+            self._value = value
+        else:
+            super(DXFInt, self).__init__(value, group_code)
 
 
 class DXFBool(DXFAtom):
     """ Integer 0 or 1 """
+    __slots__ = ()
+
     def __init__(self, value=1, group_code=290):
         super(DXFBool, self).__init__(int(value), group_code)
 
 
 class DXFPoint(object):
-    """ 3D point with 3 float coordinates """
+    """ 3D point with 2 or 3 float coordinates, stored as tuple, the DXF tags
+    are created at output.
+    """
+    __slots__ = ('_coords', '_index_shift')
+
     def __init__(self, coords=(0., 0., 0.), index_shift=0):
         if len(coords) in (2, 3) :
-            # just use a normal list not DXFList, because point has public access
-            # and can be set as tuple or list too, so always expect a tuple or list
-            self.point = [DXFFloat(value, (pos+1)*10+index_shift) for pos, value in enumerate(coords)]
+            self._coords = tuple(float(value) for value in coords)
+            self._index_shift = int(index_shift)
         else:
             raise ValueError("only 2 or 3 coord-values allowed.")
 
+    @property
+    def point(self):
+        """ Coordinates as list of DXFFloat atoms. """
+        return [DXFFloat(value, (pos+1)*10+self._index_shift) for pos, value in enumerate(self._coords)]
+
     def __getitem__(self, axis):
         """ Get coordinate for 'axis'.
 
@@ -275,14 +348,14 @@ class DXFPoint(object):
         """
         if axis in (0, 1, 2):
             try:
-                return self.point[axis].value
+                return self._coords[axis]
             except IndexError:
                 raise IndexError("DXF-Point has no '%s'-coordinate!" % ('x', 'y', 'z')[axis])
         elif is_string(axis):
             if axis in ('x', 'y', 'z'):
                 try:
                     index = ord(axis) - ord('x')
-                    return self.point[index].value
+                    return self._coords[index]
                 except IndexError:
                     raise IndexError("DXF-Point has no '%s'-coordinate!" % axis)
             elif len(axis) > 1:  # 'xy' or 'zx' get coords in letter order
@@ -293,36 +366,45 @@ class DXFPoint(object):
             raise IndexError("Invalid axis name '%s'" % axis)
 
     def __dxf__(self):
-        return "".join([coord.__dxf__() for coord in self.point])
+        return self._coords2str(self._coords)
+
+    def _coords2str(self, coords):
+        index_shift = self._index_shift
+        return "".join(["%3d\n%s\n" % ((pos+1)*10+index_shift, str(value))
+                        for pos, value in enumerate(coords)])
 
     def get_index_shift(self):
-        return self.point[0].group_code - 10
+        return self._index_shift
 
     def shift_group_code(self, index_shift):
         """ get DXFPoint with shifted group code """
-        return DXFPoint(self["xyz"[:len(self.point)]], index_shift)
+        return DXFPoint(self._coords, index_shift)
 
     def to_3D(self, zvalue=0.):
         """ add z-axis if absent """
-        if len(self.point) < 3:
-            self.point.append(DXFFloat(zvalue, self.get_index_shift()+30))
+        if len(self._coords) < 3:
+            self._coords += (float(zvalue), )
 
     @property
     def tuple(self):
         # CAUTION: do not override the 'value' attribute!!!
         # 'value' would be the suitable name for this property, but that causes
         # several serious problems.
-        return tuple(self['xyz'[:len(self.point)]])
+        return self._coords
 
 
 class DXFPoint2D(DXFPoint):
     """ only output x and y axis! """
+    __slots__ = ()
+
     def __dxf__(self):
-        return "".join([coord.__dxf__() for coord in self.point[:2]])
+        return self._coords2str(self._coords[:2])
 
 
 class DXFPoint3D(DXFPoint):
     """ An assurd 3D point """
+    __slots__ = ()
+
     def __init__(self, coords=(0., 0., 0.), index_shift=0):
         if len(coords) == 2:
             coords = (coords[0], coords[1], 0.)
@@ -133,6 +133,15 @@ POLYLINE_MESH_CLOSED_N_DIRECTION = 32
 POLYLINE_POLYFACE = 64
 POLYLINE_GENERATE_LINETYPE_PATTERN =128
 
+# Entity: LWPolyline (DXF R2000)
+# 70 flags
+LWPOLYLINE_CLOSED = 1
+LWPOLYLINE_PLINEGEN = 128
+
+# DXF versions, header var $ACADVER
+DXF12 = 'AC1009'
+DXF2000 = 'AC1015'
+
 # Entity: Polymesh
 # 75 surface smooth type
 POLYMESH_NO_SMOOTH = 0
@@ -9,12 +9,14 @@
 __author__ = "mozman <mozman@gmx.at>"
 
 import os
+import gzip
 
 from . import DXFEngine
 from .base import *
 from .sections import create_section
 from . import const
 from . import std
+from . import r2000
 
 
 class Drawing(object):
@@ -24,13 +26,19 @@ class Drawing(object):
     
     """
     ENCODING = 'cp1252'
+    GZIP_COMPRESSLEVEL = 6
 
-    def __init__(self, name='noname.dxf'):
+    def __init__(self, name='noname.dxf', dxfversion=const.DXF12):
         """ Drawing constructor.
 
         :param str name: filename of drawing
+        :param str dxfversion: const.DXF12 or const.DXF2000, a R2000 drawing
+            supports only R2000 entities like LWPolyline, see module r2000.py
         """
+        if dxfversion not in (const.DXF12, const.DXF2000):
+            raise ValueError("unsupported DXF version '%s'" % str(dxfversion))
         self.filename = name
+        self.dxfversion = dxfversion
         self.header = create_section('HEADER')
         self.tables = create_section('TABLES')
         self.blocks = create_section('BLOCKS')
@@ -70,6 +78,8 @@ class Drawing(object):
         return tags2str(self)
 
     def __dxftags__(self):
+        if self.dxfversion == const.DXF2000:
+            return r2000.drawing_tags(self)
         dxftags = DXFList()
         dxftags.append(self.header.__dxftags__())
         dxftags.append(self.tables.__dxftags__())
@@ -113,7 +123,7 @@ class Drawing(object):
         return blockname
 
     def default_settings(self):
-        self.header['$ACADVER'] = 'AC1009'
+        self.header['$ACADVER'] = self.dxfversion
         self.header['$INSBASE'] = (0, 0, 0)
         self.header['$EXTMIN'] = (0, 0, 0)
         self.header['$EXTMAX'] = (100, 100, 0)
@@ -141,17 +151,26 @@ class Drawing(object):
         # Setup paper space, but I don't know the meaning of this VIEWPORT
         # entity, also the dimensions of this viewport seems not really
         # important, except status=1 and id=1.
-        self.paperspace.add(DXFEngine.viewport((0, 0), 1, 1, status=1, id=1))
+        if self.dxfversion == const.DXF12:
+            self.paperspace.add(DXFEngine.viewport((0, 0), 1, 1, status=1, id=1))
 
     def save(self):
-        """ Write DXF data to file-system (Drawing.filename).
+        """ Write DXF data to file-system (Drawing.filename), a filename
+        ending with '.gz' creates a gzip-compressed DXF file.
         """
+        compressed = self.filename.lower().endswith('.gz')
         if PYTHON3:
-            fileobj = open(self.filename, 'w', encoding=self.ENCODING, errors="replace")
+            if compressed:
+                fileobj = gzip.open(self.filename, 'wt', self.GZIP_COMPRESSLEVEL,
+                                    encoding=self.ENCODING, errors="replace")
+            else:
+                fileobj = open(self.filename, 'w', encoding=self.ENCODING, errors="replace")
         else:
-            fileobj = open(self.filename, 'w')
-        self.save_to_fileobj(fileobj)
-        fileobj.close()
+            fileobj = gzip.open(self.filename, 'wb', self.GZIP_COMPRESSLEVEL) if compressed else open(self.filename, 'w')
+        try:
+            self.save_to_fileobj(fileobj)
+        finally:
+            fileobj.close()
 
     def save_to_fileobj(self, fileobj):
         """ Write DXF data to a file-like object. (i.e. StringIO)
@@ -11,14 +11,16 @@
 
 __author__ = "mozman <mozman@gmx.at>"
 
+from . import const
 from .entities import Line, Point, Solid, Face3D, Text, Arc, Circle
-from .entities import Trace, Polyline, Polymesh, Polyface
+from .entities import Trace, Polyline, Polymesh, Polyface, LWPolyline
 from .entities import Insert, Block, Attdef, Attrib, Shape, Viewport
 from .mtext import MText
 from .insert2 import Insert2
 from .rect import Rectangle
 from .table import Table
 from .curves import Ellipse, Spline, Bezier, Clothoid
+from .arraypolyline import ArrayPolyline, ArrayLWPolyline
 
 from .tableentries import Linetype, Style, Layer
 from .tableentries import View, VPort, UCS, AppID
@@ -33,16 +35,19 @@ class DXFEngine(object):
     """
 
     @staticmethod
-    def drawing(name='empty.dxf'):
+    def drawing(name='empty.dxf', dxfversion=const.DXF12):
         """ Create a new drawing.
 
         The drawing-object contains all the sections, tables and entities, which
         are necessary for a valid dxf-drawing.
 
+        :param str dxfversion: const.DXF12 (default) or const.DXF2000, R2000
+            drawings support only R2000 entities like :meth:`lwpolyline`
+
         For drawing methods see :class:`~dxfwrite.drawing.Drawing` class.
         """
         from .drawing import Drawing
-        return Drawing(name)
+        return Drawing(name, dxfversion)
 
 #--- Table Entries
     @staticmethod
@@ -394,6 +399,42 @@ class DXFEngine(object):
             points = []
         return Polyline(points, **kwargs)
 
+    @staticmethod
+    def array_polyline(x, y, z=None, **kwargs):
+        """ Create a new 3D polyline entity from coordinate arrays.
+
+        Same output as :meth:`polyline`, but the vertices are formatted
+        in chunks straight from the arrays, without any per-vertex object.
+
+        :param x: sequence of x-coordinates
+        :param y: sequence of y-coordinates
+        :param z: sequence of z-coordinates, z-value is 0 if None
+
+        """
+        return ArrayPolyline(x, y, z, **kwargs)
+
+    @staticmethod
+    def lwpolyline(points=None, **kwargs):
+        """ Create a new lightweight 2D polyline entity, requires a DXF R2000
+        drawing.
+
+        :param points: list of (x, y) points
+        :param int flags: bit-coded, const.LWPOLYLINE_CLOSED, default=0
+        :param float const_width: constant width
+        :param float elevation: z-value of all vertices
+        """
+        return LWPolyline(points, **kwargs)
+
+    @staticmethod
+    def array_lwpolyline(x, y, **kwargs):
+        """ Create a new lightweight 2D polyline entity from coordinate
+        arrays, requires a DXF R2000 drawing.
+
+        :param x: sequence of x-coordinates
+        :param y: sequence of y-coordinates
+        """
+        return ArrayLWPolyline(x, y, **kwargs)
+
     @staticmethod
     def polymesh(nrows, ncols, **kwargs):
         """ Create a new polymesh entity.
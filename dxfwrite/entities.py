@@ -180,6 +180,21 @@ def _add_common_attribs(attribute_definition):
 
 _add_common_attribs(_DXF12_ENTITY_ATTRIBUTE_DEFINITION)
 
+# DXF R2000 entities: attribs with priority < 100 belong to the AcDbEntity
+# subclass, the others to the entity specific subclass.
+_DXF2000_ENTITY_ATTRIBUTE_DEFINITION = {
+    'LWPOLYLINE': {
+        'paper_space': AttribDef(DXFInt, 67, priority=10),
+        'layer': AttribDef(DXFString, 8, priority=20),
+        'linetype': AttribDef(DXFString, 6, priority=30),
+        'color': AttribDef(DXFInt, 62, priority=40),
+        'flags': AttribDef(DXFInt, 70, priority=110),
+        'const_width': AttribDef(DXFFloat, 43, priority=115),
+        'elevation': AttribDef(DXFFloat, 38, priority=120),
+        'thickness': AttribDef(DXFFloat, 39, priority=125),
+    },
+}
+
 
 class _Entity(object):
     DXF_ENTITY_NAME = 'ABSTRACT'
@@ -649,6 +664,61 @@ class Polyline(_Entity):
         return self.vertices
 
 
+class LWPolyline(_Entity):
+    """ LWPOLYLINE entity, a lightweight 2D polyline with all vertices stored
+    in the entity itself. Requires a DXF R2000 drawing, see
+    :meth:`~dxfwrite.engine.DXFEngine.drawing`.
+    """
+    DXF_ENTITY_NAME = 'LWPOLYLINE'
+    DXF_SUBCLASS = 'AcDbPolyline'
+    DXF_ATTRIBUTES = _DXF2000_ENTITY_ATTRIBUTE_DEFINITION['LWPOLYLINE']
+
+    def __init__(self, points=None, **kwargs):
+        """ LWPolyline constructor.
+
+        :param points: list of (x, y) points, a z-value is ignored, use the
+            elevation attribute.
+        """
+        default = {
+            'flags': 0,
+        }
+        default.update(kwargs)
+        super(LWPolyline, self).__init__(**default)
+        self.points = [(point[0], point[1]) for point in points or []]
+
+    def close(self, status=True):
+        """ Close LWPolyline: first vertex is connected with last vertex.
+
+        :param bool status: True for closed polyline; False for open polyline.
+        """
+        self['flags'] = set_flag(self['flags'], const.LWPOLYLINE_CLOSED, status)
+
+    def vertex_count(self):
+        return len(self.points)
+
+    def get_vertex_tags(self):
+        return DXFList(DXFPoint2D(point) for point in self.points)
+
+    def __dxftags__(self):
+        raise DXFValidationError("LWPOLYLINE requires a DXF R2000 drawing.")
+
+    def r2000_tags(self, handle, owner):
+        """ DXF R2000 tags of the entity, see module r2000.py """
+        attribs = sorted(self.attribs.items(), key=lambda item: self._priority(item[0]))
+        dxftags = DXFList((
+            DXFAtom(self.DXF_ENTITY_NAME),
+            DXFAtom(handle, 5),
+            DXFAtom(owner, 330),
+            DXFAtom('AcDbEntity', 100),
+        ))
+        dxftags.extend(value for key, value in attribs if self._priority(key) < 100)
+        dxftags.append(DXFAtom(self.DXF_SUBCLASS, 100))
+        dxftags.append(DXFInt(self.vertex_count(), 90))
+        dxftags.extend(value for key, value in attribs if self._priority(key) >= 100)
+        dxftags.append(self.get_vertex_tags())
+        return dxftags
+
+
 class Polymesh(_Entity):
     """ Special case of POLYLINE, creates a m(rows) x n(cols) Polymesh, each
     column has m vertices and each row has n vertices. All mesh indices are
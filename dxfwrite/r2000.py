@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+#coding:utf-8
+# Purpose: DXF R2000 drawing structure
+# module belongs to package: dxfwrite.py
+# Created: 19.10.2026
+# License: MIT License
+"""
+Minimal DXF R2000 (AC1015) output for a Drawing.
+
+R2000 requires handles, owner handles and subclass markers for every table
+entry, entity and object, the BLOCK_RECORD table, the *Model_Space and
+*Paper_Space blocks and an OBJECTS section with the root dictionary. The
+table entries of the drawing are written with this additional structure,
+but only entities providing r2000_tags(handle, owner), like LWPolyline, are
+supported in the ENTITIES section; BLOCK definitions are not supported.
+"""
+
+from . import const
+from .base import DXFAtom, DXFList, DXFName, DXFString, DXFInt, DXFFloat, \
+    DXFValidationError, iterdxftags
+from .util import int2hex
+
+MODEL_SPACE = '*Model_Space'
+PAPER_SPACE = '*Paper_Space'
+
+# symbol table name -> subclass marker of its records
+_RECORD_SUBCLASS = {
+    'VPORT': 'AcDbViewportTableRecord',
+    'LTYPE': 'AcDbLinetypeTableRecord',
+    'LAYER': 'AcDbLayerTableRecord',
+    'STYLE': 'AcDbTextStyleTableRecord',
+    'VIEW': 'AcDbViewTableRecord',
+    'UCS': 'AcDbUCSTableRecord',
+    'APPID': 'AcDbRegAppTableRecord',
+    'DIMSTYLE': 'AcDbDimStyleTableRecord',
+    'BLOCK_RECORD': 'AcDbBlockTableRecord',
+}
+
+
+class _HandleSeed(object):
+    """ Allocates the entity handles of a drawing. """
+
+    def __init__(self, seed=0x10):
+        self.seed = seed
+
+    def new(self):
+        self.seed += 1
+        return int2hex(self.seed)
+
+
+def drawing_tags(drawing):
+    """ Returns the DXF R2000 tags of `drawing` as DXFList. """
+    if drawing.blocks.blocks:
+        raise DXFValidationError("BLOCK definitions are not supported in DXF R2000 drawings.")
+    handles = _HandleSeed()
+    block_records = {
+        MODEL_SPACE: handles.new(),
+        PAPER_SPACE: handles.new(),
+    }
+    tables = _tables_section(drawing, handles, block_records)
+    blocks = _blocks_section(handles, block_records)
+    entities = _entities_section(drawing, handles, block_records)
+    objects = _objects_section(handles)
+    # all handles are allocated, the next one is the $HANDSEED
+    header = _header_section(drawing, handles.new())
+    return DXFList((
+        header,
+        _section('CLASSES', []),
+        tables,
+        blocks,
+        entities,
+        objects,
+        DXFAtom('EOF'),
+    ))
+
+
+def _section(name, body):
+    return DXFList((
+        DXFAtom('SECTION'),
+        DXFName(name),
+        DXFList(body),
+        DXFAtom('ENDSEC'),
+    ))
+
+
+def _header_section(drawing, handseed):
+    body = [
+        DXFList((DXFAtom('$ACADVER', 9), DXFString(const.DXF2000))),
+        DXFList((DXFAtom('$HANDSEED', 9), DXFAtom(handseed, 5))),
+    ]
+    for key, value in drawing.header.variables.items():
+        if key not in ('$ACADVER', '$HANDSEED'):
+            body.append(DXFList((DXFAtom(key, 9), value)))
+    return _section('HEADER', body)
+
+
+def _table(handles, name, records, handle_code=5):
+    """ Create a symbol table, `records` is a list of (handle, atoms) tuples. """
+    table_handle = handles.new()
+    dxftags = DXFList((
+        DXFAtom('TABLE'),
+        DXFName(name),
+        DXFAtom(table_handle, 5),
+        DXFAtom('0', 330),
+        DXFAtom('AcDbSymbolTable', 100),
+        DXFInt(len(records)),
+    ))
+    if name == 'DIMSTYLE':
+        dxftags.append(DXFAtom('AcDbDimStyleTable', 100))
+    for handle, atoms in records:
+        dxftags.append(DXFAtom(name))
+        dxftags.append(DXFAtom(handle, handle_code))
+        dxftags.append(DXFAtom(table_handle, 330))
+        dxftags.append(DXFAtom('AcDbSymbolTableRecord', 100))
+        dxftags.append(DXFAtom(_RECORD_SUBCLASS[name], 100))
+        dxftags.extend(atoms)
+    dxftags.append(DXFAtom('ENDTAB'))
+    return dxftags
+
+
+def _entry_records(handles, table, required=None):
+    """ Table entries of the drawing as records, the `required` entries
+    (list of (name, atoms) tuples) are added if the drawing lacks them.
+    """
+    records = []
+    names = set()
+    for entry in table._get_values():
+        names.add(entry['name'].upper())
+        records.append((handles.new(), list(iterdxftags(DXFList(entry.get_attribs())))))
+    for name, atoms in required or []:
+        if name.upper() not in names:
+            records.insert(0, (handles.new(), atoms))
+    return records
+
+
+def _linetype_atoms(name, pattern=None, description=""):
+    atoms = [DXFString(name, 2), DXFInt(0, 70), DXFString(description, 3)]
+    atoms.extend(pattern or (DXFInt(65, 72), DXFInt(0, 73), DXFFloat(0.)))
+    return atoms
+
+
+def _with_shape_flags(atoms):
+    """ R2000 requires the complex linetype flags (74) after each dash length (49). """
+    result = []
+    for atom in atoms:
+        result.append(atom)
+        if atom.group_code == 49:
+            result.append(DXFInt(0, 74))
+    return result
+
+
+def _tables_section(drawing, handles, block_records):
+    tables = drawing.tables
+    linetypes = [(handle, _with_shape_flags(atoms)) for handle, atoms in
+                 _entry_records(handles, tables.linetypes, [
+                     ('Continuous', _linetype_atoms('Continuous', description='Solid line')),
+                     ('ByLayer', _linetype_atoms('ByLayer')),
+                     ('ByBlock', _linetype_atoms('ByBlock')),
+                 ])]
+    layers = _entry_records(handles, tables.layers, [
+        ('0', [DXFString('0', 2), DXFInt(0, 70), DXFInt(7, 62), DXFString('Continuous', 6)]),
+    ])
+    styles = _entry_records(handles, tables.styles, [
+        ('Standard', [DXFString('Standard', 2), DXFInt(0, 70), DXFFloat(0., 40),
+                      DXFFloat(1., 41), DXFFloat(0., 50), DXFInt(0, 71),
+                      DXFFloat(2.5, 42), DXFString('txt', 3), DXFString('', 4)]),
+    ])
+    appids = _entry_records(handles, tables.appids, [
+        ('ACAD', [DXFString('ACAD', 2), DXFInt(0, 70)]),
+    ])
+    dimstyles = [(handles.new(), [DXFString('Standard', 2), DXFInt(0, 70)])]
+    block_record_entries = [
+        (block_records[name], [DXFString(name, 2)])
+        for name in (MODEL_SPACE, PAPER_SPACE)
+    ]
+    return _section('TABLES', [
+        _table(handles, 'VPORT', _entry_records(handles, tables.viewports)),
+        _table(handles, 'LTYPE', linetypes),
+        _table(handles, 'LAYER', layers),
+        _table(handles, 'STYLE', styles),
+        _table(handles, 'VIEW', _entry_records(handles, tables.views)),
+        _table(handles, 'UCS', _entry_records(handles, tables.ucs)),
+        _table(handles, 'APPID', appids),
+        _table(handles, 'DIMSTYLE', dimstyles, handle_code=105),
+        _table(handles, 'BLOCK_RECORD', block_record_entries),
+    ])
+
+
+def _blocks_section(handles, block_records):
+    body = []
+    for name in (MODEL_SPACE, PAPER_SPACE):
+        owner = block_records[name]
+        space = [DXFInt(1, 67)] if name == PAPER_SPACE else []
+        body.append(DXFList([
+            DXFAtom('BLOCK'),
+            DXFAtom(handles.new(), 5),
+            DXFAtom(owner, 330),
+            DXFAtom('AcDbEntity', 100),
+        ] + space + [
+            DXFString('0', 8),
+            DXFAtom('AcDbBlockBegin', 100),
+            DXFName(name),
+            DXFInt(0, 70),
+            DXFFloat(0., 10), DXFFloat(0., 20), DXFFloat(0., 30),
+            DXFString(name, 3),
+            DXFString('', 1),
+        ]))
+        body.append(DXFList([
+            DXFAtom('ENDBLK'),
+            DXFAtom(handles.new(), 5),
+            DXFAtom(owner, 330),
+            DXFAtom('AcDbEntity', 100),
+        ] + space + [
+            DXFString('0', 8),
+            DXFAtom('AcDbBlockEnd', 100),
+        ]))
+    return _section('BLOCKS', body)
+
+
+def _entities_section(drawing, handles, block_records):
+    body = []
+    for entity in drawing.entities.entities:
+        if not hasattr(entity, 'r2000_tags'):
+            raise DXFValidationError("Entity '%s' is not supported in DXF R2000 drawings."
+                                     % entity.__class__.__name__)
+        paper_space = entity.attribs.get('paper_space')
+        owner = block_records[PAPER_SPACE if paper_space is not None and paper_space.value == 1 else MODEL_SPACE]
+        body.append(entity.r2000_tags(handles.new(), owner))
+    return _section('ENTITIES', body)
+
+
+def _objects_section(handles):
+    root_dict = handles.new()
+    group_dict = handles.new()
+    return _section('OBJECTS', [
+        DXFAtom('DICTIONARY'),
+        DXFAtom(root_dict, 5),
+        DXFAtom('0', 330),
+        DXFAtom('AcDbDictionary', 100),
+        DXFInt(1, 281),
+        DXFString('ACAD_GROUP', 3),
+        DXFAtom(group_dict, 350),
+        DXFAtom('DICTIONARY'),
+        DXFAtom(group_dict, 5),
+        DXFAtom(root_dict, 330),
+        DXFAtom('AcDbDictionary', 100),
+        DXFInt(1, 281),
+    ])
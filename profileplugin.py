@@ -27,18 +27,17 @@
 from contextlib import suppress
 from os import path
 
-from qgis.core import QgsSettings
+from qgis.core import QgsApplication, QgsSettings
 from qgis.PyQt.QtCore import QCoreApplication, QTranslator
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction
 
-from .tools.profiletool_core import ProfileToolCore
-
 
 class ProfilePlugin:
     def __init__(self, iface):
         self.iface = iface
-        self.canvas = iface.mapCanvas()
+        # no iface (nor canvas) when loaded by qgis_process
+        self.canvas = iface.mapCanvas() if iface else None
 
         # translation
         # initialize plugin directory
@@ -54,9 +53,19 @@ class ProfilePlugin:
 
         self.profiletool = None
         self.dockOpened = False  # remember for not reopening dock if there's already one opened
-        self.canvas.mapToolSet.connect(self.mapToolChanged)
+        self.provider = None
+        if self.canvas:
+            self.canvas.mapToolSet.connect(self.mapToolChanged)
+
+    def initProcessing(self):
+        # imported here, the algorithms are only needed by Processing
+        from .tools.processingprovider import ProfileToolProvider
+
+        self.provider = ProfileToolProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
 
     def initGui(self):
+        self.initProcessing()
         # create action
         self.action = QAction(
             QIcon(path.join(self.plugin_dir, "icons/profileIcon.png")),
@@ -73,6 +82,9 @@ class ProfilePlugin:
         self.iface.addPluginToMenu("&Profile Tool", self.aboutAction)
 
     def unload(self):
+        if self.provider:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
         with suppress(AttributeError, RuntimeError, TypeError):
             self.profiletool.dockwidget.close()
             self.canvas.mapToolSet.disconnect(self.mapToolChanged)
@@ -87,6 +99,9 @@ class ProfilePlugin:
     def run(self):
 
         if not self.dockOpened:
+            # imported on first use, it loads pyqtgraph and the plot libraries
+            from .tools.profiletool_core import ProfileToolCore
+
             # if self.profiletool is None:
             self.profiletool = ProfileToolCore(self.iface, self)
             self.iface.addDockWidget(
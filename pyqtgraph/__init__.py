@@ -199,94 +199,129 @@ path = os.path.split(__file__)[0]
 ## Attempts to work around exit crashes:
 import atexit
 
+# Plotting core, imported eagerly: PlotWidget and the items it is built of.
 from .colormap import *
 from .functions import *
-from .graphicsItems.ArrowItem import *
 from .graphicsItems.AxisItem import *
-from .graphicsItems.BarGraphItem import *
 from .graphicsItems.ButtonItem import *
-from .graphicsItems.ColorBarItem import *
-from .graphicsItems.CurvePoint import *
-from .graphicsItems.DateAxisItem import *
 from .graphicsItems.ErrorBarItem import *
-from .graphicsItems.FillBetweenItem import *
-from .graphicsItems.GradientEditorItem import *
-from .graphicsItems.GradientLegend import *
 from .graphicsItems.GraphicsItem import *
-from .graphicsItems.GraphicsLayout import *
 from .graphicsItems.GraphicsObject import *
 from .graphicsItems.GraphicsWidget import *
-from .graphicsItems.GraphicsWidgetAnchor import *
-from .graphicsItems.GraphItem import *
-from .graphicsItems.GridItem import *
-from .graphicsItems.HistogramLUTItem import *
-from .graphicsItems.ImageItem import *
 from .graphicsItems.InfiniteLine import *
-from .graphicsItems.IsocurveItem import *
 from .graphicsItems.ItemGroup import *
 from .graphicsItems.LabelItem import *
 from .graphicsItems.LegendItem import *
-from .graphicsItems.LinearRegionItem import *
-from .graphicsItems.MultiPlotItem import *
-from .graphicsItems.PColorMeshItem import *
 from .graphicsItems.PlotCurveItem import *
 from .graphicsItems.PlotDataItem import *
 from .graphicsItems.PlotItem import *
-from .graphicsItems.ROI import *
-from .graphicsItems.ScaleBar import *
 from .graphicsItems.ScatterPlotItem import *
-from .graphicsItems.TargetItem import *
 from .graphicsItems.TextItem import *
 from .graphicsItems.UIGraphicsItem import *
 from .graphicsItems.ViewBox import *
-from .graphicsItems.VTickGroup import *
-
-# indirect imports used within library
 from .GraphicsScene import GraphicsScene
-from .imageview import *
-
-# indirect imports known to be used outside of the library
-from .metaarray import MetaArray
 from .Point import Point
 from .Qt import isQObjectAlive
-from .SignalProxy import *
 from .SRTTransform import SRTTransform
-from .SRTTransform3D import SRTTransform3D
-from .ThreadsafeTimer import *
-from .Transform3D import Transform3D
-from .util.cupy_helper import getCupy
 from .Vector import Vector
-from .WidgetGroup import *
-from .widgets.BusyCursor import *
-from .widgets.CheckTable import *
-from .widgets.ColorButton import *
-from .widgets.ColorMapMenu import ColorMapMenu
-from .widgets.ColorMapWidget import *
-from .widgets.ComboBox import *
-from .widgets.DataFilterWidget import *
-from .widgets.DataTreeWidget import *
-from .widgets.DiffTreeWidget import *
-from .widgets.FeedbackButton import *
-from .widgets.FileDialog import *
-from .widgets.GradientWidget import *
-from .widgets.GraphicsLayoutWidget import *
 from .widgets.GraphicsView import *
-from .widgets.GroupBox import GroupBox
-from .widgets.HistogramLUTWidget import *
-from .widgets.JoystickButton import *
-from .widgets.LayoutWidget import *
-from .widgets.MultiPlotWidget import *
-from .widgets.PathButton import *
 from .widgets.PlotWidget import *
-from .widgets.ProgressDialog import *
-from .widgets.RawImageWidget import *
-from .widgets.RemoteGraphicsView import RemoteGraphicsView
-from .widgets.ScatterPlotWidget import *
-from .widgets.SpinBox import *
-from .widgets.TableWidget import *
-from .widgets.TreeWidget import *
-from .widgets.ValueLabel import *
-from .widgets.VerticalLabel import *
+
+# The remaining namespace is imported on first access of one of its names,
+# see __getattr__. (module, names); names None imports like "import *".
+_LAZY_IMPORTS = [
+    ('.graphicsItems.ArrowItem', None),
+    ('.graphicsItems.BarGraphItem', None),
+    ('.graphicsItems.ColorBarItem', None),
+    ('.graphicsItems.CurvePoint', None),
+    ('.graphicsItems.DateAxisItem', None),
+    ('.graphicsItems.FillBetweenItem', None),
+    ('.graphicsItems.GradientEditorItem', None),
+    ('.graphicsItems.GradientLegend', None),
+    ('.graphicsItems.GraphicsLayout', None),
+    ('.graphicsItems.GraphicsWidgetAnchor', None),
+    ('.graphicsItems.GraphItem', None),
+    ('.graphicsItems.GridItem', None),
+    ('.graphicsItems.HistogramLUTItem', None),
+    ('.graphicsItems.ImageItem', None),
+    ('.graphicsItems.IsocurveItem', None),
+    ('.graphicsItems.LinearRegionItem', None),
+    ('.graphicsItems.MultiPlotItem', None),
+    ('.graphicsItems.PColorMeshItem', None),
+    ('.graphicsItems.ROI', None),
+    ('.graphicsItems.ScaleBar', None),
+    ('.graphicsItems.TargetItem', None),
+    ('.graphicsItems.VTickGroup', None),
+    ('.imageview', None),
+    ('.metaarray', ['MetaArray']),
+    ('.SignalProxy', None),
+    ('.SRTTransform3D', ['SRTTransform3D']),
+    ('.ThreadsafeTimer', None),
+    ('.Transform3D', ['Transform3D']),
+    ('.util.cupy_helper', ['getCupy']),
+    ('.WidgetGroup', None),
+    ('.widgets.BusyCursor', None),
+    ('.widgets.CheckTable', None),
+    ('.widgets.ColorButton', None),
+    ('.widgets.ColorMapMenu', ['ColorMapMenu']),
+    ('.widgets.ColorMapWidget', None),
+    ('.widgets.ComboBox', None),
+    ('.widgets.DataFilterWidget', None),
+    ('.widgets.DataTreeWidget', None),
+    ('.widgets.DiffTreeWidget', None),
+    ('.widgets.FeedbackButton', None),
+    ('.widgets.FileDialog', None),
+    ('.widgets.GradientWidget', None),
+    ('.widgets.GraphicsLayoutWidget', None),
+    ('.widgets.GroupBox', ['GroupBox']),
+    ('.widgets.HistogramLUTWidget', None),
+    ('.widgets.JoystickButton', None),
+    ('.widgets.LayoutWidget', None),
+    ('.widgets.MultiPlotWidget', None),
+    ('.widgets.PathButton', None),
+    ('.widgets.ProgressDialog', None),
+    ('.widgets.RawImageWidget', None),
+    ('.widgets.RemoteGraphicsView', ['RemoteGraphicsView']),
+    ('.widgets.ScatterPlotWidget', None),
+    ('.widgets.SpinBox', None),
+    ('.widgets.TableWidget', None),
+    ('.widgets.TreeWidget', None),
+    ('.widgets.ValueLabel', None),
+    ('.widgets.VerticalLabel', None),
+]
+_lazyImported = False
+
+def _importNames(modName, names):
+    mod = importlib.import_module(modName, __name__)
+    if names is None:
+        names = getattr(mod, '__all__', [n for n in dir(mod) if not n.startswith('_')])
+    namespace = globals()
+    for name in names:
+        # names of the plotting core are kept, but like "import *" a
+        # class replaces its submodule of the same name (e.g. WidgetGroup)
+        if name not in namespace or isinstance(namespace[name], type(sys)):
+            namespace[name] = getattr(mod, name)
+
+def _importLazy():
+    """Import the names of all modules in _LAZY_IMPORTS into the namespace."""
+    global _lazyImported
+    if _lazyImported:
+        return
+    _lazyImported = True
+    for modName, names in _LAZY_IMPORTS:
+        _importNames(modName, names)
+
+# modules already loaded by the plotting core cost nothing to import
+for _modName, _names in _LAZY_IMPORTS:
+    if __name__ + _modName in sys.modules:
+        _importNames(_modName, _names)
+
+def __getattr__(name):
+    if not name.startswith('__') and not _lazyImported:
+        _importLazy()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 ##############################################################
 ## PyQt and PySide both are prone to crashing on exit.
@@ -402,6 +437,7 @@ def image(*args, **kargs):
     All other arguments are used to show data. (see :func:`ImageView.setImage() <pyqtgraph.ImageView.setImage>`)
     """
     mkQApp()
+    from .imageview import ImageView
     w = ImageView()
     windowTitle = kargs.pop("title", "ImageView")
     w.setWindowTitle(windowTitle)
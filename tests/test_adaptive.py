@@ -0,0 +1,82 @@
+"""Adaptive profiles are read coarse first and refined where the profile
+departs from a straight line more than the vertical tolerance, the ends,
+vertices and missing values of the profile are always kept."""
+
+import importlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("qgis.core")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+dataReaderTool = importlib.import_module(PACKAGE + ".tools.dataReaderTool")
+
+N = 1001
+L = np.arange(N, dtype=float)
+
+
+class Reader:
+    """read() of adaptiveRead, counts the samples read."""
+
+    def __init__(self, z):
+        self.z = z
+        self.count = 0
+
+    def __call__(self, index):
+        self.count += len(index)
+        return [{"z": self.z[index]}]
+
+
+def test_refinement_stops_at_tolerance():
+    # straight lines with a kink at 500
+    z = np.abs(L - 500)
+    keep = dataReaderTool.adaptiveSamples(L, z, 0.01)
+    assert np.flatnonzero(keep).tolist() == [0, 500, 1000]
+    reader = Reader(z)
+    index, values = dataReaderTool.adaptiveRead(L, reader, 0.01)
+    assert 500 in index
+    assert values[0]["z"] == pytest.approx(z[index])
+    # the straight lines are not refined
+    assert reader.count == len(index) < N // 4
+    assert np.interp(L, L[index], values[0]["z"]) == pytest.approx(z)
+
+
+def test_missing_values():
+    z = np.sin(L / 50)
+    z[200:211] = np.nan
+    keep = dataReaderTool.adaptiveSamples(L, z, 1.0)
+    assert keep[199:212].all()
+    index, values = dataReaderTool.adaptiveRead(L, Reader(z), 1.0)
+    # the missing values and their neighbours are read
+    assert set(range(199, 212)) <= set(index.tolist())
+    missing = np.isnan(values[0]["z"])
+    assert index[missing].tolist() == list(range(200, 211))
+
+
+def test_zero_tolerance_is_full_resolution():
+    z = 2 * L
+    z[::3] += 1
+    assert dataReaderTool.adaptiveSamples(L, z, 0).all()
+    reader = Reader(z)
+    index, values = dataReaderTool.adaptiveRead(L, reader, 0)
+    assert index.tolist() == list(range(N))
+    assert values[0]["z"] == pytest.approx(z)
+    assert reader.count == N
+
+
+def test_ends_and_vertices_kept():
+    # a straight line, only the ends and vertices are needed
+    z = 2 * L
+    vertices = [37, 500]
+    keep = dataReaderTool.adaptiveSamples(L, z, 1.0, vertices)
+    assert np.flatnonzero(keep).tolist() == [0, 37, 500, 1000]
+    index, _ = dataReaderTool.adaptiveRead(L, Reader(z), 1.0, vertices)
+    assert {0, 37, 500, 1000} <= set(index.tolist())
+    index, _ = dataReaderTool.adaptiveRead(L[:10], Reader(z[:10]), 1.0, [4], stride=100)
+    # the middles of the intervals are read once to check them
+    assert index.tolist() == [0, 2, 4, 6, 9]
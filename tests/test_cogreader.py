@@ -0,0 +1,180 @@
+"""The COG reader fetches the tiles crossed by a profile in merged range
+requests from a local HTTP server serving a generated COG."""
+
+import http.server
+import importlib
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("qgis.core")
+gdal = pytest.importorskip("osgeo.gdal")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+cogreader = importlib.import_module(os.path.basename(PLUGIN_DIR) + ".tools.cogreader")
+
+SIZE = 1024
+BLOCK = 256
+# geotransform of the COG: 2 m pixels
+X0, Y0, PIXEL = 1000.0, 5000.0, 2.0
+
+
+class RangeHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves files with support of single byte range requests."""
+
+    requests = []
+    ranges = True  # False to ignore the range requests
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._send(head=True)
+
+    def do_GET(self):
+        self._send(head=False)
+
+    def _send(self, head):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        byteRange = self.headers.get("Range")
+        RangeHandler.requests.append(byteRange)
+        if byteRange and self.ranges:
+            start, end = byteRange.split("=")[1].split("-")
+            start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+            body = data[start : end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, end, len(data)))
+        else:
+            body = data
+            self.send_response(200)
+        if self.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+def serve(directory, handlerClass):
+    handler = lambda *args, **kwargs: handlerClass(*args, directory=str(directory), **kwargs)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, "/vsicurl/http://127.0.0.1:%d/dem.tif" % server.server_address[1]
+
+
+@pytest.fixture(scope="module")
+def cogDirectory(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("cog")
+    source = gdal.GetDriverByName("MEM").Create("", SIZE, SIZE, 1, gdal.GDT_Float32)
+    source.SetGeoTransform((X0, PIXEL, 0, Y0, 0, -PIXEL))
+    rows, cols = np.mgrid[0:SIZE, 0:SIZE]
+    source.GetRasterBand(1).WriteArray((rows * SIZE + cols).astype(np.float32))
+    gdal.GetDriverByName("COG").CreateCopy(
+        str(directory / "dem.tif"), source, options=["BLOCKSIZE=%d" % BLOCK, "COMPRESS=DEFLATE"]
+    )
+    return directory
+
+
+@pytest.fixture(scope="module")
+def cogUrl(cogDirectory):
+    server, url = serve(cogDirectory, RangeHandler)
+    yield url
+    server.shutdown()
+
+
+class NoRangeHandler(RangeHandler):
+    """Serves whole files, ignoring the range requests."""
+
+    ranges = False
+
+
+def test_merge_ranges():
+    ranges = [(300, 50), (0, 100), (100, 20), (50, 10)]
+    assert cogreader.mergeRanges(ranges, gap=0) == [(0, 120), (300, 50)]
+    assert cogreader.mergeRanges(ranges, gap=200) == [(0, 350)]
+
+
+def test_profile_values(cogUrl):
+    reader = cogreader.openCog(cogUrl)
+    assert reader is not None
+    # diagonal profile, partly outside the raster
+    x = np.linspace(X0 + 1, X0 + SIZE * PIXEL + 100, 500)
+    y = np.linspace(Y0 - 1, Y0 - SIZE * PIXEL + 300, 500)
+    z = reader.sample([1], x, y)[0]
+    col = np.floor((x - X0) / PIXEL)
+    row = np.floor((Y0 - y) / PIXEL)
+    inside = (col < SIZE) & (row < SIZE)
+    np.testing.assert_array_equal(z[inside], row[inside] * SIZE + col[inside])
+    assert np.isnan(z[~inside]).all()
+
+
+def test_one_request_per_tile_cluster(cogUrl):
+    reader = cogreader.openCog(cogUrl)
+    # horizontal profile crossing the 4 tiles of the first tile row
+    x = np.linspace(X0 + 1, X0 + SIZE * PIXEL - 1, 1000)
+    y = np.full(1000, Y0 - 10)
+    _, _, _, tiles, ranges = reader.plan([1], x, y)
+    assert len(tiles) == SIZE // BLOCK
+    del RangeHandler.requests[:]
+    z = reader.sample([1], x, y)[0]
+    # the header is fetched when the reader is opened, then at most one
+    # request per tile cluster (GDAL may have some bytes cached already), no
+    # request per tile or pixel
+    assert 0 < len(RangeHandler.requests) <= len(ranges)
+    assert len(ranges) < len(tiles)
+    # the decoded tiles are cached, the profile is not fetched again
+    del RangeHandler.requests[:]
+    np.testing.assert_array_equal(reader.sample([1], x, y)[0], z)
+    assert not RangeHandler.requests
+    reader.close()
+
+
+def lastTileRow():
+    # horizontal profile in the last tile row, away from the header
+    x = np.linspace(X0 + 1, X0 + SIZE * PIXEL - 1, 100)
+    y = np.full(100, Y0 - SIZE * PIXEL + 10)
+    col = np.floor((x - X0) / PIXEL)
+    row = np.floor((Y0 - y) / PIXEL)
+    return x, y, row * SIZE + col
+
+
+def test_no_range_support(cogDirectory):
+    server, url = serve(cogDirectory, NoRangeHandler)
+    try:
+        reader = cogreader.openCog(url)
+        # the layer is left to GDAL and the tile cache, when the reader is
+        # opened or when its tiles can not be fetched
+        if reader is not None:
+            x, y, expected = lastTileRow()
+            try:
+                z = reader.sample([1], x, y)[0]
+            except (OSError, RuntimeError):
+                pass
+            else:
+                np.testing.assert_array_equal(z, expected)
+            reader.close()
+    finally:
+        server.shutdown()
+
+
+def test_server_failure(cogDirectory):
+    server, url = serve(cogDirectory, RangeHandler)
+    reader = cogreader.openCog(url)
+    assert reader is not None
+    server.shutdown()
+    server.server_close()
+    x, y, _ = lastTileRow()
+    # the reader raises, DataReaderTool then reads the layer by cached tiles
+    with pytest.raises((OSError, RuntimeError)):
+        reader.sample([1], x, y)
+    reader.close()
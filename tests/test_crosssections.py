@@ -0,0 +1,61 @@
+"""Cross sections are stationed along the polyline, perpendicular to the
+segment of each station, offsets growing from the left to the right."""
+
+import importlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("qgis.core")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+crosssections = importlib.import_module(PACKAGE + ".tools.crosssections")
+
+
+def test_stations():
+    sections = crosssections.stationedSections([(0, 0), (100, 0)], 25, 10, 1)
+    assert sections["stations"] == pytest.approx([0, 25, 50, 75, 100])
+    assert sections["offsets"] == pytest.approx(np.linspace(-5, 5, 11))
+    assert sections["x"].shape == sections["y"].shape == (5, 11)
+    # the section centers are on the polyline
+    assert sections["x"][:, 5] == pytest.approx([0, 25, 50, 75, 100])
+    assert sections["y"][:, 5] == pytest.approx(np.zeros(5))
+
+
+def test_right_hand_normals():
+    # north, then east
+    points = [(0, 0), (0, 100), (100, 100)]
+    sections = crosssections.stationedSections(points, 50, 10, 5)
+    offsets = sections["offsets"]
+    assert offsets == pytest.approx([-5, 0, 5])
+    # going north, positive offsets are to the east
+    assert sections["x"][0] == pytest.approx(offsets)
+    assert sections["y"][0] == pytest.approx(np.zeros(3))
+    assert sections["x"][1] == pytest.approx(offsets)
+    assert sections["y"][1] == pytest.approx([50, 50, 50])
+    # from the vertex on, going east, positive offsets are to the south
+    for row, station in ((2, 0), (3, 50), (4, 100)):
+        assert sections["x"][row] == pytest.approx([station] * 3)
+        assert sections["y"][row] == pytest.approx(100 - offsets)
+
+
+def test_offset_samples_clamp():
+    sections = crosssections.stationedSections([(0, 0), (100, 0)], 50, 10000, 0.001)
+    assert len(sections["offsets"]) == crosssections.MAX_OFFSET_SAMPLES
+    assert sections["offsets"][[0, -1]] == pytest.approx([-5000, 5000])
+    # at least the two ends
+    sections = crosssections.stationedSections([(0, 0), (100, 0)], 50, 1, 10)
+    assert sections["offsets"] == pytest.approx([-0.5, 0.5])
+
+
+def test_invalid_sections():
+    with pytest.raises(ValueError):
+        crosssections.stationedSections([(0, 0)], 10, 10, 1)
+    with pytest.raises(ValueError):
+        crosssections.stationedSections([(0, 0), (0, 0)], 10, 10, 1)
+    with pytest.raises(ValueError):
+        crosssections.stationedSections([(0, 0), (10, 0)], 0, 10, 1)
@@ -0,0 +1,93 @@
+"""The prefetcher plans the tiles crossed by the polyline (and a corridor
+around the segment heading to the cursor) on the grid DataReaderTool reads."""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+qgis_core = pytest.importorskip("qgis.core")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+prefetcher = importlib.import_module(PACKAGE + ".tools.prefetcher")
+dataReaderTool = importlib.import_module(PACKAGE + ".tools.dataReaderTool")
+rastercache = importlib.import_module(PACKAGE + ".tools.rastercache")
+
+TILE = rastercache.TILE_SIZE
+# 4 x 4 tiles of 1 m pixels
+SIZE = 4 * TILE
+
+
+class Provider:
+    def extent(self):
+        return qgis_core.QgsRectangle(0, 0, SIZE, SIZE)
+
+    def xSize(self):
+        return SIZE
+
+    def ySize(self):
+        return SIZE
+
+
+class Layer:
+    def rasterUnitsPerPixelX(self):
+        return 1.0
+
+    def rasterUnitsPerPixelY(self):
+        return 1.0
+
+
+@pytest.fixture
+def grid():
+    return rastercache.RasterGrid(Provider())
+
+
+def test_segment_tiles_in_polyline_order(grid):
+    # along the first tile row, tile rows count from the top
+    y = SIZE - 10
+    assert prefetcher.segmentTiles(grid, [(10, y), (SIZE - 10, y)]) == [
+        (0, 0),
+        (0, 1),
+        (0, 2),
+        (0, 3),
+    ]
+    assert prefetcher.segmentTiles(grid, [(SIZE - 10, y), (10, y)]) == [
+        (0, 3),
+        (0, 2),
+        (0, 1),
+        (0, 0),
+    ]
+    # down the first tile column, then back along the last tile row
+    points = [(10, SIZE - 10), (10, 10), (SIZE - 10, 10)]
+    tiles = prefetcher.segmentTiles(grid, points)
+    assert tiles == [(0, 0), (1, 0), (2, 0), (3, 0), (3, 1), (3, 2), (3, 3)]
+
+
+def test_corridor(grid):
+    # a short segment in tile (1, 1), with the 8 tiles around it
+    y = SIZE - TILE - 10
+    tiles = prefetcher.segmentTiles(grid, [(TILE + 10, y), (TILE + 20, y)], corridor=1)
+    assert sorted(tiles) == [(row, col) for row in range(3) for col in range(3)]
+    # clipped at the raster edges
+    tiles = prefetcher.segmentTiles(grid, [(10, SIZE - 10), (20, SIZE - 10)], corridor=1)
+    assert sorted(tiles) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+
+def test_points_outside_the_raster(grid):
+    assert prefetcher.segmentTiles(grid, [(-100, -100), (-10, -50)], corridor=1) == []
+
+
+def test_limited_sample_step():
+    layer = Layer()
+    # at most 1000 samples per segment
+    points = [(0, 0), (5000, 0)]
+    assert dataReaderTool.limitedSampleStep(layer, points) == pytest.approx(5.0)
+    # one sample per pixel along a short segment
+    assert dataReaderTool.limitedSampleStep(layer, [(0, 0), (100, 0)]) == pytest.approx(1.0)
+    # diagonal segments are sampled once per pixel crossed, the smallest step wins
+    points = [(0, 0), (300, 300), (5300, 300)]
+    assert dataReaderTool.limitedSampleStep(layer, points) == pytest.approx(2**0.5)
+    assert dataReaderTool.limitedSampleStep(layer, [(0, 0)]) is None
@@ -0,0 +1,69 @@
+"""The vendored pyqtgraph only loads the plotting core the profile tool uses."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("qgis.PyQt")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_NAME = os.path.basename(PLUGIN_DIR)
+
+# pyqtgraph subpackages and modules the profile tool does not need
+NOT_LOADED = (
+    "canvas",
+    "console",
+    "dockarea",
+    "flowchart",
+    "imageview",
+    "jupyter",
+    "metaarray",
+    "multiprocess",
+    "opengl",
+)
+
+IMPORT_SCRIPT = """
+import importlib, json, sys
+sys.path.insert(0, %(parent)r)
+pg = importlib.import_module(%(name)r + ".pyqtgraph")
+importlib.import_module(%(name)r + ".pyqtgraph.exporters")
+prefix = pg.__name__ + "."
+names = [name for name in %(names)r if hasattr(pg, name)]
+loaded = sorted({name[len(prefix):].split(".")[0] for name in sys.modules if name.startswith(prefix)})
+lazy = pg.ImageView.__module__
+loaded_after = sorted({name[len(prefix):].split(".")[0] for name in sys.modules if name.startswith(prefix)})
+print(json.dumps({"names": names, "loaded": loaded, "lazy": lazy, "loaded_after": loaded_after}))
+"""
+
+USED_NAMES = ["PlotWidget", "InfiniteLine", "TextItem", "mkPen", "mkBrush", "setConfigOption"]
+
+
+@pytest.fixture(scope="module")
+def imported():
+    script = IMPORT_SCRIPT % {
+        "parent": os.path.dirname(PLUGIN_DIR),
+        "name": PLUGIN_NAME,
+        "names": USED_NAMES,
+    }
+    output = subprocess.check_output(
+        [sys.executable, "-c", script], env=dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def test_used_names_available(imported):
+    assert imported["names"] == USED_NAMES
+
+
+def test_submodules_not_loaded(imported):
+    assert "exporters" in imported["loaded"]
+    for module in NOT_LOADED:
+        assert module not in imported["loaded"]
+
+
+def test_lazy_namespace(imported):
+    assert imported["lazy"].endswith("imageview.ImageView")
+    assert "imageview" in imported["loaded_after"]
@@ -0,0 +1,154 @@
+"""The tile cache evicts the least recently used tiles beyond its memory
+budget, drops the tiles of a layer whose data source changes and masks the
+no data values and ranges of the provider."""
+
+import importlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+qgis_core = pytest.importorskip("qgis.core")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+rastercache = importlib.import_module(PACKAGE + ".tools.rastercache")
+
+TILE = rastercache.TILE_SIZE
+# 2 x 2 tiles of 1 m pixels
+SIZE = 2 * TILE
+
+
+class Signal:
+    def connect(self, slot):
+        pass
+
+
+class Provider:
+    def __init__(self, ranges=()):
+        self.ranges = ranges
+        self.reads = 0
+
+    def extent(self):
+        return qgis_core.QgsRectangle(0, 0, SIZE, SIZE)
+
+    def xSize(self):
+        return SIZE
+
+    def ySize(self):
+        return SIZE
+
+    def userNoDataValues(self, band):
+        return list(self.ranges)
+
+    def block(self, band, extent, cols, rows):
+        self.reads += 1
+        block = qgis_core.QgsRasterBlock(qgis_core.Qgis.DataType.Float32, cols, rows)
+        block.setData(np.arange(rows * cols, dtype=np.float32).tobytes())
+        return block
+
+
+class Layer:
+    dataChanged = Signal()
+    willBeDeleted = Signal()
+
+    def __init__(self, source="dem.tif", provider=None):
+        self._source = source
+        self.provider = provider or Provider()
+
+    def id(self):
+        return "dem"
+
+    def source(self):
+        return self._source
+
+    def dataProvider(self):
+        return self.provider
+
+
+def tile(value=0.0):
+    # 8 bytes
+    return np.full(2, value, dtype=np.float32)
+
+
+def test_eviction_order():
+    cache = rastercache.RasterTileCache(3 * 8)
+    for n in range(3):
+        cache.insert(("dem", n), tile(n))
+    # tile 0 becomes the most recently used
+    assert cache.lookup(("dem", 0))[0] == 0
+    cache.insert(("dem", 3), tile(3))
+    assert cache.lookup(("dem", 1)) is None
+    assert list(cache.tiles) == [("dem", 2), ("dem", 0), ("dem", 3)]
+    assert cache.size == 3 * 8
+    # a smaller budget evicts the least recently used first
+    cache.setBudget(8)
+    assert list(cache.tiles) == [("dem", 3)]
+    assert cache.size == 8
+
+
+def test_invalidate_layer():
+    cache = rastercache.RasterTileCache(1024)
+    cache.insert(("dem", 0), tile())
+    cache.insert(("other", 0), tile())
+    cache.invalidateLayer("dem")
+    assert list(cache.tiles) == [("other", 0)]
+    assert cache.size == 8
+
+
+def test_source_change_invalidates_tiles():
+    cache = rastercache.RasterTileCache(1024 * 1024 * 1024)
+    layer = Layer()
+    grid = rastercache.RasterGrid(layer.dataProvider())
+    values = cache.tile(layer, 1, grid, 0, 1)
+    assert values.shape == (TILE, TILE)
+    assert values[1, 2] == TILE + 2
+    cache.tile(layer, 1, grid, 0, 1)
+    assert layer.provider.reads == 1
+    # same layer id, new data source
+    layer._source = "dem2.tif"
+    cache.tile(layer, 1, grid, 0, 1)
+    assert layer.provider.reads == 2
+    assert cache.sources["dem"] == "dem2.tif"
+
+
+def test_sample():
+    cache = rastercache.RasterTileCache(1024 * 1024 * 1024)
+    layer = Layer()
+    # pixel centers of the first row of the top left tile, and one outside
+    z = cache.sample(layer, 1, np.array([0.5, 10.5, -1.0]), np.array([SIZE - 0.5] * 3))
+    assert z[:2] == pytest.approx([0, 10])
+    assert np.isnan(z[2])
+
+
+def test_mask_no_data():
+    values = np.arange(10, dtype=float)
+    ranges = [
+        (1.0, 2.0, True, True),  # [1, 2]
+        (4.0, 6.0, False, False),  # ]4, 6[
+        (8.0, np.nan, False, True),  # ]8, +inf[
+    ]
+    masked = rastercache.maskNoData(values, ranges, noDataValue=0.0)
+    assert masked is values
+    assert np.flatnonzero(np.isnan(masked)).tolist() == [0, 1, 2, 5, 9]
+
+
+def test_no_data_ranges():
+    Range = qgis_core.QgsRasterRange
+    provider = Provider(
+        [Range(1.0, 2.0, Range.IncludeMinAndMax), Range(float("nan"), 0.0, Range.Exclusive)]
+    )
+    ranges = rastercache.noDataRanges(provider, 1)
+    assert ranges[0] == (1.0, 2.0, True, True)
+    low, high, includeMin, includeMax = ranges[1]
+    assert np.isnan(low) and high == 0.0 and not includeMin and not includeMax
+
+
+def test_block_no_data_value():
+    block = qgis_core.QgsRasterBlock(qgis_core.Qgis.DataType.Float32, 2, 2)
+    block.setData(np.array([1, -9999, 3, 4], dtype=np.float32).tobytes())
+    block.setNoDataValue(-9999)
+    values = rastercache.blockToArray(block, 2, 2, [(4.0, 4.0, True, True)])
+    assert np.isnan(values).tolist() == [[False, True], [False, True]]
@@ -0,0 +1,89 @@
+"""Startup check: loading the plugin must not import the plot libraries.
+
+QGIS imports the plugin package, calls classFactory() and initGui() on
+every start (qgis_process calls classFactory() and initProcessing()), the
+heavy modules are only loaded when the profile dock is opened or a
+Processing algorithm is run.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("qgis.core")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_NAME = os.path.basename(PLUGIN_DIR)
+
+# plugin modules that may be loaded at startup
+STARTUP_MODULES = {"apicompat", "profileplugin", "tools", "tools.processingprovider"}
+
+STARTUP_SCRIPT = """
+import importlib, json, sys
+sys.path.insert(0, %(parent)r)
+from qgis.core import QgsApplication
+
+app = QgsApplication([], %(gui)r)
+app.initQgis()
+
+
+class Signal:
+    def connect(self, slot):
+        pass
+
+
+class Canvas:
+    mapToolSet = Signal()
+
+
+class Iface:
+    def mapCanvas(self):
+        return Canvas()
+
+    def mainWindow(self):
+        return None
+
+    def addToolBarIcon(self, action):
+        pass
+
+    def addPluginToMenu(self, menu, action):
+        pass
+
+
+plugin = importlib.import_module(%(name)r).classFactory(Iface() if %(gui)r else None)
+if %(gui)r:
+    plugin.initGui()
+else:
+    plugin.initProcessing()
+prefix = %(name)r + "."
+loaded = {name[len(prefix):] for name in sys.modules if name.startswith(prefix)}
+for library in ("matplotlib", "pyqtgraph"):
+    if library in sys.modules:
+        loaded.add(library)
+registered = QgsApplication.processingRegistry().providerById("profiletool") is not None
+print(json.dumps({"loaded": sorted(loaded), "registered": registered}))
+"""
+
+
+def plugin_startup(gui):
+    script = STARTUP_SCRIPT % {
+        "parent": os.path.dirname(PLUGIN_DIR),
+        "name": PLUGIN_NAME,
+        "gui": gui,
+    }
+    output = subprocess.check_output(
+        [sys.executable, "-c", script], env=dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("gui", [True, False], ids=["initGui", "qgis_process"])
+def test_startup_defers_plot_libraries(gui):
+    startup = plugin_startup(gui)
+    assert startup["registered"]
+    for module in startup["loaded"]:
+        # apicompat submodules are loaded by the plugin package
+        assert module in STARTUP_MODULES or module.startswith("apicompat."), module
@@ -0,0 +1,35 @@
+"""The percentiles of swath profiles are computed from one sort of the
+swath values, with the values of np.nanpercentile."""
+
+import importlib
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+
+pytest.importorskip("qgis.core")
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+dataReaderTool = importlib.import_module(PACKAGE + ".tools.dataReaderTool")
+
+
+def test_nan_percentiles():
+    rng = np.random.default_rng(0)
+    z = rng.normal(size=(500, 21))
+    z[rng.random(z.shape) < 0.3] = np.nan
+    # rows without values and with one value
+    z[5] = np.nan
+    z[6, 1:] = np.nan
+    percentiles = dataReaderTool.nanPercentiles(z, dataReaderTool.SWATH_PERCENTILES)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        expected = np.nanpercentile(z, dataReaderTool.SWATH_PERCENTILES, axis=1)
+    assert len(percentiles) == len(expected)
+    for values, expectedValues in zip(percentiles, expected):
+        np.testing.assert_allclose(values, expectedValues)
+    assert np.isnan([values[5] for values in percentiles]).all()
+    assert [values[6] for values in percentiles] == [z[6, 0]] * 3
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+import numpy as np
+from qgis.core import QgsProject
+
+from .rastercache import maskNoData, noDataRanges, tileCache
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+VSICURL = "/vsicurl/"
+# maximum number of concurrent range requests
+MAX_WORKERS = 8
+# byte ranges closer than MERGE_GAP bytes are fetched in one request
+MERGE_GAP = 16 * 1024
+# COG tiles may have a 4 bytes leader (size) and trailer, GDAL reads them
+TILE_MARGIN = 4
+
+_readerIds = itertools.count()  # numbers the readers, names of their files and tiles
+
+
+def mergeRanges(ranges, gap=MERGE_GAP):
+    """Return the byte ranges (offset, size) sorted and merged where they
+    overlap, are adjacent or closer than gap bytes."""
+    merged = []
+    for offset, size in sorted(ranges):
+        if merged and offset <= merged[-1][0] + merged[-1][1] + gap:
+            start = merged[-1][0]
+            merged[-1] = (start, max(merged[-1][1], offset + size - start))
+        else:
+            merged.append((offset, size))
+    return merged
+
+
+class RangeRequestError(OSError):
+    """A byte range could not be read, the HTTP server failed or does not
+    support range requests."""
+
+
+def fetchRanges(path, ranges, workers=MAX_WORKERS):
+    """Fetch the byte ranges (offset, size) of a /vsicurl/ file, concurrently
+    by at most workers threads. Return the list of the bytes of each range,
+    raise RangeRequestError if a range can not be read.
+
+    The ranges are read by GDAL, with the HTTP settings (proxy,
+    authentication, headers, timeouts) GDAL and QGIS use to open the layer.
+    """
+
+    def fetch(byteRange):
+        offset, size = byteRange
+        handle = gdal.VSIFOpenL(path, "rb")
+        if handle is None:
+            raise RangeRequestError("%s can not be opened" % path)
+        try:
+            gdal.VSIFSeekL(handle, offset, 0)
+            data = gdal.VSIFReadL(1, size, handle)
+        finally:
+            gdal.VSIFCloseL(handle)
+        if data is None or len(data) != size:
+            raise RangeRequestError(
+                "bytes %d-%d of %s can not be read" % (offset, offset + size - 1, path)
+            )
+        return data
+
+    if not ranges:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        return list(pool.map(fetch, ranges))
+
+
+class CogReader:
+    """Reads profiles from a Cloud-Optimized GeoTIFF served over HTTP.
+
+    The internal tiles crossed by the samples are worked out from the tile
+    offsets of the COG. The byte ranges of the tiles missing from the shared
+    tile cache are merged and fetched concurrently, and the tiles are then
+    decoded by GDAL from a sparse file of the header and the fetched ranges,
+    so that a profile takes one round trip per tile cluster and is not
+    fetched again when it is redrawn.
+    """
+
+    def __init__(self, path, dataset):
+        self.path = path
+        self.dataset = dataset
+        self.length = gdal.VSIStatL(path).size
+        self.headerSize = self._headerSize()
+        self.header = None
+        self.name = "/vsimem/profiletool_cog_%d" % next(_readerIds)
+        self.calls = itertools.count()  # numbers the sparse files
+
+    def _headerSize(self):
+        # the tiles of a COG follow the header (all IFDs and tile offsets)
+        offsets = []
+        for band in range(1, self.dataset.RasterCount + 1):
+            gdalBand = self.dataset.GetRasterBand(band)
+            overviews = [gdalBand.GetOverview(i) for i in range(gdalBand.GetOverviewCount())]
+            for level in [gdalBand] + overviews:
+                offset = level.GetMetadataItem("BLOCK_OFFSET_0_0", "TIFF")
+                if offset:
+                    offsets.append(int(offset) - TILE_MARGIN)
+        return min(offsets) if offsets else self.length
+
+    def fetchHeader(self):
+        """Fetch the header of the COG (IFDs and tile offsets), raise
+        RangeRequestError if it can not be read."""
+        self.header = fetchRanges(self.path, [(0, self.headerSize)])[0]
+
+    @staticmethod
+    def _levelBand(dataset, band, level):
+        gdalBand = dataset.GetRasterBand(band)
+        return gdalBand if level == 0 else gdalBand.GetOverview(level - 1)
+
+    def level(self, step=None):
+        """Return the coarsest overview level (0 for the full resolution)
+        whose pixels are not larger than step."""
+        gdalBand = self.dataset.GetRasterBand(1)
+        geoTransform = self.dataset.GetGeoTransform()
+        pixel = max(abs(geoTransform[1]), abs(geoTransform[5]))
+        best, bestCols = 0, gdalBand.XSize
+        for i in range(gdalBand.GetOverviewCount() if step else 0):
+            overview = gdalBand.GetOverview(i)
+            scale = max(
+                self.dataset.RasterXSize / overview.XSize, self.dataset.RasterYSize / overview.YSize
+            )
+            if pixel * scale <= step and overview.XSize < bestCols:
+                best, bestCols = i + 1, overview.XSize
+        return best
+
+    def pixels(self, x, y, level=0):
+        """Return the pixels of the samples at level and the tiles they
+        cross: (row, col, inside, tiles), tiles being the sorted tile
+        indexes (tileRow, tileCol)."""
+        gdalBand = self._levelBand(self.dataset, 1, level)
+        x0, dx, _, y0, _, dy = self.dataset.GetGeoTransform()
+        dx *= self.dataset.RasterXSize / gdalBand.XSize
+        dy *= self.dataset.RasterYSize / gdalBand.YSize
+        col = np.floor((np.asarray(x, dtype=float) - x0) / dx)
+        row = np.floor((np.asarray(y, dtype=float) - y0) / dy)
+        inside = (col >= 0) & (col < gdalBand.XSize) & (row >= 0) & (row < gdalBand.YSize)
+        row, col = row[inside].astype(np.int64), col[inside].astype(np.int64)
+        blockCols, blockRows = gdalBand.GetBlockSize()
+        tiles = sorted(set(zip((row // blockRows).tolist(), (col // blockCols).tolist())))
+        return row, col, inside, tiles
+
+    def ranges(self, blocks, level=0):
+        """Return the merged byte ranges of the blocks (band, tileRow,
+        tileCol) at level."""
+        ranges = set()
+        for band, tileRow, tileCol in blocks:
+            levelBand = self._levelBand(self.dataset, band, level)
+            offset = levelBand.GetMetadataItem("BLOCK_OFFSET_%d_%d" % (tileCol, tileRow), "TIFF")
+            size = levelBand.GetMetadataItem("BLOCK_SIZE_%d_%d" % (tileCol, tileRow), "TIFF")
+            if offset and size:  # sparse files have missing tiles
+                ranges.add((int(offset) - TILE_MARGIN, int(size) + 2 * TILE_MARGIN))
+        # the trailer of the last tile is not past the end of the file
+        return [(offset, min(size, self.length - offset)) for offset, size in mergeRanges(ranges)]
+
+    def plan(self, bands, x, y, level=0):
+        """Return the pixels of the samples at level and the tiles and byte
+        ranges to fetch: (row, col, inside, tiles, ranges), tiles being the
+        tile indexes (tileRow, tileCol) crossed by the samples."""
+        row, col, inside, tiles = self.pixels(x, y, level)
+        blocks = [(band,) + tile for band in bands for tile in tiles]
+        return row, col, inside, tiles, self.ranges(blocks, level)
+
+    def _sparseFile(self, ranges):
+        """Fetch the header (once) and the ranges, return the name of a GDAL
+        sparse file of the fetched bytes and the names of its parts."""
+        if self.header is None:
+            self.fetchHeader()
+        data = fetchRanges(self.path, ranges)
+        prefix = "%s_%d" % (self.name, next(self.calls))
+        parts = []
+        regions = []
+        for n, ((offset, _), chunk) in enumerate(zip([(0, None)] + ranges, [self.header] + data)):
+            name = "%s_%d" % (prefix, n)
+            gdal.FileFromMemBuffer(name, chunk)
+            parts.append(name)
+            regions.append(
+                '<SubfileRegion><Filename relative="0">%s</Filename>'
+                "<DestinationOffset>%d</DestinationOffset><SourceOffset>0</SourceOffset>"
+                "<RegionLength>%d</RegionLength></SubfileRegion>"
+                % (escape(name), offset, len(chunk))
+            )
+        description = "%s.xml" % prefix
+        gdal.FileFromMemBuffer(
+            description,
+            "<VSISparseFile><Length>%d</Length>%s</VSISparseFile>"
+            % (self.length, "".join(regions)),
+        )
+        parts.append(description)
+        return "/vsisparse/" + description, parts
+
+    def _fetchBlocks(self, blocks, level):
+        """Fetch and decode the blocks (band, tileRow, tileCol) at level,
+        return {block: values}."""
+        name, parts = self._sparseFile(self.ranges(blocks, level))
+        values = {}
+        try:
+            sparse = gdal.Open(name)
+            for band, tileRow, tileCol in blocks:
+                gdalBand = self._levelBand(sparse, band, level)
+                blockCols, blockRows = gdalBand.GetBlockSize()
+                row0, col0 = tileRow * blockRows, tileCol * blockCols
+                cols = min(blockCols, gdalBand.XSize - col0)
+                rows = min(blockRows, gdalBand.YSize - row0)
+                values[(band, tileRow, tileCol)] = gdalBand.ReadAsArray(col0, row0, cols, rows)
+            sparse = None
+        finally:
+            for part in parts:
+                gdal.Unlink(part)
+        return values
+
+    def sample(self, bands, x, y, step=None, provider=None):
+        """Return the list of values at the coordinates x, y (layer crs) for
+        each band of bands, as float arrays, NaN outside the raster and for
+        no data. With a step the values are read from the coarsest overview
+        whose pixels are not larger. Raise OSError (RangeRequestError) or
+        RuntimeError (GDAL) if the tiles can not be fetched.
+
+        The no data settings of provider (the data provider of the layer)
+        are applied, the no data value of the file without provider.
+        """
+        level = self.level(step)
+        row, col, inside, tiles = self.pixels(x, y, level)
+        zs = [np.full(len(inside), np.nan) for band in bands]
+        if not tiles:
+            return zs
+        cache = tileCache()
+        # cached tiles keyed by (reader name, level, band, tileRow, tileCol)
+        blocks = {}
+        for band in bands:
+            for tile in tiles:
+                blocks[(band,) + tile] = cache.lookup((self.name, level, band) + tile)
+        missing = [block for block, values in blocks.items() if values is None]
+        if missing:
+            for block, values in self._fetchBlocks(missing, level).items():
+                cache.insert((self.name, level) + block, values)
+                blocks[block] = values
+        index = np.flatnonzero(inside)
+        blockCols, blockRows = self._levelBand(self.dataset, 1, level).GetBlockSize()
+        tileRows, tileCols = row // blockRows, col // blockCols
+        for z, band in zip(zs, bands):
+            for tileRow, tileCol in tiles:
+                selected = (tileRows == tileRow) & (tileCols == tileCol)
+                row0, col0 = tileRow * blockRows, tileCol * blockCols
+                values = blocks[(band, tileRow, tileCol)]
+                z[index[selected]] = values[row[selected] - row0, col[selected] - col0]
+            if provider is None:
+                noDataValue = self.dataset.GetRasterBand(band).GetNoDataValue()
+                maskNoData(z, (), noDataValue)
+                continue
+            noDataValue = None
+            if provider.sourceHasNoDataValue(band) and provider.useSourceNoDataValue(band):
+                noDataValue = provider.sourceNoDataValue(band)
+            maskNoData(z, noDataRanges(provider, band), noDataValue)
+        return zs
+
+    def close(self):
+        """Drop the cached tiles and the dataset of the reader."""
+        tileCache().invalidateLayer(self.name)
+        self.dataset = None
+
+
+def openCog(path):
+    """Return a COG reader of a /vsicurl/ GeoTIFF, None if the file is not a
+    Cloud-Optimized GeoTIFF, is rotated or its server does not support range
+    requests (the layer is then read by GDAL through the tile cache)."""
+    if gdal is None or not path.startswith(VSICURL):
+        return None
+    if not path[len(VSICURL) :].startswith(("http://", "https://")):
+        return None
+    try:
+        dataset = gdal.OpenEx(path, gdal.OF_RASTER | gdal.OF_READONLY)
+        if dataset is None or dataset.GetDriver().ShortName != "GTiff":
+            return None
+        if dataset.RasterCount == 0:
+            return None
+        if dataset.GetMetadataItem("LAYOUT", "IMAGE_STRUCTURE") != "COG":
+            return None
+        geoTransform = dataset.GetGeoTransform()
+        if geoTransform[2] != 0 or geoTransform[4] != 0:
+            return None
+        reader = CogReader(path, dataset)
+        reader.fetchHeader()
+        return reader
+    except (RuntimeError, OSError):
+        return None
+
+
+_readers = None  # layer id -> (data source, COG reader or None)
+
+
+def cogReader(layer):
+    """Return the COG reader of a /vsicurl/ raster layer (GDAL provider),
+    None if the layer is not a Cloud-Optimized GeoTIFF served over HTTP."""
+    global _readers
+    if _readers is None:
+        _readers = {}
+        QgsProject.instance().layerWillBeRemoved.connect(forgetLayer)
+    source = layer.source()
+    cached = _readers.get(layer.id())
+    if cached is None or cached[0] != source:
+        forgetLayer(layer.id())
+        reader = None
+        if layer.dataProvider().name() == "gdal" and source.startswith(VSICURL):
+            reader = openCog(source.split("|")[0])
+        cached = _readers[layer.id()] = (source, reader)
+    return cached[1]
+
+
+def discardReader(layer):
+    """Close the reader of a layer whose tiles can not be fetched, the layer
+    is then read by GDAL through the tile cache until its source changes."""
+    forgetLayer(layer.id())
+    _readers[layer.id()] = (layer.source(), None)
+
+
+def forgetLayer(layerId):
+    """Close the reader of a layer removed from the project or discarded."""
+    if _readers is not None:
+        _, reader = _readers.pop(layerId, (None, None))
+        if reader is not None:
+            reader.close()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import numpy as np
+from qgis.core import (
+    QgsCoordinateTransform,
+    QgsCsException,
+    QgsLineString,
+    QgsPointXY,
+    QgsProject,
+)
+
+from .dataReaderTool import DataReaderTool
+from .profileexport import saveProfile
+
+# maximum number of samples across a section
+MAX_OFFSET_SAMPLES = 1001
+
+
+def stationedSections(points, spacing, width, offsetStep):
+    """Return the cross sections of the polyline points (map crs).
+
+    A section is built every spacing along the polyline (stations),
+    perpendicular to the segment of the station, width wide and sampled
+    every offsetStep (at most MAX_OFFSET_SAMPLES samples), offsets growing
+    from the left to the right of the polyline. Return a dictionnary
+    {"stations": (n,), "offsets": (m,), "x": (n, m), "y": (n, m)}.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < 2 or spacing <= 0 or width <= 0 or offsetStep <= 0:
+        raise ValueError("A polyline, a spacing, a width and an offset step are needed")
+    delta = np.diff(points, axis=0)
+    lengths = np.hypot(delta[:, 0], delta[:, 1])
+    segments = lengths > 0
+    if not segments.any():
+        raise ValueError("The polyline has no length")
+    starts, delta, lengths = points[:-1][segments], delta[segments], lengths[segments]
+    chainage = np.concatenate(([0.0], np.cumsum(lengths)))
+    stations = np.arange(0.0, chainage[-1] + spacing * 1e-9, spacing)
+    segment = np.clip(np.searchsorted(chainage, stations, side="right") - 1, 0, len(lengths) - 1)
+    t = (stations - chainage[segment]) / lengths[segment]
+    centerX = starts[segment, 0] + t * delta[segment, 0]
+    centerY = starts[segment, 1] + t * delta[segment, 1]
+    # unit normal pointing to the right of the polyline
+    normalX = delta[segment, 1] / lengths[segment]
+    normalY = -delta[segment, 0] / lengths[segment]
+    count = min(int(round(width / offsetStep)) + 1, MAX_OFFSET_SAMPLES)
+    offsets = np.linspace(-width / 2, width / 2, max(count, 2))
+    return {
+        "stations": stations,
+        "offsets": offsets,
+        "x": centerX[:, None] + normalX[:, None] * offsets,
+        "y": centerY[:, None] + normalY[:, None] * offsets,
+    }
+
+
+def sampleSections(iface, tool, sections, layer, band):
+    """Return the values (station x offset array, NaN for no data) of band
+    of a raster layer on the sections, all read in one batch."""
+    x = sections["x"].ravel()
+    y = sections["y"].ravel()
+    mapCrs = tool.canvas.mapSettings().destinationCrs()
+    if layer.crs() != mapCrs:
+        # all the points are transformed in one call
+        line = QgsLineString(x.tolist(), y.tolist())
+        try:
+            line.transform(QgsCoordinateTransform(mapCrs, layer.crs(), QgsProject.instance()))
+            x = np.array(line.xVector())
+            y = np.array(line.yVector())
+        except QgsCsException:
+            # points the transform can not handle are left as they are
+            points = [tool.toLayerCoordinates(layer, QgsPointXY(*point)) for point in zip(x, y)]
+            x = np.array([point.x() for point in points])
+            y = np.array([point.y() for point in points])
+    z = DataReaderTool().rasterValues(iface, layer, [band], x, y)[0]
+    return z.reshape(sections["x"].shape)
+
+
+def saveSections(sections, z, fileName, **kwargs):
+    """Writes the sections as a long table (station, offset, x, y, z) to
+    fileName, see saveProfile."""
+    stations, offsets = np.meshgrid(sections["stations"], sections["offsets"], indexing="ij")
+    table = {
+        "station": stations.ravel(),
+        "offset": offsets.ravel(),
+        "x": sections["x"].ravel(),
+        "y": sections["y"].ravel(),
+        "z": np.asarray(z, dtype=float).ravel(),
+    }
+    saveProfile(table, fileName, keys=("station", "offset", "x", "y", "z"), **kwargs)
@@ -24,6 +24,7 @@
 #
 # ---------------------------------------------------------------------
 import platform
+import warnings
 from math import sqrt
 
 import numpy as np
@@ -31,23 +32,248 @@ import qgis
 from qgis.core import *
 from qgis.PyQt.QtCore import QCoreApplication
 
+from . import cogreader, memmapreader, mosaicreader
+from .cogreader import cogReader, discardReader
+from .memmapreader import mappedReader
+from .mosaicreader import mosaicReader
+from .rastercache import RasterGrid, tileCache
 from .utils import isProfilable
 
+# maximum number of parallel lines sampled across a swath
+MAX_SWATH_LINES = 101
+# percentiles of the swath values, stored as profile["zp<percentile>"]
+SWATH_PERCENTILES = (25, 50, 75)
+
+
+def nanPercentiles(z, percentiles):
+    """Return the percentiles of the rows of the 2D array z, ignoring NaN,
+    as one array per percentile (NaN for rows without values).
+
+    Same values as np.nanpercentile(z, percentiles, axis=1) (linear
+    interpolation), from one sort of z instead of a loop over the rows.
+    """
+    z = np.sort(z, axis=1)  # NaN last
+    count = np.count_nonzero(~np.isnan(z), axis=1)
+    last = np.maximum(count - 1, 0)[:, None]
+    results = []
+    for percentile in percentiles:
+        position = last * (percentile / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        fraction = position - lower
+        low = np.take_along_axis(z, lower, axis=1)
+        high = np.take_along_axis(z, upper, axis=1)
+        values = (low + (high - low) * fraction)[:, 0]
+        values[count == 0] = np.nan
+        results.append(values)
+    return results
+
+
+def adaptiveSamples(l, z, tolerance, fixed=()):
+    """Return the mask of the samples of the profile (l, z) to keep.
+
+    Starting from the fixed samples (and the first and last one), intervals
+    are refined recursively at the sample which deviates most from the
+    linear interpolation between the interval ends, until no sample deviates
+    more than tolerance. Missing values (NaN) and their neighbours are kept,
+    all the samples with a tolerance of 0.
+    """
+    if tolerance <= 0:
+        return np.ones(len(z), dtype=bool)
+    keep = np.zeros(len(z), dtype=bool)
+    if not len(z):
+        return keep
+    keep[[0, -1]] = True
+    keep[list(fixed)] = True
+    missing = np.isnan(z)
+    keep |= missing
+    keep[:-1] |= missing[1:]
+    keep[1:] |= missing[:-1]
+    kept = np.flatnonzero(keep)
+    intervals = [(i, j) for i, j in zip(kept[:-1], kept[1:]) if j - i > 1]
+    while intervals:
+        i, j = intervals.pop()
+        inner = slice(i + 1, j)
+        if l[j] > l[i]:
+            interpolated = z[i] + (z[j] - z[i]) * (l[inner] - l[i]) / (l[j] - l[i])
+        else:
+            interpolated = z[i]
+        deviation = np.abs(z[inner] - interpolated)
+        k = int(np.argmax(deviation))
+        if deviation[k] > tolerance:
+            m = i + 1 + k
+            keep[m] = True
+            if m - i > 1:
+                intervals.append((i, m))
+            if j - m > 1:
+                intervals.append((m, j))
+    return keep
+
+
+# in adaptive mode every ADAPTIVE_STRIDE-th sample is read before refining
+ADAPTIVE_STRIDE = 16
+
+
+def adaptiveRead(l, read, tolerance, fixed=(), stride=ADAPTIVE_STRIDE):
+    """Read the samples (distances l) of a profile coarse first, refined only
+    where the profile departs from a straight line.
+
+    read(index) returns the values of the samples index (an int array) as a
+    list of dictionnaries of arrays, one per band, the profile in "z". The
+    fixed samples, the first and last one and every stride-th sample are read
+    first. Then the middle samples of the intervals between read samples are
+    read, all intervals in one batch, and both halves of an interval are
+    refined again while its middle deviates more than tolerance from the
+    linear interpolation of the interval ends (for any band) or one of these
+    values is missing. All the samples are read with a tolerance of 0.
+    Return the sorted indexes of the read samples and their values (as read
+    returns them).
+    """
+    n = len(l)
+    if not n or tolerance <= 0:
+        index = np.arange(n, dtype=np.int64)
+        return index, read(index)
+    isRead = np.zeros(n, dtype=bool)
+    isRead[::stride] = True
+    isRead[[0, -1]] = True
+    isRead[list(fixed)] = True
+    index = np.flatnonzero(isRead)
+    values = read(index)
+    full = [{key: np.full(n, np.nan) for key in bandValues} for bandValues in values]
+
+    def store(index, values):
+        for bandFull, bandValues in zip(full, values):
+            for key, z in bandValues.items():
+                bandFull[key][index] = np.array(z, dtype=float)
+
+    store(index, values)
+    starts, ends = index[:-1], index[1:]
+    while True:
+        split = ends - starts > 1
+        starts, ends = starts[split], ends[split]
+        if not len(starts):
+            break
+        middles = (starts + ends) // 2
+        store(middles, read(middles))
+        isRead[middles] = True
+        span = l[ends] - l[starts]
+        t = np.divide(l[middles] - l[starts], span, out=np.zeros(len(span)), where=span > 0)
+        refine = np.zeros(len(middles), dtype=bool)
+        for bandFull in full:
+            z = bandFull["z"]
+            deviation = np.abs(z[middles] - (z[starts] + (z[ends] - z[starts]) * t))
+            refine |= ~(deviation <= tolerance)  # NaN are refined
+        starts, ends = (
+            np.concatenate((starts[refine], middles[refine])),
+            np.concatenate((middles[refine], ends[refine])),
+        )
+    index = np.flatnonzero(isRead)
+    return index, [{key: z[index] for key, z in bandFull.items()} for bandFull in full]
+
+
+def segmentSteps(layer, x1, y1, x2, y2, resolution_mode):
+    """Return the number of steps a segment (layer crs) of a raster layer is
+    sampled with in resolution_mode ("samples", "limited", "full" or
+    "adaptive")."""
+    # lenght between (x1,y1) and (x2,y2)
+    length = sqrt(((x2 - x1) * (x2 - x1)) + ((y2 - y1) * (y2 - y1)))
+    # Set the res of calcul
+    try:
+        # res depend on the angle of ligne with normal
+        res = (
+            min(layer.rasterUnitsPerPixelX(), layer.rasterUnitsPerPixelY())
+            * length
+            / max(abs(x2 - x1), abs(y2 - y1))
+        )
+    except ZeroDivisionError:
+        res = min(layer.rasterUnitsPerPixelX(), layer.rasterUnitsPerPixelY()) * 1.2
+    except AttributeError:
+        # MeshLayers have no rasterUnitsPerPixelX/Y attribute
+        res = 1
+    # enventually use bigger step, wether full res is selected or not
+    if resolution_mode == "samples":
+        # Only take values at sample points, no intermediate values.
+        steps = 1
+    elif res != 0:
+        # Use the map's resolution.
+        steps = int(length / res)
+        if resolution_mode == "limited":
+            # Hard coded limit to 1000 points per segment.
+            steps = min(steps, 1000)
+    else:
+        steps = 1000
+    return max(steps, 1)
+
+
+def limitedSampleStep(layer, points):
+    """Return the smallest distance between two samples (layer units) of
+    the polyline points (layer crs) in limited resolution, the resolution of
+    the raster overview the profile is read from, None for no segment."""
+    sampleStep = None
+    for (x1, y1), (x2, y2) in zip(points[:-1], points[1:]):
+        length = sqrt(((x2 - x1) * (x2 - x1)) + ((y2 - y1) * (y2 - y1)))
+        if length > 0:
+            step = length / segmentSteps(layer, x1, y1, x2, y2, "limited")
+            sampleStep = min(sampleStep or step, step)
+    return sampleStep
+
+
+def readsByTiles(layer, sampleStep=None):
+    """True if the samples of the raster layer are read through the shared
+    tile cache, not by identify or one of the direct file readers."""
+    if not tileCache().canSample(layer) or cogReader(layer):
+        return False
+    if DataReaderTool._fullResolution(layer, sampleStep):
+        return not (mosaicReader(layer) or mappedReader(layer))
+    return True
+
+
+def releaseLayer(layerId):
+    """Drop the cached tiles and file readers of a layer which is not in the
+    project (e.g. a layer opened by a processing algorithm)."""
+    tileCache().invalidateLayer(layerId)
+    for module in (cogreader, memmapreader, mosaicreader):
+        module.forgetLayer(layerId)
+
 
 class DataReaderTool:
     """def __init__(self):
     self.profiles = None"""
 
-    def dataRasterReaderTool(self, iface1, tool1, profile1, pointstoDraw1, resolution_mode):
+    def dataRasterReaderTool(
+        self, iface1, tool1, profile1, pointstoDraw1, resolution_mode, tolerance=None
+    ):
         """
+        resolution_mode : "samples", "limited", "full" or "adaptive", in
+            adaptive mode the full resolution samples are read coarse first
+            and refined where the profile deviates more than the vertical
+            tolerance from a straight line (see adaptiveRead), only the read
+            samples needed to follow the profile within the tolerance are
+            kept.
         Return a dictionnary : {"layer" : layer read,
                                 "band" : band read,
                                 "l" : array of computed lenght,
                                 "z" : array of computed z
         """
+        return self.dataRasterBandsReaderTool(
+            iface1, tool1, [profile1], pointstoDraw1, resolution_mode, tolerance
+        )[0]
+
+    def dataRasterBandsReaderTool(
+        self, iface1, tool1, profiles1, pointstoDraw1, resolution_mode, tolerance=None, swath=None
+    ):
+        """
+        Same as dataRasterReaderTool for several profiles of the same layer
+        (one per band): the polyline is discretized once and all bands are
+        read at the same sample coordinates.
+        swath : width (map units) of a swath around the polyline, parallel
+            lines across it are sampled and "z" is their mean, with
+            "zmin", "zmax" and "zp<percentile>" (SWATH_PERCENTILES).
+        Return the list of profile dictionnaries
+        """
         # init
         self.tool = tool1  # needed to transform point coordinates
-        self.profiles = profile1  # profile with layer and band to compute
+        self.profiles = profiles1[0]  # profile with layer to compute
         self.pointstoDraw = pointstoDraw1  # the polyline to compute
         self.iface = iface1  # QGis interface to show messages in status bar
 
@@ -59,6 +285,12 @@ class DataReaderTool:
         x = []
         y = []
         lbefore = 0
+        # smallest distance between two samples (layer units), in limited mode
+        # values are read from a raster overview of this resolution
+        sampleStep = None
+        vertices = [0]  # indexes of the polyline vertices in l, x and y
+        # normal of each sample (layer units per map unit), for swaths
+        normals = []
         # First create the list of x and y coordinates along the path
         # Also store distance projected on map.
         # work for each segment of polyline
@@ -80,49 +312,18 @@ class DataReaderTool:
             y2C = float(pointstoCal2.y())
             # lenght between (x1,y1) and (x2,y2)
             tlC = sqrt(((x2C - x1C) * (x2C - x1C)) + ((y2C - y1C) * (y2C - y1C)))
-            # Set the res of calcul
-            try:
-                res = (
-                    min(
-                        self.profiles["layer"].rasterUnitsPerPixelX(),
-                        self.profiles["layer"].rasterUnitsPerPixelY(),
-                    )
-                    * tlC
-                    / max(abs(x2C - x1C), abs(y2C - y1C))
-                )  # res depend on the angle of ligne with normal
-            except ZeroDivisionError:
-                res = (
-                    min(
-                        self.profiles["layer"].rasterUnitsPerPixelX(),
-                        self.profiles["layer"].rasterUnitsPerPixelY(),
-                    )
-                    * 1.2
-                )
-            except AttributeError:
-                # MeshLayers have no rasterUnitsPerPixelX/Y attribute
-                res = 1
-            # enventually use bigger step, wether full res is selected or not
-            if resolution_mode == "samples":
-                """Only take values at sample points, no intermediate values."""
-                steps = 1
-            else:
-                if res != 0:
-                    """Use the map's resolution."""
-                    steps = int(tlC / res)
-                    if resolution_mode == "limited":
-                        """Hard coded limit to 1000 points per segment."""
-                        steps = min(steps, 1000)
-                else:
-                    steps = 1000
-
-            if steps < 1:
-                steps = 1
+            steps = segmentSteps(self.profiles["layer"], x1C, y1C, x2C, y2C, resolution_mode)
+            if resolution_mode == "limited" and tlC > 0:
+                sampleStep = min(sampleStep or tlC / steps, tlC / steps)
             # calculate dx, dy and dl for one step
             dxD = (x2D - x1D) / steps
             dyD = (y2D - y1D) / steps
             dlD = sqrt((dxD * dxD) + (dyD * dyD))
             dxC = (x2C - x1C) / steps
             dyC = (y2C - y1C) / steps
+            # normal pointing to the right of the segment, map to layer scale
+            tlD = dlD * steps
+            normal = ((y2C - y1C) / tlD, (x1C - x2C) / tlD) if tlD > 0 else (0.0, 0.0)
             # dlC = sqrt ((dxC*dxC) + (dyC*dyC))
             # reading data
             if first_segment:
@@ -137,48 +338,126 @@ class DataReaderTool:
                 x.append(xC)
                 y.append(yC)
                 l.append(lD)
+                normals.append(normal)
             lbefore = l[-1]
-        # Extract the profile for the whole path
-        z = self._extractZValues(x, y)
+            vertices.append(len(l) - 1)
+        l = np.array(l, dtype=float)
+        x = np.array(x, dtype=float)
+        y = np.array(y, dtype=float)
+        normals = np.array(normals, dtype=float)
+        bands = [profile["band"] for profile in profiles1]
+
+        def readValues(index):
+            # the values of all bands at the samples index, a dictionnary per band
+            if swath:
+                return self._extractSwathValues(
+                    x[index], y[index], normals[index], bands, swath, sampleStep
+                )
+            return [{"z": z} for z in self._extractZValues(x[index], y[index], bands, sampleStep)]
+
+        # Extract the profile for the whole path, for all bands
+        if resolution_mode == "adaptive":
+            # only the samples needed to follow the profile are read
+            index, stats = adaptiveRead(l, readValues, tolerance, vertices)
+            l, x, y = l[index], x[index], y[index]
+            vertices = np.searchsorted(index, vertices)
+        else:
+            stats = readValues(slice(None))
 
         # End of polyline analysis
-        # filling the main data dictionary "profiles"
-        self.profiles["l"] = l
-        self.profiles["z"] = z
-        self.profiles["x"] = x
-        self.profiles["y"] = y
-        self.iface.mainWindow().statusBar().showMessage("")
-
-        return self.profiles
+        # filling the main data dictionary "profiles", the samples are shared
+        # missing values (None) are stored as NaN
+        for profile, values in zip(profiles1, stats):
+            profile["l"] = l
+            profile["x"] = x
+            profile["y"] = y
+            for key, z in values.items():
+                profile[key] = np.array(z, dtype=float)
+            if resolution_mode == "adaptive":
+                keep = adaptiveSamples(l, profile["z"], tolerance, vertices)
+                for key in ["l", "x", "y"] + list(values):
+                    profile[key] = profile[key][keep]
+        if self.iface is not None:
+            self.iface.mainWindow().statusBar().showMessage("")
+
+        return profiles1
+
+    def _extractSwathValues(self, x, y, normals, bands, width, sampleStep=None):
+        """Return for each band of bands the statistics of the swath of width
+        (map units) around the samples x, y: a dictionnary of float arrays
+        "z" (mean), "zmin", "zmax" and "zp<percentile>".
+
+        About one line per pixel (at most MAX_SWATH_LINES) is sampled across
+        the swath, all lines are read in one batch.
+        """
+        layer = self.profiles["layer"]
+        try:
+            pixel = min(layer.rasterUnitsPerPixelX(), layer.rasterUnitsPerPixelY())
+        except AttributeError:
+            pixel = 0
+        scale = np.hypot(normals[:, 0], normals[:, 1]).max() if len(normals) else 0
+        count = int(width * scale / pixel) + 1 if pixel > 0 else MAX_SWATH_LINES
+        # an odd number of lines, the polyline is one of them
+        count = int(np.clip(count, 3, MAX_SWATH_LINES)) | 1
+        offsets = np.linspace(-width / 2, width / 2, count)
+        swathX = (x[:, None] + normals[:, 0:1] * offsets).ravel()
+        swathY = (y[:, None] + normals[:, 1:2] * offsets).ravel()
+        stats = []
+        with warnings.catch_warnings():
+            # samples whose lines have no data at all are NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            for z in self._extractZValues(swathX, swathY, bands, sampleStep):
+                z = np.array(z, dtype=float).reshape(len(x), count)
+                values = {
+                    "z": np.nanmean(z, axis=1),
+                    "zmin": np.nanmin(z, axis=1),
+                    "zmax": np.nanmax(z, axis=1),
+                }
+                for q, percentile in zip(SWATH_PERCENTILES, nanPercentiles(z, SWATH_PERCENTILES)):
+                    values["zp%d" % q] = percentile
+                stats.append(values)
+        return stats
+
+    def rasterValues(self, iface1, layer, bands, x, y, sampleStep=None):
+        """Return the list of z values (float arrays, NaN for no data) of the
+        bands of a raster layer at the coordinates x, y (layer crs), read in
+        one batch."""
+        self.iface = iface1
+        self.profiles = {"layer": layer}
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        return [np.array(z, dtype=float) for z in self._extractZValues(x, y, bands, sampleStep)]
 
     def _status_update(self, advancement_pct):
         """Send a progress message to status bar.
 
         advancement_pct is the advancemente in percentage (from 0 to 100).
         """
-        if advancement_pct % 10 == 0:
+        if advancement_pct % 10 == 0 and self.iface is not None:
             progress = "Creating profile: " + "|" * (advancement_pct // 10)
             self.iface.mainWindow().statusBar().showMessage(progress)
 
-    def _extractZValues(self, x, y):
+    def _extractZValues(self, x, y, bands, sampleStep=None):
+        """Return the list of z values at x, y for each band of bands."""
         # Initialize message bar...
 
         layer = self.profiles["layer"]
-        choosenBand = self.profiles["band"]
 
-        z = []
+        zs = [[] for band in bands]
         if layer.type() == layer.PluginLayer and isProfilable(layer):
             for n, coords in enumerate(zip(x, y)):
                 ident = layer.identify(QgsPointXY(*coords))
-                try:
-                    attr = float(list(ident[1].values())[choosenBand])
-                except:
-                    attr = 0
-                z.append(attr)
-                self._status_update((100 * n) // (len(x) - 1))
+                for z, choosenBand in zip(zs, bands):
+                    try:
+                        attr = float(list(ident[1].values())[choosenBand])
+                    except:
+                        attr = 0
+                    z.append(attr)
+                self._status_update((100 * n) // max(len(x) - 1, 1))
         elif layer.type() == layer.MeshLayer:
             identifier = qgis.gui.QgsMapToolIdentify(qgis.utils.iface.mapCanvas())
             meshFld = QCoreApplication.translate("QgsMapToolIdentify", "Scalar Value")
+            z = zs[0]
             for n, coords in enumerate(zip(x, y)):
                 ident = identifier.identify(
                     QgsGeometry.fromPointXY(QgsPointXY(*coords)),
@@ -192,23 +471,60 @@ class DataReaderTool:
                 except (AttributeError, ValueError):
                     attr = 0
                 z.append(attr)
-                self._status_update((100 * n) // (len(x) - 1))
-        else:  # RASTER LAYERS
+                self._status_update((100 * n) // max(len(x) - 1, 1))
+            # the mesh value does not depend on the band
+            zs = [z for band in bands]
+        elif tileCache().canSample(layer) and cogReader(layer):
+            # RASTER LAYERS, COGs over HTTP read by cached tile clusters
+            try:
+                zs = cogReader(layer).sample(bands, x, y, sampleStep, layer.dataProvider())
+            except (OSError, RuntimeError):
+                # the server failed, the layer is read by cached tiles from now on
+                discardReader(layer)
+                zs = [tileCache().sample(layer, band, x, y, sampleStep) for band in bands]
+        elif (
+            tileCache().canSample(layer)
+            and self._fullResolution(layer, sampleStep)
+            and mosaicReader(layer)
+        ):
+            # RASTER LAYERS, VRT and tile index mosaics read tile by tile
+            zs = mosaicReader(layer).sample(bands, x, y, layer.dataProvider())
+        elif (
+            tileCache().canSample(layer)
+            and self._fullResolution(layer, sampleStep)
+            and mappedReader(layer)
+        ):
+            # RASTER LAYERS, uncompressed local files read from the mapped file
+            zs = [
+                mappedReader(layer).sample(choosenBand, x, y, layer.dataProvider())
+                for choosenBand in bands
+            ]
+        elif tileCache().canSample(layer):  # RASTER LAYERS, read by cached tiles
+            zs = [tileCache().sample(layer, choosenBand, x, y, sampleStep) for choosenBand in bands]
+        else:  # RASTER LAYERS without size, like WMS
             for n, coords in enumerate(zip(x, y)):
                 # this code adapted from valuetool plugin
                 ident = layer.dataProvider().identify(
                     QgsPointXY(*coords), QgsRaster.IdentifyFormat.IdentifyFormatValue
                 )
-                # if ident is not None and ident.has_key(choosenBand+1):
-                if ident is not None and (choosenBand in ident.results()):
-                    attr = ident.results()[choosenBand]
-                else:
-                    attr = 0
-                z.append(attr)
-                self._status_update((100 * n) // (len(x) - 1))
-        return z
-
-    def dataVectorReaderTool(self, iface1, tool1, profile1, pointstoDraw1, valbuf1):
+                for z, choosenBand in zip(zs, bands):
+                    # if ident is not None and ident.has_key(choosenBand+1):
+                    if ident is not None and (choosenBand in ident.results()):
+                        attr = ident.results()[choosenBand]
+                    else:
+                        attr = 0
+                    z.append(attr)
+                self._status_update((100 * n) // max(len(x) - 1, 1))
+        return zs
+
+    @staticmethod
+    def _fullResolution(layer, sampleStep):
+        """True if the samples are read at the full resolution of the raster,
+        not from an overview."""
+        provider = layer.dataProvider()
+        return RasterGrid.forStep(provider, sampleStep).cols == provider.xSize()
+
+    def dataVectorReaderTool(self, iface1, tool1, profile1, pointstoDraw1, valbuf1, sourceCrs=None):
         """
         compute the projected points
         return :
@@ -230,19 +546,16 @@ class DataReaderTool:
                                 "l" : array of computed lenght,
                                 "z" : array of computed z
 
-
+        sourceCrs : crs of pointstoDraw1, the map canvas crs by default
         """
-        layercrs = profile1["layer"].crs()
-        mapcanvascrs = qgis.utils.iface.mapCanvas().mapSettings().destinationCrs()
-
         valbuffer = valbuf1
 
         projectedpoints = []
         buffergeom = None
 
-        sourceCrs = QgsCoordinateReferenceSystem(
-            qgis.utils.iface.mapCanvas().mapSettings().destinationCrs()
-        )
+        if sourceCrs is None:
+            sourceCrs = qgis.utils.iface.mapCanvas().mapSettings().destinationCrs()
+        sourceCrs = QgsCoordinateReferenceSystem(sourceCrs)
         destCrs = QgsCoordinateReferenceSystem(profile1["layer"].crs())
         if qgis.core.Qgis.QGIS_VERSION[0] > "2":
             # In QGIS 3 QgsCoordinateTransform needs a QgsCoordinateTransformContext
@@ -313,10 +626,11 @@ class DataReaderTool:
         profile = {}
         profile["layer"] = profile1["layer"]
         profile["band"] = profile1["band"]
-        profile["l"] = [projectedpoint[0] for projectedpoint in projectedpoints]
-        profile["z"] = [projectedpoint[5] for projectedpoint in projectedpoints]
-        profile["x"] = [projectedpoint[1] for projectedpoint in projectedpoints]
-        profile["y"] = [projectedpoint[2] for projectedpoint in projectedpoints]
+        # missing values (None) are stored as NaN
+        for key, column in (("l", 0), ("z", 5), ("x", 1), ("y", 2)):
+            profile[key] = np.array(
+                [projectedpoint[column] for projectedpoint in projectedpoints], dtype=float
+            )
 
         multipoly = qgis.core.QgsGeometry.fromMultiPolylineXY(
             [
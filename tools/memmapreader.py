@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import os
+
+import numpy as np
+from qgis.core import QgsProject
+from qgis.PyQt.QtCore import QSettings
+
+from .rastercache import maskNoData, noDataRanges
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+# GDAL data type name -> numpy type
+_DATA_TYPES = {
+    "Byte": np.uint8,
+    "Int8": np.int8,
+    "UInt16": np.uint16,
+    "Int16": np.int16,
+    "UInt32": np.uint32,
+    "Int32": np.int32,
+    "Float32": np.float32,
+    "Float64": np.float64,
+}
+
+# GDAL drivers of raw formats, mapped by GDAL itself (GetVirtualMemAutoArray)
+RAW_DRIVERS = ("ENVI", "EHdr")
+
+
+class _MappedRaster:
+    """Uncompressed local raster, pixel values are gathered from the mapped file.
+
+    Subclasses implement _values(band, row, col) for pixel indexes inside the
+    raster.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.cols = dataset.RasterXSize
+        self.rows = dataset.RasterYSize
+        self.geoTransform = dataset.GetGeoTransform()
+        self.noData = {}
+
+    def sample(self, band, x, y, provider=None):
+        """Return the values of band at the coordinates x, y (layer crs) as
+        float array, NaN outside the raster and for no data.
+
+        The no data settings of provider (the data provider of the layer:
+        source no data value used or not, user no data ranges) are applied,
+        the no data value of the file without provider.
+        """
+        x0, dx, _, y0, _, dy = self.geoTransform
+        col = np.floor((np.asarray(x, dtype=float) - x0) / dx)
+        row = np.floor((np.asarray(y, dtype=float) - y0) / dy)
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        z = np.full(len(col), np.nan)
+        values = self._values(band, row[inside].astype(np.int64), col[inside].astype(np.int64))
+        values = values.astype(float)
+        ranges = ()
+        if provider is None:
+            if band not in self.noData:
+                self.noData[band] = self.dataset.GetRasterBand(band).GetNoDataValue()
+            noDataValue = self.noData[band]
+        else:
+            noDataValue = None
+            if provider.sourceHasNoDataValue(band) and provider.useSourceNoDataValue(band):
+                noDataValue = provider.sourceNoDataValue(band)
+            ranges = noDataRanges(provider, band)
+        z[inside] = maskNoData(values, ranges, noDataValue)
+        return z
+
+    def close(self):
+        """Release the mapped file and the dataset."""
+        self.dataset = None
+
+
+class _MappedGeoTiff(_MappedRaster):
+    """Uncompressed striped or tiled GeoTIFF mapped with np.memmap, the
+    strip/tile offsets are read from the GDAL "TIFF" metadata domain."""
+
+    def __init__(self, dataset, path):
+        _MappedRaster.__init__(self, dataset)
+        self.file = np.memmap(path, dtype=np.uint8, mode="r")
+        byteOrder = "<" if bytes(self.file[:2]) == b"II" else ">"
+        band = dataset.GetRasterBand(1)
+        dataType = _DATA_TYPES[gdal.GetDataTypeName(band.DataType)]
+        self.dtype = np.dtype(dataType).newbyteorder(byteOrder)
+        self.blockCols, self.blockRows = band.GetBlockSize()
+        self.blocksPerRow = -(-self.cols // self.blockCols)
+        self.pixelInterleaved = (
+            dataset.RasterCount > 1
+            and dataset.GetMetadataItem("INTERLEAVE", "IMAGE_STRUCTURE") == "PIXEL"
+        )
+        self.offsets = {}  # (band, block index) -> file offset, -1 for missing blocks
+
+    def close(self):
+        # the sampled values are copies, nothing else refers to the map
+        self.file = None
+        _MappedRaster.close(self)
+
+    def _blockOffset(self, band, block):
+        key = (band, block)
+        if key not in self.offsets:
+            # all bands of a pixel interleaved file share the blocks of band 1
+            gdalBand = self.dataset.GetRasterBand(1 if self.pixelInterleaved else band)
+            blockRow, blockCol = divmod(block, self.blocksPerRow)
+            offset = gdalBand.GetMetadataItem("BLOCK_OFFSET_%d_%d" % (blockCol, blockRow), "TIFF")
+            self.offsets[key] = int(offset) if offset else -1
+        return self.offsets[key]
+
+    def _values(self, band, row, col):
+        blocks = (row // self.blockRows) * self.blocksPerRow + col // self.blockCols
+        uniqueBlocks, inverse = np.unique(blocks, return_inverse=True)
+        blockOffsets = np.array(
+            [self._blockOffset(band, int(block)) for block in uniqueBlocks], dtype=np.int64
+        )
+        pixel = (row % self.blockRows) * self.blockCols + col % self.blockCols
+        if self.pixelInterleaved:
+            pixel = pixel * self.dataset.RasterCount + (band - 1)
+        offsets = blockOffsets[inverse.ravel()] + pixel * self.dtype.itemsize
+        values = np.full(len(offsets), np.nan)
+        present = blockOffsets[inverse.ravel()] >= 0
+        raw = self.file[offsets[present, None] + np.arange(self.dtype.itemsize)]
+        values[present] = np.ascontiguousarray(raw).view(self.dtype).ravel()
+        return values
+
+
+class _MappedRawRaster(_MappedRaster):
+    """ENVI or EHdr (.bil/.bip/.bsq) raster, mapped by GDAL."""
+
+    def __init__(self, dataset):
+        _MappedRaster.__init__(self, dataset)
+        self.arrays = {}
+
+    def _values(self, band, row, col):
+        if band not in self.arrays:
+            self.arrays[band] = self.dataset.GetRasterBand(band).GetVirtualMemAutoArray()
+        return self.arrays[band][row, col]
+
+    def close(self):
+        self.arrays.clear()
+        _MappedRaster.close(self)
+
+
+def openMappedRaster(path):
+    """Return a mapped reader of the raster file, None if the file is not an
+    uncompressed, unrotated GeoTIFF or raw raster of a supported type."""
+    if gdal is None or not os.path.isfile(path):
+        return None
+    try:
+        dataset = gdal.OpenEx(path, gdal.OF_RASTER | gdal.OF_READONLY)
+    except RuntimeError:
+        return None
+    if dataset is None or dataset.RasterCount == 0:
+        return None
+    geoTransform = dataset.GetGeoTransform()
+    if geoTransform[2] != 0 or geoTransform[4] != 0:
+        return None
+    for i in range(1, dataset.RasterCount + 1):
+        band = dataset.GetRasterBand(i)
+        if gdal.GetDataTypeName(band.DataType) not in _DATA_TYPES:
+            return None
+        if (band.GetScale() or 1) != 1 or (band.GetOffset() or 0) != 0:
+            return None
+    driver = dataset.GetDriver().ShortName
+    try:
+        if driver == "GTiff":
+            compression = dataset.GetMetadataItem("COMPRESSION", "IMAGE_STRUCTURE")
+            nbits = dataset.GetMetadataItem("NBITS", "IMAGE_STRUCTURE")
+            if compression not in (None, "NONE") or nbits:
+                return None
+            return _MappedGeoTiff(dataset, path)
+        if driver in RAW_DRIVERS:
+            dataset.GetRasterBand(1).GetVirtualMemAutoArray()
+            return _MappedRawRaster(dataset)
+    except (RuntimeError, ValueError, OSError):
+        pass
+    return None
+
+
+_readers = None  # layer id -> (data source, mapped reader or None)
+
+
+def mappedReader(layer):
+    """Return the mapped reader of a local raster layer (GDAL provider),
+    None if the layer can not be mapped or the reader is disabled (setting
+    "profiletool/memmapReader")."""
+    global _readers
+    if not QSettings().value("profiletool/memmapReader", True, type=bool):
+        return None
+    if _readers is None:
+        _readers = {}
+        QgsProject.instance().layerWillBeRemoved.connect(forgetLayer)
+    source = layer.source()
+    cached = _readers.get(layer.id())
+    if cached is None or cached[0] != source:
+        forgetLayer(layer.id())
+        reader = None
+        if layer.dataProvider().name() == "gdal":
+            reader = openMappedRaster(source.split("|")[0])
+        cached = _readers[layer.id()] = (source, reader)
+    return cached[1]
+
+
+def forgetLayer(layerId):
+    """Close the reader of a layer removed from the project or discarded."""
+    if _readers is not None:
+        _, reader = _readers.pop(layerId, (None, None))
+        if reader is not None:
+            reader.close()
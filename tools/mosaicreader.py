@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import os
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import numpy as np
+from qgis.core import QgsProject
+
+from .rastercache import maskNoData, noDataRanges
+
+try:
+    from osgeo import gdal, ogr
+except ImportError:
+    gdal = ogr = None
+
+# maximum number of tile datasets kept open
+MAX_OPEN_DATASETS = 32
+
+# VRT sources read directly from their tile, sources with a scale, LUT or
+# kernel are left to the provider
+_VRT_SOURCES = ("SimpleSource", "ComplexSource")
+_UNSUPPORTED_SOURCE_ELEMENTS = (
+    "ScaleOffset",
+    "ScaleRatio",
+    "LUT",
+    "Exponent",
+    "ColorTableComponent",
+)
+# attributes of the SrcRect and DstRect elements of the VRT sources
+_RECT_KEYS = ("xOff", "yOff", "xSize", "ySize")
+
+
+class DatasetPool:
+    """Bounded pool of open GDAL datasets, the least recently used dataset
+    is closed when more than size are open."""
+
+    def __init__(self, size=MAX_OPEN_DATASETS):
+        self.size = size
+        self.datasets = OrderedDict()  # path -> dataset
+
+    def get(self, path):
+        dataset = self.datasets.get(path)
+        if dataset is not None:
+            self.datasets.move_to_end(path)
+            return dataset
+        dataset = gdal.OpenEx(path, gdal.OF_RASTER | gdal.OF_READONLY)
+        if dataset is None:
+            raise RuntimeError("Can not open %s" % path)
+        self.datasets[path] = dataset
+        while len(self.datasets) > self.size:
+            self.datasets.popitem(last=False)
+        return dataset
+
+
+class MosaicTile:
+    """A tile of a mosaic: its file, footprint and mosaic band -> tile band.
+
+    srcRect and dstRect (xOff, yOff, xSize, ySize) map the mosaic pixels to
+    the tile pixels (VRT sources), without them the geotransform of the tile
+    is used.
+    """
+
+    def __init__(self, path, footprint, srcRect=None, dstRect=None):
+        self.path = path
+        self.footprint = footprint  # xMin, yMin, xMax, yMax
+        self.srcRect = srcRect
+        self.dstRect = dstRect
+        self.bands = {}
+        self.noData = {}  # mosaic band -> no data of the source (VRT NODATA)
+
+    def contains(self, x, y):
+        xMin, yMin, xMax, yMax = self.footprint
+        return (x >= xMin) & (x < xMax) & (y > yMin) & (y <= yMax)
+
+    def pixels(self, dataset, mosaicTransform, x, y):
+        """Return row and col (in the tile) of the pixels containing x, y."""
+        if self.srcRect is None:
+            x0, dx, _, y0, _, dy = dataset.GetGeoTransform()
+            row = np.floor((y - y0) / dy).astype(np.int64)
+            return row, np.floor((x - x0) / dx).astype(np.int64)
+        x0, dx, _, y0, _, dy = mosaicTransform
+        srcX, srcY, srcCols, srcRows = self.srcRect
+        dstX, dstY, dstCols, dstRows = self.dstRect
+        col = srcX + ((x - x0) / dx - dstX) * srcCols / dstCols
+        row = srcY + ((y - y0) / dy - dstY) * srcRows / dstRows
+        return np.floor(row).astype(np.int64), np.floor(col).astype(np.int64)
+
+
+class MosaicReader:
+    """Reads profiles from a mosaic (VRT or GDAL tile index) tile by tile.
+
+    The samples are assigned to the tiles whose footprint contains them,
+    each tile window covering its samples is read once for all bands through
+    a bounded pool of open datasets, and the values are written back at the
+    sample indexes, so that they stay in chainage order. Later tiles are
+    drawn over earlier ones, like GDAL does, except where they have no data.
+    """
+
+    def __init__(self, geoTransform, tiles, noData):
+        self.geoTransform = geoTransform
+        self.tiles = tiles
+        self.noData = noData  # mosaic band -> no data value or None
+        self.pool = DatasetPool()
+        xMin = np.array([tile.footprint[0] for tile in tiles])
+        yMin = np.array([tile.footprint[1] for tile in tiles])
+        xMax = np.array([tile.footprint[2] for tile in tiles])
+        yMax = np.array([tile.footprint[3] for tile in tiles])
+        # bucket grid of the tile footprints, cells of the median tile size
+        self.cellX = float(np.median(xMax - xMin)) or 1.0
+        self.cellY = float(np.median(yMax - yMin)) or 1.0
+        self.buckets = {}
+        for i, (x0, y0, x1, y1) in enumerate(zip(xMin, yMin, xMax, yMax)):
+            cellsX = range(int(np.floor(x0 / self.cellX)), int(np.floor(x1 / self.cellX)) + 1)
+            cellsY = range(int(np.floor(y0 / self.cellY)), int(np.floor(y1 / self.cellY)) + 1)
+            for cellX in cellsX:
+                for cellY in cellsY:
+                    self.buckets.setdefault((cellX, cellY), []).append(i)
+
+    def tileSamples(self, x, y):
+        """Return {tile index: indexes of the samples inside the tile}, the
+        tiles in mosaic order."""
+        cellX = np.floor(x / self.cellX).astype(np.int64)
+        cellY = np.floor(y / self.cellY).astype(np.int64)
+        cells = np.stack((cellX, cellY), axis=1)
+        order = np.lexsort((cellY, cellX))
+        cells, starts = np.unique(cells[order], axis=0, return_index=True)
+        samples = {}
+        for cell, start, end in zip(cells, starts, np.append(starts[1:], len(order))):
+            index = order[start:end]
+            for i in self.buckets.get((int(cell[0]), int(cell[1])), ()):
+                inside = index[self.tiles[i].contains(x[index], y[index])]
+                if len(inside):
+                    samples.setdefault(i, []).append(inside)
+        return {i: np.concatenate(samples[i]) for i in sorted(samples)}
+
+    def sample(self, bands, x, y, provider=None):
+        """Return the list of values at the coordinates x, y (layer crs) for
+        each band of bands, as float arrays, NaN outside the tiles and for
+        no data.
+
+        The no data settings of provider (the data provider of the layer)
+        are applied to the mosaic values, its own no data value without
+        provider.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        zs = [np.full(len(x), np.nan) for band in bands]
+        for i, index in self.tileSamples(x, y).items():
+            tile = self.tiles[i]
+            dataset = self.pool.get(tile.path)
+            row, col = tile.pixels(dataset, self.geoTransform, x[index], y[index])
+            valid = (
+                (col >= 0) & (col < dataset.RasterXSize) & (row >= 0) & (row < dataset.RasterYSize)
+            )
+            index, row, col = index[valid], row[valid], col[valid]
+            if not len(index):
+                continue
+            # window of the tile covering its samples
+            row0, col0 = int(row.min()), int(col.min())
+            rows, cols = int(row.max()) - row0 + 1, int(col.max()) - col0 + 1
+            for z, band in zip(zs, bands):
+                if band not in tile.bands:
+                    continue
+                tileBand = dataset.GetRasterBand(tile.bands[band])
+                window = tileBand.ReadAsArray(col0, row0, cols, rows)
+                values = window[row - row0, col - col0].astype(float)
+                for noData in (tileBand.GetNoDataValue(), tile.noData.get(band)):
+                    if noData is not None:
+                        values[values == noData] = np.nan
+                drawn = ~np.isnan(values)
+                z[index[drawn]] = values[drawn]
+        for z, band in zip(zs, bands):
+            if provider is None:
+                maskNoData(z, (), self.noData.get(band))
+                continue
+            noDataValue = None
+            if provider.sourceHasNoDataValue(band) and provider.useSourceNoDataValue(band):
+                noDataValue = provider.sourceNoDataValue(band)
+            maskNoData(z, noDataRanges(provider, band), noDataValue)
+        return zs
+
+    def close(self):
+        """Close the open tile datasets."""
+        self.pool.datasets.clear()
+
+
+def _vrtTiles(path, dataset):
+    """Return the tiles of a VRT mosaic, None if a source is not a plain tile."""
+    root = ET.parse(path).getroot()
+    x0, dx, _, y0, _, dy = dataset.GetGeoTransform()
+    tiles = OrderedDict()  # (file, src rect, dst rect) -> tile
+    for bandElement in root.iter("VRTRasterBand"):
+        if bandElement.get("subClass"):  # derived or warped bands
+            return None
+        band = int(bandElement.get("band"))
+        for source in bandElement:
+            if source.tag not in _VRT_SOURCES:
+                continue
+            if any(source.find(name) is not None for name in _UNSUPPORTED_SOURCE_ELEMENTS):
+                return None
+            fileElement = source.find("SourceFilename")
+            srcElement = source.find("SrcRect")
+            dstElement = source.find("DstRect")
+            if fileElement is None or srcElement is None or dstElement is None:
+                return None
+            fileName = fileElement.text
+            if fileElement.get("relativeToVRT") == "1":
+                fileName = os.path.join(os.path.dirname(path), fileName)
+            srcRect = tuple(float(srcElement.get(key)) for key in _RECT_KEYS)
+            dstRect = tuple(float(dstElement.get(key)) for key in _RECT_KEYS)
+            key = (fileName, srcRect, dstRect)
+            if key not in tiles:
+                dstX, dstY, dstCols, dstRows = dstRect
+                xs = (x0 + dstX * dx, x0 + (dstX + dstCols) * dx)
+                ys = (y0 + dstY * dy, y0 + (dstY + dstRows) * dy)
+                footprint = (min(xs), min(ys), max(xs), max(ys))
+                tiles[key] = MosaicTile(fileName, footprint, srcRect, dstRect)
+            bandSource = source.find("SourceBand")
+            tiles[key].bands[band] = int(bandSource.text) if bandSource is not None else 1
+            noData = source.find("NODATA")
+            if noData is not None:
+                tiles[key].noData[band] = float(noData.text)
+    return list(tiles.values())
+
+
+def _tileIndexTiles(path, dataset):
+    """Return the tiles of a GDAL tile index (GTI driver), its location field
+    holds the tile files and its features the footprints."""
+    index = ogr.Open(path)
+    if index is None:
+        return None
+    layer = index.GetLayer(0)
+    field = layer.GetMetadataItem("LOCATION_FIELD") or "location"
+    bands = range(1, dataset.RasterCount + 1)
+    tiles = []
+    for feature in layer:
+        fileName = feature.GetField(field)
+        if not fileName:
+            continue
+        if not os.path.isabs(fileName) and not fileName.startswith("/vsi"):
+            fileName = os.path.join(os.path.dirname(path), fileName)
+        xMin, xMax, yMin, yMax = feature.GetGeometryRef().GetEnvelope()
+        tile = MosaicTile(fileName, (xMin, yMin, xMax, yMax))
+        tile.bands = {band: band for band in bands}
+        tiles.append(tile)
+    return tiles
+
+
+def openMosaic(path):
+    """Return a mosaic reader of a VRT or tile index file, None if the file
+    is not a mosaic of plain tiles."""
+    indexPath = path[len("GTI:") :] if path.startswith("GTI:") else path
+    if gdal is None or not os.path.isfile(indexPath):
+        return None
+    try:
+        dataset = gdal.OpenEx(path, gdal.OF_RASTER | gdal.OF_READONLY)
+        if dataset is None:
+            return None
+        geoTransform = dataset.GetGeoTransform()
+        if geoTransform[2] != 0 or geoTransform[4] != 0:
+            return None
+        driver = dataset.GetDriver().ShortName
+        if driver == "VRT":
+            tiles = _vrtTiles(path, dataset)
+        elif driver == "GTI":
+            tiles = _tileIndexTiles(indexPath, dataset)
+        else:
+            return None
+        if not tiles:
+            return None
+        noData = {
+            band: dataset.GetRasterBand(band).GetNoDataValue()
+            for band in range(1, dataset.RasterCount + 1)
+        }
+    except (RuntimeError, ET.ParseError, ValueError, TypeError):
+        return None
+    return MosaicReader(geoTransform, tiles, noData)
+
+
+_readers = None  # layer id -> (data source, mosaic reader or None)
+
+
+def mosaicReader(layer):
+    """Return the mosaic reader of a VRT or tile index raster layer (GDAL
+    provider), None if the layer is not a mosaic of plain tiles."""
+    global _readers
+    if _readers is None:
+        _readers = {}
+        QgsProject.instance().layerWillBeRemoved.connect(forgetLayer)
+    source = layer.source()
+    cached = _readers.get(layer.id())
+    if cached is None or cached[0] != source:
+        forgetLayer(layer.id())
+        reader = None
+        if layer.dataProvider().name() == "gdal":
+            reader = openMosaic(source.split("|")[0])
+        cached = _readers[layer.id()] = (source, reader)
+    return cached[1]
+
+
+def forgetLayer(layerId):
+    """Close the reader of a layer removed from the project or discarded."""
+    if _readers is not None:
+        _, reader = _readers.pop(layerId, (None, None))
+        if reader is not None:
+            reader.close()
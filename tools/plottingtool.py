@@ -22,27 +22,26 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 #
 # ---------------------------------------------------------------------
+import importlib.util
 import os
 from math import sqrt
 
 import numpy as np
 from qgis.PyQt.QtCore import QSettings, Qt
-from qgis.PyQt.QtWidgets import QFileDialog, QSizePolicy
+from qgis.PyQt.QtGui import QColor
+from qgis.PyQt.QtWidgets import QFileDialog, QGraphicsItem, QSizePolicy
 
 from .. import pyqtgraph as pg
-from ..dxfwrite import DXFEngine as dxf
 from ..pyqtgraph import exporters
 
 pg.setConfigOption("background", "w")
 
+# opacity (0-255) of the min-max envelope of swath profiles
+ENVELOPE_ALPHA = 70
 
-try:
-    import matplotlib  # noqa:F401
-    from matplotlib import rc  # noqa:F403,F401
 
-    has_mpl = True
-except ImportError:
-    has_mpl = False
+# matplotlib is optional, it is only imported when chosen as plot library
+has_mpl = importlib.util.find_spec("matplotlib") is not None
 
 
 def getSaveFileName(parent, caption, directory, filter):
@@ -104,15 +103,14 @@ class PlottingTool:
             return plotWdg
 
         elif library == "Matplotlib" and has_mpl:
+            from matplotlib import rc
             from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-            from matplotlib.figure import Figure
+            from matplotlib.figure import Figure, SubplotParams
 
             fig = Figure(
                 (1.0, 1.0),
                 linewidth=0.0,
-                subplotpars=matplotlib.figure.SubplotParams(
-                    left=0, bottom=0, right=1, top=1, wspace=0, hspace=0
-                ),
+                subplotpars=SubplotParams(left=0, bottom=0, right=1, top=1, wspace=0, hspace=0),
             )
 
             font = {"family": "arial", "weight": "normal", "size": 12}
@@ -155,12 +153,10 @@ class PlottingTool:
                 # case line outside the raster
                 y = np.array(profile["plot_y"], dtype=float)  # replace None value by np.nan
                 x = np.array(profile["plot_x"])
-                wdg.plotWdg.plot(
-                    x,
-                    y,
-                    pen=pg.mkPen(model1.item(i, 1).data(Qt.ItemDataRole.BackgroundRole), width=2),
-                    name=tmp_name,
-                )
+                color = model1.item(i, 1).data(Qt.ItemDataRole.BackgroundRole)
+                curve = wdg.plotWdg.plot(x, y, pen=pg.mkPen(color, width=2), name=tmp_name)
+                if profile.get("plot_envelope") is not None:
+                    self.attachEnvelope(curve, x, profile["plot_envelope"], color)
                 # set it visible or not
                 for item in wdg.plotWdg.getPlotItem().listDataItems():
                     if item.name() == tmp_name:
@@ -185,6 +181,16 @@ class PlottingTool:
                         linewidth=3,
                         visible=False,
                     )
+                if profile.get("plot_envelope") is not None:
+                    # the envelope shares the gid of its curve, see changeColor
+                    wdg.plotWdg.figure.get_axes()[0].fill_between(
+                        profile["plot_x"],
+                        np.asarray(profile["plot_envelope"][0], dtype=float),
+                        np.asarray(profile["plot_envelope"][1], dtype=float),
+                        gid=tmp_name,
+                        linewidth=0,
+                        visible=bool(model1.item(i, 0).data(Qt.ItemDataRole.CheckStateRole)),
+                    )
                 self.changeColor(
                     wdg,
                     "Matplotlib",
@@ -199,13 +205,18 @@ class PlottingTool:
             wdg.plotWdg.figure.get_axes()[0].redraw_in_frame()
             wdg.plotWdg.draw()
 
-    def findMin(self, values):
-        minVal = min(z for z in values if z is not None)
-        return minVal
-
-    def findMax(self, values):
-        maxVal = max(z for z in values if z is not None)
-        return maxVal
+    @staticmethod
+    def attachEnvelope(curve, x, envelope, color):
+        """Fills the (min, max) envelope of a swath profile behind its curve
+        (PyQtGraph), the envelope is shown and removed with the curve.
+        Matplotlib envelopes are filled by attachCurves."""
+        lower = pg.PlotDataItem(x, np.asarray(envelope[0], dtype=float), connect="finite")
+        upper = pg.PlotDataItem(x, np.asarray(envelope[1], dtype=float), connect="finite")
+        brush = QColor(color)
+        brush.setAlpha(ENVELOPE_ALPHA)
+        fill = pg.FillBetweenItem(lower, upper, brush=brush)
+        fill.setParentItem(curve)
+        fill.setFlag(QGraphicsItem.GraphicsItemFlag.ItemStacksBehindParent)
 
     def plotRangechanged(self, wdg, library):
 
@@ -222,23 +233,22 @@ class PlottingTool:
         minimumValue = wdg.sbMinVal.value()
         maximumValue = wdg.sbMaxVal.value()
 
-        y_vals = [p["plot_y"] for p in profiles]
-
         if minimumValue == maximumValue:
-            # Automatic mode
-            minimumValue = 1000000000
-            maximumValue = -1000000000
-            for i in range(0, len(y_vals)):
-                if (
-                    profiles[i]["layer"] is not None
-                    and len([z for z in y_vals[i] if z is not None]) > 0
-                ):
-                    minimumValue = min(self.findMin(y_vals[i]), minimumValue)
-                    maximumValue = max(self.findMax(y_vals[i]) + 1, maximumValue)
-                    wdg.sbMaxVal.setValue(maximumValue)
-                    wdg.sbMinVal.setValue(minimumValue)
-                    wdg.sbMaxVal.setEnabled(True)
-                    wdg.sbMinVal.setEnabled(True)
+            # Automatic mode: merge the extents cached when the profiles were computed
+            extents = [
+                p["plot_extent"]
+                for p in profiles
+                if p["layer"] is not None and p.get("plot_extent") is not None
+            ]
+            if extents:
+                minimumValue = min(extent[0] for extent in extents)
+                maximumValue = max(extent[1] for extent in extents) + 1
+                wdg.disconnectYSpinbox()
+                wdg.sbMaxVal.setValue(maximumValue)
+                wdg.sbMinVal.setValue(minimumValue)
+                wdg.sbMaxVal.setEnabled(True)
+                wdg.sbMinVal.setEnabled(True)
+                wdg.connectYSpinbox()
 
         if minimumValue < maximumValue:
             if library == "PyQtGraph":
@@ -291,8 +301,23 @@ class PlottingTool:
             for i, item in enumerate(pitems.listDataItems()):
                 if item.name() == name:
                     item.setPen(color1, width=2)
+                    for child in item.childItems():
+                        if isinstance(child, pg.FillBetweenItem):
+                            brush = QColor(color1)
+                            brush.setAlpha(ENVELOPE_ALPHA)
+                            child.setBrush(brush)
 
         elif library == "Matplotlib":
+            for collection in wdg.plotWdg.figure.get_axes()[0].collections:
+                if name == str(collection.get_gid()):  # swath envelope
+                    collection.set_facecolor(
+                        (
+                            color1.red() / 255.0,
+                            color1.green() / 255.0,
+                            color1.blue() / 255.0,
+                            ENVELOPE_ALPHA / 255.0,
+                        )
+                    )
             temp1 = wdg.plotWdg.figure.get_axes()[0].get_lines()
             for i in range(len(temp1)):
                 if name == str(temp1[i].get_gid()):
@@ -323,6 +348,9 @@ class PlottingTool:
                         item.setVisible(False)
 
         elif library == "Matplotlib":
+            for collection in wdg.plotWdg.figure.get_axes()[0].collections:
+                if name == str(collection.get_gid()):  # swath envelope
+                    collection.set_visible(bool)
             temp1 = wdg.plotWdg.figure.get_axes()[0].get_lines()
             for i in range(len(temp1)):
                 if name == str(temp1[i].get_gid()):
@@ -438,27 +466,36 @@ class PlottingTool:
             caption="Save As",
             directory=wdg.profiletoolcore.loaddirectory,
             # filter = "Profile of " + name + ".png",
-            filter="dxf (*.dxf)",
+            filter="dxf (*.dxf);;gzip compressed dxf (*.dxf.gz)",
         )
         if fileName:
             wdg.profiletoolcore.loaddirectory = os.path.dirname(fileName)
             QSettings().setValue("profiletool/lastdirectory", wdg.profiletoolcore.loaddirectory)
 
-            drawing = dxf.drawing(fileName)
+            from ..dxfwrite import DXFEngine as dxf
+            from ..dxfwrite.const import DXF12, DXF2000
+
+            # 2D profiles are written as LWPOLYLINE, which requires R2000
+            drawing = dxf.drawing(fileName, dxfversion=DXF2000 if type == "2D" else DXF12)
             for profile in profiles:
                 name = profile["layer"].name()
                 drawing.add_layer(name)
+                z = np.asarray(profile["z"], dtype=float)
+                valid = ~np.isnan(z)
                 if type == "2D":
-                    points = [
-                        (l, z, 0)
-                        for l, z in zip(profile["l"], profile["z"])  # noqa: E74
-                        if z is not None
-                    ]
+                    polyline = dxf.array_lwpolyline(
+                        np.asarray(profile["l"], dtype=float)[valid],
+                        z[valid],
+                        color=7,
+                        layer=name,
+                    )
                 else:
-                    points = [
-                        (x, y, z)
-                        for x, y, z in zip(profile["x"], profile["y"], profile["z"])
-                        if z is not None
-                    ]
-                drawing.add(dxf.polyline(points, color=7, layer=name))
+                    polyline = dxf.array_polyline(
+                        np.asarray(profile["x"], dtype=float)[valid],
+                        np.asarray(profile["y"], dtype=float)[valid],
+                        z[valid],
+                        color=7,
+                        layer=name,
+                    )
+                drawing.add(polyline)
             drawing.save()
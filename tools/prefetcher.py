@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+from math import hypot
+
+import numpy as np
+from qgis.core import QgsMapLayer, QgsPointXY
+from qgis.PyQt.QtCore import Qt, QThread, QTimer
+
+from .dataReaderTool import limitedSampleStep, readsByTiles
+from .rastercache import TILE_SIZE, RasterGrid, tileCache
+
+# delay (ms) the cursor must rest before its corridor is prefetched
+PREFETCH_DELAY = 150
+# tiles prefetched on each side of the segment heading to the cursor
+CORRIDOR = 1
+
+
+def segmentTiles(grid, points, corridor=0):
+    """Return the indexes (tileRow, tileCol) of the tiles of grid crossed by
+    the polyline points (layer crs), with corridor tiles on each side, in
+    the order of the polyline."""
+    tiles = []
+    step = min(grid.pixelX, grid.pixelY) * TILE_SIZE / 2
+    for (x1, y1), (x2, y2) in zip(points[:-1], points[1:]):
+        n = max(int(hypot(x2 - x1, y2 - y1) / step), 1)
+        row, col, _ = grid.pixels(np.linspace(x1, x2, n + 1), np.linspace(y1, y2, n + 1))
+        for tileRow, tileCol in zip((row // TILE_SIZE).tolist(), (col // TILE_SIZE).tolist()):
+            for dRow in range(-corridor, corridor + 1):
+                for dCol in range(-corridor, corridor + 1):
+                    tiles.append((tileRow + dRow, tileCol + dCol))
+    tileRows = -(-grid.rows // TILE_SIZE)
+    return [
+        tile
+        for tile in dict.fromkeys(tiles)
+        if 0 <= tile[0] < tileRows and 0 <= tile[1] < grid.tileCols
+    ]
+
+
+class PrefetchThread(QThread):
+    """Reads the tiles of its jobs into the tile cache until cancelled."""
+
+    def __init__(self, jobs):
+        QThread.__init__(self)
+        self.jobs = jobs  # arguments of RasterTileCache.prefetch
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        for job in self.jobs:
+            if self.cancelled:
+                return
+            tileCache().prefetch(*job)
+
+
+class TilePrefetcher:
+    """Warms the raster tile cache while a polyline is drawn.
+
+    When the cursor rests, the tiles of the committed segments and of a
+    corridor around the segment heading to the cursor are read by a low
+    priority thread, for the raster layers of the profile read through the
+    tile cache. The prefetch is cancelled when the cursor moves or the
+    polyline is ended, the threads are joined when the tool is closed.
+    """
+
+    def __init__(self, profiletool, tool):
+        self.profiletool = profiletool
+        self.tool = tool  # the map tool, to transform the points to the layers crs
+        self.points = []
+        self.cursor = None
+        self.thread = None
+        self.threads = set()  # running threads, kept until they finish
+        # (layer id, source, sample step) -> tile grid, None if not read by tiles
+        self.grids = {}
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(PREFETCH_DELAY)
+        self.timer.timeout.connect(self.start)
+
+    def update(self, points, cursor):
+        """Plan a prefetch for the polyline points and the cursor (map crs)."""
+        self.cancel()
+        self.points = list(points)
+        self.cursor = cursor
+        self.timer.start()
+
+    def cancel(self):
+        self.timer.stop()
+        if self.thread is not None:
+            self.thread.cancel()
+            self.thread = None
+
+    def stop(self):
+        """Cancel the prefetch and wait for the running threads to finish."""
+        self.cancel()
+        for thread in list(self.threads):
+            thread.cancel()
+            thread.wait()
+        self.threads.clear()
+        self.grids.clear()
+
+    def start(self):
+        jobs = self._jobs()
+        if not jobs:
+            return
+        thread = self.thread = PrefetchThread(jobs)
+        self.threads.add(thread)
+        thread.finished.connect(lambda: self.threads.discard(thread))
+        thread.start(QThread.Priority.LowestPriority)
+
+    def _sampleStep(self, layer, points, cursor):
+        # the overview resolution DataReaderTool reads in limited mode, set
+        # by the committed polyline (by the segment to the cursor while the
+        # first one is drawn)
+        if self.profiletool.dockwidget.resolutionMode() != "limited":
+            return None
+        if len(points) < 2:
+            points = points + [cursor]
+        return limitedSampleStep(layer, points)
+
+    def _grid(self, layer, sampleStep):
+        # the grid of the tiles read for the layer, None if it is not read by
+        # tiles; readsByTiles may open the file readers, the decision is kept
+        key = (layer.id(), layer.source(), sampleStep)
+        if key not in self.grids:
+            grid = None
+            if readsByTiles(layer, sampleStep):
+                grid = RasterGrid.forStep(layer.dataProvider(), sampleStep)
+            self.grids[key] = grid
+        return self.grids[key]
+
+    def _jobs(self):
+        mdl = self.profiletool.dockwidget.mdl
+        bands = {}
+        for i in range(mdl.rowCount()):
+            layer = mdl.item(i, 5).data(Qt.ItemDataRole.EditRole)
+            if layer.type() == QgsMapLayer.RasterLayer:
+                band = mdl.item(i, 3).data(Qt.ItemDataRole.EditRole)
+                bands.setdefault(layer.id(), (layer, []))[1].append(band)
+        jobs = []
+        corridorJobs = []
+        for layer, layerBands in bands.values():
+            points = [
+                self.tool.toLayerCoordinates(layer, QgsPointXY(*point)) for point in self.points
+            ]
+            points = [(point.x(), point.y()) for point in points]
+            cursor = self.tool.toLayerCoordinates(layer, QgsPointXY(*self.cursor))
+            cursor = (cursor.x(), cursor.y())
+            grid = self._grid(layer, self._sampleStep(layer, points, cursor))
+            if grid is None:
+                continue
+            # each thread reads through its own provider
+            provider = layer.dataProvider().clone()
+            if provider is None:
+                continue
+            tileCache().prepare(layer)
+            committed = segmentTiles(grid, points)
+            heading = segmentTiles(grid, points[-1:] + [cursor], CORRIDOR)
+            for tiles, target in ((committed, jobs), (heading, corridorJobs)):
+                for band in layerBands:
+                    target.extend(
+                        (layer.id(), layer.source(), provider, band, grid, tileRow, tileCol)
+                        for tileRow, tileCol in tiles
+                    )
+        return jobs + corridorJobs
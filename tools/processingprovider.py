@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from qgis.core import (
+    Qgis,
+    QgsCoordinateTransform,
+    QgsFeature,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterMultipleLayers,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterString,
+    QgsProcessingProvider,
+    QgsRasterLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QCoreApplication, QVariant
+from qgis.PyQt.QtGui import QIcon
+
+# resolution modes of DataReaderTool, in the order of the RESOLUTION choices
+RESOLUTION_MODES = ("full", "limited", "samples", "adaptive")
+
+
+class ProfileToolProvider(QgsProcessingProvider):
+    def id(self):
+        return "profiletool"
+
+    def name(self):
+        return "Profile tool"
+
+    def icon(self):
+        return QIcon(
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), "icons", "profileIcon.png")
+        )
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(ExtractProfilesAlgorithm())
+
+
+class LayerTransformer:
+    """Transforms points from the crs of the profile lines to the crs of a
+    layer, in place of the map tool given to DataReaderTool in the dock."""
+
+    def __init__(self, crs, transformContext):
+        self.crs = crs
+        self.transformContext = transformContext
+        self.transforms = {}  # layer crs (wkt) -> transform
+
+    def transform(self, layer):
+        key = layer.crs().toWkt()
+        if key not in self.transforms:
+            self.transforms[key] = QgsCoordinateTransform(
+                self.crs, layer.crs(), self.transformContext
+            )
+        return self.transforms[key]
+
+    def toLayerCoordinates(self, layer, point):
+        return self.transform(layer).transform(point)
+
+
+class ExtractProfilesAlgorithm(QgsProcessingAlgorithm):
+    """Extracts the profiles of rasters and point layers along every feature
+    of a line layer into one long table: feature id, layer, band (raster
+    band or point field index), chainage, x, y (line crs) and value.
+
+    Raster profiles are computed by a pool of worker threads, each one
+    reading through its own copy of the raster layers. Point layers are not
+    thread safe and are read by the algorithm thread.
+    """
+
+    INPUT = "INPUT"
+    RASTERS = "RASTERS"
+    BANDS = "BANDS"
+    POINTS = "POINTS"
+    FIELD = "FIELD"
+    BUFFER = "BUFFER"
+    RESOLUTION = "RESOLUTION"
+    TOLERANCE = "TOLERANCE"
+    WORKERS = "WORKERS"
+    OUTPUT = "OUTPUT"
+
+    def tr(self, message):
+        return QCoreApplication.translate("ExtractProfilesAlgorithm", message)
+
+    def createInstance(self):
+        return ExtractProfilesAlgorithm()
+
+    def name(self):
+        return "extractprofiles"
+
+    def displayName(self):
+        return self.tr("Extract profiles along lines")
+
+    def shortHelpString(self):
+        return self.tr(
+            "Extracts the profiles of rasters (chosen bands) and of point layers (value field) "
+            "along every feature of a line layer, as one table with feature id, layer, band, "
+            "chainage, x, y and value."
+        )
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT, self.tr("Profile lines"), [Qgis.ProcessingSourceType.VectorLine]
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterMultipleLayers(
+                self.RASTERS, self.tr("Rasters"), Qgis.ProcessingSourceType.Raster, optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.BANDS,
+                self.tr("Raster bands (comma separated, all bands if empty)"),
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterMultipleLayers(
+                self.POINTS,
+                self.tr("Point layers"),
+                Qgis.ProcessingSourceType.VectorPoint,
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.FIELD, self.tr("Value field of the point layers"), optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.BUFFER,
+                self.tr("Search buffer of the point layers"),
+                Qgis.ProcessingNumberParameterType.Double,
+                defaultValue=10.0,
+                minValue=0.0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.RESOLUTION,
+                self.tr("Raster resolution"),
+                [
+                    self.tr("Full resolution"),
+                    self.tr("Limited resolution (1000 samples per segment)"),
+                    self.tr("Line vertices only"),
+                    self.tr("Adaptive resolution"),
+                ],
+                defaultValue=0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCE,
+                self.tr("Vertical tolerance of the adaptive resolution"),
+                Qgis.ProcessingNumberParameterType.Double,
+                defaultValue=0.1,
+                minValue=0.0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.WORKERS,
+                self.tr("Worker threads"),
+                Qgis.ProcessingNumberParameterType.Integer,
+                defaultValue=min(4, os.cpu_count() or 1),
+                minValue=1,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT, self.tr("Profiles"), Qgis.ProcessingSourceType.VectorPoint
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        # imported on first run, not when the provider is registered
+        from .dataReaderTool import DataReaderTool, releaseLayer
+        from .rastercache import tileCache
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+        rasters = self.parameterAsLayerList(parameters, self.RASTERS, context)
+        points = self.parameterAsLayerList(parameters, self.POINTS, context)
+        bandsText = self.parameterAsString(parameters, self.BANDS, context)
+        field = self.parameterAsString(parameters, self.FIELD, context)
+        valbuf = self.parameterAsDouble(parameters, self.BUFFER, context)
+        mode = RESOLUTION_MODES[self.parameterAsEnum(parameters, self.RESOLUTION, context)]
+        tolerance = self.parameterAsDouble(parameters, self.TOLERANCE, context)
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+        if not rasters and not points:
+            raise QgsProcessingException(self.tr("Choose at least one raster or point layer"))
+        try:
+            bands = [int(band) for band in bandsText.replace(" ", "").split(",") if band]
+        except ValueError:
+            raise QgsProcessingException(self.tr("Invalid raster bands: {}").format(bandsText))
+
+        fields = QgsFields()
+        fields.append(QgsField("feature_id", QVariant.LongLong))
+        fields.append(QgsField("layer", QVariant.String))
+        fields.append(QgsField("band", QVariant.Int))
+        fields.append(QgsField("chainage", QVariant.Double))
+        fields.append(QgsField("x", QVariant.Double))
+        fields.append(QgsField("y", QVariant.Double))
+        fields.append(QgsField("value", QVariant.Double))
+        sink, destId = self.parameterAsSink(
+            parameters, self.OUTPUT, context, fields, QgsWkbTypes.Type.Point, source.sourceCrs()
+        )
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        # the polylines, read in the algorithm thread
+        lines = []
+        for feature in source.getFeatures():
+            geometry = feature.geometry()
+            if geometry.isEmpty():
+                continue
+            for part in geometry.constParts():
+                vertices = [[vertex.x(), vertex.y()] for vertex in part.vertices()]
+                if len(vertices) > 1:
+                    lines.append((feature.id(), vertices))
+
+        # rasters are opened again by each worker thread
+        rasterSources = [
+            (
+                raster.source(),
+                raster.name(),
+                raster.providerType(),
+                bands or list(range(1, raster.bandCount() + 1)),
+            )
+            for raster in rasters
+        ]
+        crs = source.sourceCrs()
+        transformContext = context.transformContext()
+        tileCache()  # created in the algorithm thread
+        local = threading.local()
+        opened = []  # raster layers opened by the workers
+        openedLock = threading.Lock()
+
+        def rasterProfiles(line):
+            featureId, vertices = line
+            if feedback.isCanceled():
+                return []
+            if not hasattr(local, "layers"):
+                local.layers = [QgsRasterLayer(*rasterSource[:3]) for rasterSource in rasterSources]
+                local.transformer = LayerTransformer(crs, transformContext)
+                with openedLock:
+                    opened.extend(local.layers)
+            profiles = []
+            for layer, rasterSource in zip(local.layers, rasterSources):
+                layerProfiles = [{"layer": layer, "band": band} for band in rasterSource[3]]
+                DataReaderTool().dataRasterBandsReaderTool(
+                    None, local.transformer, layerProfiles, vertices, mode, tolerance
+                )
+                profiles.extend(layerProfiles)
+            return profiles
+
+        transformer = LayerTransformer(crs, transformContext)
+        total = len(lines) or 1
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = (
+                    pool.map(rasterProfiles, lines) if rasterSources else ([] for line in lines)
+                )
+                for n, (line, profiles) in enumerate(zip(lines, results)):
+                    if feedback.isCanceled():
+                        break
+                    featureId, vertices = line
+                    for layer in points:
+                        fieldIndex = layer.fields().lookupField(field) if field else -1
+                        profile, _, _ = DataReaderTool().dataVectorReaderTool(
+                            None,
+                            transformer,
+                            {"layer": layer, "band": fieldIndex},
+                            vertices,
+                            valbuf,
+                            crs,
+                        )
+                        profiles.append(profile)
+                    for profile in profiles:
+                        self._addProfile(sink, fields, featureId, profile, transformer)
+                    feedback.setProgress(100.0 * (n + 1) / total)
+        finally:
+            for layer in opened:
+                releaseLayer(layer.id())
+        return {self.OUTPUT: destId}
+
+    @staticmethod
+    def _addProfile(sink, fields, featureId, profile, transformer):
+        """Add the samples of a profile to sink, x, y in the crs of the lines."""
+        layer = profile["layer"]
+        x = np.asarray(profile["x"], dtype=float)
+        y = np.asarray(profile["y"], dtype=float)
+        if layer.crs() != transformer.crs:
+            reverse = transformer.transform(layer)
+            mapped = [
+                reverse.transform(QgsPointXY(*point), Qgis.TransformDirection.Reverse)
+                for point in zip(x, y)
+            ]
+            x = np.array([point.x() for point in mapped])
+            y = np.array([point.y() for point in mapped])
+        features = []
+        for l, px, py, z in zip(profile["l"], x, y, profile["z"]):
+            feature = QgsFeature(fields)
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(float(px), float(py))))
+            # NaN are written as NULL
+            value = None if np.isnan(z) else float(z)
+            feature.setAttributes(
+                [
+                    featureId,
+                    layer.name(),
+                    int(profile["band"]),
+                    float(l),
+                    float(px),
+                    float(py),
+                    value,
+                ]
+            )
+            features.append(feature)
+        sink.addFeatures(features, QgsFeatureSink.Flag.FastInsert)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import io
+
+import numpy as np
+
+# number of samples formatted at once when writing a profile
+EXPORT_CHUNK_SIZE = 100000
+
+
+def _format(decimals):
+    """Return the format of a float with decimals, full precision (shortest
+    repr) if None."""
+    return "%r" if decimals is None else "%.{}f".format(decimals)
+
+
+def writeProfile(
+    profile,
+    fileobj,
+    keys=("l", "z"),
+    delimiter="\t",
+    decimals=None,
+    coordDecimals=None,
+    header=False,
+):
+    """Writes the columns keys of profile as delimited text to fileobj.
+
+    Values are written at full precision, or with a fixed precision if
+    given (coordDecimals for "x" and "y", decimals otherwise), missing
+    values as empty fields. EXPORT_CHUNK_SIZE samples are formatted at a
+    time, so that large profiles are streamed instead of built as one
+    string.
+    """
+    columns = np.column_stack([np.asarray(profile[key], dtype=float) for key in keys])
+    row = delimiter.join(_format(coordDecimals if key in ("x", "y") else decimals) for key in keys)
+    if header:
+        fileobj.write(delimiter.join(keys) + "\n")
+    for start in range(0, len(columns), EXPORT_CHUNK_SIZE):
+        chunk = columns[start : start + EXPORT_CHUNK_SIZE]
+        # the whole chunk is formatted at once, missing values blanked after
+        text = ((row + "\n") * len(chunk)) % tuple(chunk.ravel().tolist())
+        fileobj.write(text.replace("nan", ""))
+
+
+def profileToText(profile, keys=("l", "z"), delimiter="\t", **kwargs):
+    """Returns the columns keys of profile as delimited text."""
+    buffer = io.StringIO()
+    writeProfile(profile, buffer, keys, delimiter, **kwargs)
+    return buffer.getvalue()
+
+
+def saveProfile(profile, fileName, keys=("l", "x", "y", "z"), **kwargs):
+    """Writes the columns keys of profile to fileName, with a header line.
+
+    The file is comma separated if fileName ends with .csv, tab separated
+    otherwise.
+    """
+    delimiter = "," if fileName.lower().endswith(".csv") else "\t"
+    with open(fileName, "w", newline="") as fileobj:
+        writeProfile(profile, fileobj, keys, delimiter, header=True, **kwargs)
@@ -32,7 +32,7 @@ def height(p):
     Returns the x (distance from origin) and y (height)
     coordinates for the plot.
     """
-    return p["l"], p["z"]
+    return np.asarray(p["l"], dtype=float), np.asarray(p["z"], dtype=float)
 
 
 def slopes_pct(p):
@@ -63,4 +63,16 @@ def slopes_deg(p):
     return x, slope_deg
 
 
+def plot_extent(y):
+    """Return the (min, max) of the plot values y, ignoring NaN.
+
+    Returns None if y has no finite value.
+    """
+    y = np.asarray(y, dtype=float)
+    finite = y[np.isfinite(y)]
+    if finite.size == 0:
+        return None
+    return float(finite.min()), float(finite.max())
+
+
 PLOT_PROFILERS = {"Height": height, "Slope (%)": slopes_pct, "Slope (°)": slopes_deg}
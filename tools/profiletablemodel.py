@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import numpy as np
+from qgis.PyQt.QtCore import QAbstractTableModel, QCoreApplication, QModelIndex, Qt
+
+
+class ProfileTableModel(QAbstractTableModel):
+    """Read-only table model of one profile, one row per sample.
+
+    Values are served from the profile's "l", "z" (and optionally "x", "y")
+    arrays: no item is allocated per sample. Rows are handed to the view in
+    batches of BATCH_SIZE as it scrolls (canFetchMore/fetchMore).
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, profile, withCoordinates=False, decimals=3, coordDecimals=3, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        keys = ["l", "x", "y", "z"] if withCoordinates else ["l", "z"]
+        titles = {
+            "l": QCoreApplication.translate("ProfileTableModel", "Distance"),
+            "x": "X",
+            "y": "Y",
+            "z": QCoreApplication.translate("ProfileTableModel", "Value"),
+        }
+        self.headers = [titles[key] for key in keys]
+        self.arrays = [np.asarray(profile[key], dtype=float) for key in keys]
+        self.formats = [
+            "{:.%df}" % (coordDecimals if key in ("x", "y") else decimals) for key in keys
+        ]
+        self.sampleCount = len(self.arrays[0])
+        self.loadedRows = min(self.BATCH_SIZE, self.sampleCount)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loadedRows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.arrays)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loadedRows < self.sampleCount
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.BATCH_SIZE, self.sampleCount - self.loadedRows)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loadedRows, self.loadedRows + count - 1)
+        self.loadedRows += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self.arrays[index.column()][index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if np.isnan(value):
+                return ""
+            return self.formats[index.column()].format(value)
+        elif role == Qt.ItemDataRole.EditRole:
+            return float(value)
+        elif role == Qt.ItemDataRole.TextAlignmentRole:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return section + 1
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled
@@ -34,7 +34,7 @@ from qgis.core import QgsGeometry, QgsMapLayer, QgsPoint, QgsPointXY, QgsProject
 from qgis.core import QgsVectorLayer, QgsFeature, QgsWkbTypes
 
 # from qgis.gui import *
-from qgis.PyQt.QtCore import QSettings, Qt
+from qgis.PyQt.QtCore import QSettings, Qt, QTimer
 
 # from qgis.PyQt.QtGui import QColor
 # from qgis.PyQt.QtSvg import *  # required in some distros
@@ -49,6 +49,13 @@ from .plottingtool import PlottingTool
 from .ptmaptool import ProfiletoolMapToolRenderer
 from .selectlinetool import SelectLineTool
 
+# minimum delay between two redraws of the matplotlib cursor (ms)
+MPL_CURSOR_INTERVAL = 16
+# picked profile points are written when this many are buffered,
+# or at most this delay (ms) after the first buffered pick
+POINT_BUFFER_SIZE = 100
+POINT_BUFFER_DELAY = 250
+
 
 class ProfileToolCore(QWidget):
     def __init__(self, iface, plugincore, parent=None):
@@ -71,6 +78,8 @@ class ProfileToolCore(QWidget):
         self.profiles = None
         # The line information
         self.pointstoDraw = []
+        # vertices of pointstoDraw and their cumulative distance, for cursor lookups
+        self.chainageIndex = (np.empty((0, 2)), np.empty(0))
         # he renderer for temporary polyline
         # self.toolrenderer = ProfiletoolMapToolRenderer(self)
         self.toolrenderer = None
@@ -79,6 +88,15 @@ class ProfileToolCore(QWidget):
         # Used to remove highlighting from previously active layer.
         self.previousLayerId = None
         self.x_cursor = None  # Keep track of last x position of cursor
+        self.mplCursor = None  # State of the blitted matplotlib cursor
+        # layer "profile_points" and the picked points not yet written to it
+        self.pointLayer = None
+        self.pointBuffer = []
+        self.pointBufferTimer = QTimer()
+        self.pointBufferTimer.setSingleShot(True)
+        self.pointBufferTimer.setInterval(POINT_BUFFER_DELAY)
+        self.pointBufferTimer.timeout.connect(self.flushPointBuffer)
+        self.instance.layerWillBeRemoved.connect(self.layerWillBeRemoved)
         # the dockwidget
         self.dockwidget = PTDockWidget(self.iface, self)
         # Initialize the dockwidget combo box with the list of available profiles.
@@ -95,6 +113,9 @@ class ProfileToolCore(QWidget):
         self.saveTool = (
             self.iface.mapCanvas().mapTool()
         )  # Save the standard mapttool for restoring it at the end
+        if self.toolrenderer:
+            # the prefetch threads of the replaced tool are stopped, as in cleaning
+            self.toolrenderer.prefetcher.stop()
         # Listeners of mouse
         self.toolrenderer = ProfiletoolMapToolRenderer(self)
         self.toolrenderer.connectTool()
@@ -167,9 +188,14 @@ class ProfileToolCore(QWidget):
         # if points1:
         #    points1 = points1 + [points1[-1]]
         self.pointstoDraw = points1
+        self.updateChainageIndex()
         self.profiles = []
         self.distancesPicked = []
 
+        resolution_mode = self.dockwidget.resolutionMode()
+        # rows of the same raster layer (with different bands) are read together
+        rasterRows = {}
+
         # calculate profiles
         for i in range(0, self.dockwidget.mdl.rowCount()):
             self.profiles.append(
@@ -189,24 +215,27 @@ class ProfileToolCore(QWidget):
                     float(self.dockwidget.mdl.item(i, 4).data(Qt.ItemDataRole.EditRole)),
                 )
             else:
-                if self.dockwidget.profileInterpolationCheckBox.isChecked():
-                    if self.dockwidget.fullResolutionCheckBox.isChecked():
-                        resolution_mode = "full"
-                    else:
-                        resolution_mode = "limited"
-                else:
-                    resolution_mode = "samples"
-
-                self.profiles[i] = DataReaderTool().dataRasterReaderTool(
-                    self.iface,
-                    self.toolrenderer.tool,
-                    self.profiles[i],
-                    self.pointstoDraw,
-                    resolution_mode,
-                )
+                rasterRows.setdefault(self.profiles[i]["layer"].id(), []).append(i)
             # Plotting coordinate values are initialized on plotProfil
-            self.profiles[i]["plot_x"] = []
-            self.profiles[i]["plot_y"] = []
+            self.profiles[i]["plot_x"] = np.empty(0)
+            self.profiles[i]["plot_y"] = np.empty(0)
+            self.profiles[i]["plot_extent"] = None
+            self.profiles[i]["plot_envelope"] = None
+
+        for rows in rasterRows.values():
+            DataReaderTool().dataRasterBandsReaderTool(
+                self.iface,
+                self.toolrenderer.tool,
+                [self.profiles[i] for i in rows],
+                self.pointstoDraw,
+                resolution_mode,
+                self.dockwidget.adaptiveToleranceSpinBox.value(),
+                (
+                    self.dockwidget.swathWidthSpinBox.value()
+                    if self.dockwidget.swathCheckBox.isChecked()
+                    else None
+                ),
+            )
 
         if plotProfil:
             self.plotProfil()
@@ -244,79 +273,140 @@ class ProfileToolCore(QWidget):
         profile_func = profilers.PLOT_PROFILERS[self.dockwidget.plotComboBox.currentText()]
 
         for profile in self.profiles:
-            profile["plot_x"], profile["plot_y"] = profile_func(profile)
+            plot_x, plot_y = profile_func(profile)
+            profile["plot_x"] = np.asarray(plot_x, dtype=float)
+            profile["plot_y"] = np.asarray(plot_y, dtype=float)
+            # cached (min, max) of plot_y, used for automatic rescaling
+            profile["plot_extent"] = profilers.plot_extent(profile["plot_y"])
+            # min-max envelope of swath profiles, on the height plot
+            if "zmin" in profile and profile_func is profilers.height:
+                profile["plot_envelope"] = (profile["zmin"], profile["zmax"])
+            else:
+                profile["plot_envelope"] = None
 
         # plot profiles
         PlottingTool().attachCurves(
             self.dockwidget, self.profiles, self.dockwidget.mdl, self.dockwidget.plotlibrary
         )
         PlottingTool().reScalePlot(self.dockwidget, self.profiles, self.dockwidget.plotlibrary)
-        # create tab with profile xy
-        self.dockwidget.updateCoordinateTab()
+        # tab with profile xy is rebuilt when it is shown
+        self.dockwidget.invalidateCoordinateTab()
         # Mouse tracking
 
         self.updateCursorOnMap(self.x_cursor)
         self.enableMouseCoordonates(self.dockwidget.plotlibrary)
 
+    def updateChainageIndex(self):
+        """Caches the cumulative vertex distances of self.pointstoDraw.
+
+        Computed once per profile so that mapping a plot distance back to the
+        map does not need to build a QgsGeometry on every mouse move.
+        """
+        vertices = np.array(self.pointstoDraw, dtype=float).reshape(-1, 2)
+        chainage = np.zeros(len(vertices))
+        if len(vertices) > 1:
+            np.cumsum(np.hypot(*np.diff(vertices, axis=0).T), out=chainage[1:])
+        self.chainageIndex = (vertices, chainage)
+
+    def pointAtChainage(self, x):
+        """Returns the QgsPointXY at distance x along self.pointstoDraw.
+
+        Returns None if x is outside of the polyline.
+        """
+        vertices, chainage = self.chainageIndex
+        if len(vertices) == 0:
+            return None
+        if len(vertices) == 1:
+            return QgsPointXY(*vertices[0])
+        if not 0 <= x <= chainage[-1]:
+            return None
+        i = int(np.searchsorted(chainage, x, side="right")) - 1
+        i = min(max(i, 0), len(chainage) - 2)
+        seglen = chainage[i + 1] - chainage[i]
+        t = (x - chainage[i]) / seglen if seglen > 0 else 0.0
+        px, py = vertices[i] + t * (vertices[i + 1] - vertices[i])
+        return QgsPointXY(float(px), float(py))
+
     def setPointOnMap(self, x, y):
         self.x_cursor = x
         if self.pointstoDraw and self.doTracking:
             if x is not None:
-                points = [QgsPointXY(*p) for p in self.pointstoDraw]
-                geom = QgsGeometry.fromPolylineXY(points)
-                try:
-                    if len(points) > 1:
-                        pointprojected = geom.interpolate(x).asPoint()
-                    else:
-                        pointprojected = points[0]
-                except (IndexError, AttributeError, ValueError):
-                    pointprojected = None
+                pointprojected = self.pointAtChainage(x)
 
                 if pointprojected:
-                    try:
-                        # test if self.pointLayer does not exist or layer was deleted
-                        if not self.pointLayer:
-                            pass
-                    except:
-                        self.pointLayer = None
-                        layers = QgsProject.instance().mapLayersByName('profile_points')
-                        if layers:
-                            layer = layers[0]
-                            hasFields = all(v in [f.name() for f in layer.fields()] for v in ['d','z'])
-                            if hasFields and layer.type() == QgsMapLayer.VectorLayer and layer.geometryType() == QgsWkbTypes.PointGeometry:
-                                self.pointLayer = layer
-                            
-                    if not self.pointLayer:
-                        # create temporary profile point layer (horizontal distance=d, raster band value=z)
-                        self.pointLayer = QgsVectorLayer("Point?field=z:double&field=d:double&index=yes&crs="+QgsProject.instance().crs().authid(),"profile_points","memory")
-                        QgsProject.instance().addMapLayer(self.pointLayer)
-
-                    provider = self.pointLayer.dataProvider()
-                    feat = QgsFeature(self.pointLayer.fields())
+                    layer = self.getPointLayer()
+                    feat = QgsFeature(layer.fields())
                     feat.setGeometry(QgsGeometry.fromPointXY(pointprojected))
-                    feat['d'] = x.item()
-                    feat['z'] = y.item()
-                    provider.addFeatures([feat])
-                    self.iface.messageBar().pushMessage("Profile Tool", "Point added to layer \"profile_points\"", level=Qgis.Info)
-                    qmlPath = os.path.dirname(__file__)
-                    qmlPath = os.path.dirname(qmlPath)
-                    self.pointLayer.loadNamedStyle(qmlPath+'/profile_points/profile_points.qml')
-                    self.pointLayer.updateExtents()
-                    self.pointLayer.triggerRepaint()
+                    feat["d"] = float(x)
+                    feat["z"] = float(y)
+                    # picked points are written in batches, see flushPointBuffer
+                    self.pointBuffer.append(feat)
+                    if len(self.pointBuffer) >= POINT_BUFFER_SIZE:
+                        self.flushPointBuffer()
+                    elif not self.pointBufferTimer.isActive():
+                        self.pointBufferTimer.start()
+
+    def getPointLayer(self):
+        """Returns the "profile_points" layer, binding or creating it if needed.
+
+        The layer is cached until it is removed from the project.
+        """
+        if self.pointLayer is None:
+            layers = QgsProject.instance().mapLayersByName("profile_points")
+            if layers:
+                layer = layers[0]
+                hasFields = all(v in [f.name() for f in layer.fields()] for v in ["d", "z"])
+                if (
+                    hasFields
+                    and layer.type() == QgsMapLayer.VectorLayer
+                    and layer.geometryType() == QgsWkbTypes.PointGeometry
+                ):
+                    self.pointLayer = layer
+
+            if self.pointLayer is None:
+                # create temporary profile point layer (horizontal distance=d, raster band value=z)
+                self.pointLayer = QgsVectorLayer(
+                    "Point?field=z:double&field=d:double&index=yes&crs="
+                    + QgsProject.instance().crs().authid(),
+                    "profile_points",
+                    "memory",
+                )
+                QgsProject.instance().addMapLayer(self.pointLayer)
+
+            qmlPath = os.path.dirname(os.path.dirname(__file__))
+            self.pointLayer.loadNamedStyle(
+                os.path.join(qmlPath, "profile_points", "profile_points.qml")
+            )
+        return self.pointLayer
+
+    def flushPointBuffer(self):
+        """Writes the buffered picked points to the "profile_points" layer."""
+        self.pointBufferTimer.stop()
+        if not self.pointBuffer or self.pointLayer is None:
+            self.pointBuffer = []
+            return
+        count = len(self.pointBuffer)
+        self.pointLayer.dataProvider().addFeatures(self.pointBuffer)
+        self.pointBuffer = []
+        self.pointLayer.updateExtents()
+        self.pointLayer.triggerRepaint()
+        self.iface.messageBar().pushMessage(
+            "Profile Tool",
+            '{} point(s) added to layer "profile_points"'.format(count),
+            level=Qgis.Info,
+        )
+
+    def layerWillBeRemoved(self, layerId):
+        if self.pointLayer is not None and self.pointLayer.id() == layerId:
+            self.pointBufferTimer.stop()
+            self.pointBuffer = []
+            self.pointLayer = None
 
     def updateCursorOnMap(self, x):
         self.x_cursor = x
         if self.pointstoDraw and self.doTracking:
             if x is not None:
-                points = [QgsPointXY(*p) for p in self.pointstoDraw]
-                geom = QgsGeometry.fromPolylineXY(points)
-                try:
-                    if len(points) > 1:
-                        pointprojected = geom.interpolate(x).asPoint()
-                    else:
-                        pointprojected = points[0]
-                except (IndexError, AttributeError, ValueError):
-                    pointprojected = None
+                pointprojected = self.pointAtChainage(x)
 
                 if pointprojected:
                     self.toolrenderer.rubberbandpoint.setCenter(pointprojected)
@@ -336,17 +426,23 @@ class ProfileToolCore(QWidget):
                 break
 
     def cleaning(self):
+        self.flushPointBuffer()
         self.clearProfil()
         if self.toolrenderer:
             self.toolrenderer.cleaning()
+            # the prefetch threads must not outlive the tool (plugin unload)
+            self.toolrenderer.prefetcher.stop()
         with suppress(AttributeError, RuntimeError, TypeError):
             self.instance.layersRemoved.disconnect()
+        with suppress(AttributeError, RuntimeError, TypeError):
+            self.instance.layerWillBeRemoved.disconnect(self.layerWillBeRemoved)
 
     # ******************************************************************************************
     # **************************** mouse interaction *******************************************
     # ******************************************************************************************
 
     def activateMouseTracking(self, int1):
+        self.disconnectMplCursor()
         if self.dockwidget.TYPE == "PyQtGraph":
 
             if int1 == 2:
@@ -357,36 +453,85 @@ class ProfileToolCore(QWidget):
         elif self.dockwidget.TYPE == "Matplotlib":
             if int1 == 2:
                 self.doTracking = True
-                self.cid = self.dockwidget.plotWdg.mpl_connect(
-                    "motion_notify_event", self.mouseevent_mpl
-                )
+                self.connectMplCursor()
             elif int1 == 0:
                 self.doTracking = False
-                with suppress(AttributeError, RuntimeError, TypeError):
-                    self.dockwidget.plotWdg.mpl_disconnect(self.cid)
-                try:
-                    if self.vline:
-                        self.dockwidget.plotWdg.figure.get_axes()[0].lines.remove(self.vline)
-                        self.dockwidget.plotWdg.draw()
-                except Exception as e:
-                    print(str(e))
+
+    # Matplotlib cursor: the vertical line is an animated artist which is
+    # blitted over a cached background instead of redrawing the whole figure.
+
+    def connectMplCursor(self):
+        canvas = self.dockwidget.plotWdg
+        self.mplCursor = {
+            "canvas": canvas,
+            "vline": None,
+            "background": None,
+            "x": None,
+            "timer": QTimer(),
+            "cids": [
+                canvas.mpl_connect("motion_notify_event", self.mouseevent_mpl),
+                canvas.mpl_connect("draw_event", self.drawevent_mpl),
+            ],
+        }
+        self.mplCursor["timer"].setSingleShot(True)
+        self.mplCursor["timer"].setInterval(MPL_CURSOR_INTERVAL)
+        self.mplCursor["timer"].timeout.connect(self.blitMplCursor)
+        canvas.draw_idle()
+
+    def disconnectMplCursor(self):
+        cursor = self.mplCursor
+        if cursor is None:
+            return
+        self.mplCursor = None
+        cursor["timer"].stop()
+        with suppress(AttributeError, RuntimeError, TypeError, ValueError):
+            for cid in cursor["cids"]:
+                cursor["canvas"].mpl_disconnect(cid)
+            if cursor["vline"] is not None:
+                cursor["vline"].remove()
+            cursor["canvas"].draw_idle()
+
+    def drawevent_mpl(self, event):
+        """Caches the plot background after every full redraw."""
+        cursor = self.mplCursor
+        if cursor is None:
+            return
+        axe = cursor["canvas"].figure.get_axes()[0]
+        cursor["background"] = cursor["canvas"].copy_from_bbox(axe.bbox)
+        if cursor["vline"] is None or cursor["vline"].axes is not axe:
+            # the axe was cleared (cla) since the line was created
+            cursor["vline"] = axe.axvline(0, linewidth=2, color="k", animated=True)
+            cursor["vline"].set_visible(False)
+        if cursor["x"] is not None:
+            self.blitMplCursor()
 
     def mouseevent_mpl(self, event):
         """
         case matplotlib library
         """
-        if event.xdata:
-            try:
-                if self.vline:
-                    self.dockwidget.plotWdg.figure.get_axes()[0].lines.remove(self.vline)
-            except Exception:
-                pass
-            xdata = float(event.xdata)
-            self.vline = self.dockwidget.plotWdg.figure.get_axes()[0].axvline(
-                xdata, linewidth=2, color="k"
-            )
-            self.dockwidget.plotWdg.draw()
-            self.updateCursorOnMap(xdata)
+        cursor = self.mplCursor
+        if cursor is None or not event.xdata:
+            return
+        cursor["x"] = float(event.xdata)
+        # throttle to one frame per refresh interval
+        if not cursor["timer"].isActive():
+            cursor["timer"].start()
+
+    def blitMplCursor(self):
+        cursor = self.mplCursor
+        if cursor is None or cursor["background"] is None or cursor["x"] is None:
+            return
+        canvas = cursor["canvas"]
+        axe = canvas.figure.get_axes()[0]
+        if cursor["vline"].axes is not axe:
+            # wait for the next full draw to cache the new background
+            return
+        canvas.restore_region(cursor["background"])
+        cursor["vline"].set_xdata([cursor["x"], cursor["x"]])
+        cursor["vline"].set_visible(True)
+        axe.draw_artist(cursor["vline"])
+        canvas.blit(axe.bbox)
+        self.updateCursorOnMap(cursor["x"])
 
     def enableMouseCoordonates(self, library):
         if library == "PyQtGraph":
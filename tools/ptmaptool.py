@@ -28,6 +28,7 @@ from qgis.gui import QgsMapTool, QgsRubberBand, QgsVertexMarker
 from qgis.PyQt.QtCore import Qt, pyqtSignal
 from qgis.PyQt.QtGui import QColor, QCursor
 
+from .prefetcher import TilePrefetcher
 from .selectlinetool import SelectLineTool
 
 
@@ -42,6 +43,8 @@ class ProfiletoolMapToolRenderer:
         self.pointstoDraw = []  # Polyline being drawn in freehand mode
         self.dblclktemp = None  # enable disctinction between leftclick and doubleclick
         self.isPlotting = False
+        # warms the raster tile cache while the polyline is drawn
+        self.prefetcher = TilePrefetcher(self.profiletool, self.tool)
         # the rubberband
         self.rubberband = QgsRubberBand(
             self.iface.mapCanvas(), QgsWkbTypes.GeometryType.LineGeometry
@@ -83,11 +86,13 @@ class ProfiletoolMapToolRenderer:
                 # Draw on temp layer
                 self.updateRubberBand()
                 self.rubberband.addPoint(QgsPointXY(mapPos.x(), mapPos.y()))
+                self.prefetcher.update(self.pointstoDraw, (mapPos.x(), mapPos.y()))
         if self.selectionmethod in (1, 2):
             return
 
     def rightClicked(self, position):  # used to quit the current action
         if self.selectionmethod == 0:
+            self.prefetcher.cancel()
             if self.isPlotting:
                 self.updateRubberBand()
                 self.isPlotting = False
@@ -160,6 +165,7 @@ class ProfiletoolMapToolRenderer:
             self.rubberbandbuf.addGeometry(g, None)
 
     def cleaning(self):  # used on right click
+        self.prefetcher.cancel()
         self.pointstoDraw = []
         self.rubberbandpoint.hide()
         self.resetRubberBand()
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from qgis.core import Qgis, QgsProject, QgsRasterRange, QgsRectangle
+from qgis.PyQt.QtCore import QSettings
+
+# raster blocks are read and cached in tiles of TILE_SIZE x TILE_SIZE pixels
+TILE_SIZE = 256
+# memory budget of the tile cache (MB), setting "profiletool/tileCacheSize"
+DEFAULT_CACHE_SIZE = 256
+
+# raster data type -> numpy type of the block data and of the cached tile
+_DATA_TYPES = (
+    ("Byte", np.uint8, np.float32),
+    ("Int8", np.int8, np.float32),
+    ("UInt16", np.uint16, np.float32),
+    ("Int16", np.int16, np.float32),
+    ("UInt32", np.uint32, np.float64),
+    ("Int32", np.int32, np.float64),
+    ("Float32", np.float32, np.float32),
+    ("Float64", np.float64, np.float64),
+)
+
+
+def _numpyTypes(dataType):
+    for name, blockType, tileType in _DATA_TYPES:
+        if dataType == getattr(Qgis.DataType, name, None):
+            return blockType, tileType
+    return None
+
+
+def noDataRanges(provider, band):
+    """Return the user no data ranges of a band of provider as a list of
+    (min, max, includeMin, includeMax), NaN bounds are open."""
+    ranges = []
+    for noDataRange in provider.userNoDataValues(band):
+        bounds = noDataRange.bounds()
+        includeMin = bounds in (QgsRasterRange.IncludeMinAndMax, QgsRasterRange.IncludeMin)
+        includeMax = bounds in (QgsRasterRange.IncludeMinAndMax, QgsRasterRange.IncludeMax)
+        ranges.append((noDataRange.min(), noDataRange.max(), includeMin, includeMax))
+    return ranges
+
+
+def maskNoData(values, ranges=(), noDataValue=None):
+    """Set to NaN (in place) the float values equal to noDataValue or
+    inside one of the no data ranges (see noDataRanges)."""
+    if noDataValue is not None:
+        values[values == noDataValue] = np.nan
+    for low, high, includeMin, includeMax in ranges:
+        mask = np.ones(values.shape, dtype=bool)
+        if not np.isnan(low):
+            mask &= (values >= low) if includeMin else (values > low)
+        if not np.isnan(high):
+            mask &= (values <= high) if includeMax else (values < high)
+        values[mask] = np.nan
+    return values
+
+
+def blockToArray(block, rows, cols, ranges=()):
+    """Return the values of a QgsRasterBlock as float array, no data as NaN.
+
+    Blocks without no data value flag the pixels inside the user no data
+    ranges of the provider, ranges (see noDataRanges) masks them without
+    reading the flags pixel by pixel.
+    """
+    types = _numpyTypes(block.dataType())
+    if not block.isValid() or types is None:
+        return np.full((rows, cols), np.nan)
+    blockType, tileType = types
+    values = (
+        np.frombuffer(bytes(block.data()), dtype=blockType).reshape(rows, cols).astype(tileType)
+    )
+    noDataValue = block.noDataValue() if block.hasNoDataValue() else None
+    return maskNoData(values, ranges, noDataValue)
+
+
+class RasterGrid:
+    """Pixel grid of a raster data provider, maps coordinates to pixels.
+
+    cols and rows select an overview level of the raster, by default the
+    grid has the full resolution.
+    """
+
+    def __init__(self, provider, cols=None, rows=None):
+        extent = provider.extent()
+        self.cols = cols or provider.xSize()
+        self.rows = rows or provider.ySize()
+        self.xMin = extent.xMinimum()
+        self.yMax = extent.yMaximum()
+        self.pixelX = extent.width() / self.cols
+        self.pixelY = extent.height() / self.rows
+        self.tileCols = -(-self.cols // TILE_SIZE)
+
+    @classmethod
+    def forStep(cls, provider, step=None):
+        """Return the grid of the coarsest overview whose pixels are not
+        larger than step, the full resolution grid if there is none."""
+        if step:
+            for cols, rows in sorted(overviewSizes(provider)):
+                grid = cls(provider, cols, rows)
+                if max(grid.pixelX, grid.pixelY) <= step:
+                    return grid
+        return cls(provider)
+
+    def pixels(self, x, y):
+        """Return row and col of the pixels containing x, y and the mask of
+        the coordinates inside the grid, as arrays."""
+        col = np.floor((np.asarray(x, dtype=float) - self.xMin) / self.pixelX)
+        row = np.floor((self.yMax - np.asarray(y, dtype=float)) / self.pixelY)
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        return row[inside].astype(np.int64), col[inside].astype(np.int64), inside
+
+    def tileExtent(self, tileRow, tileCol):
+        """Return extent, rows and cols of a tile."""
+        rows = min(TILE_SIZE, self.rows - tileRow * TILE_SIZE)
+        cols = min(TILE_SIZE, self.cols - tileCol * TILE_SIZE)
+        xMin = self.xMin + tileCol * TILE_SIZE * self.pixelX
+        yMax = self.yMax - tileRow * TILE_SIZE * self.pixelY
+        extent = QgsRectangle(xMin, yMax - rows * self.pixelY, xMin + cols * self.pixelX, yMax)
+        return extent, rows, cols
+
+
+def overviewSizes(provider):
+    """Return (cols, rows) of the existing overviews (pyramids) of a provider."""
+    sizes = []
+    try:
+        pyramids = provider.buildPyramidList()
+    except AttributeError:
+        return sizes
+    for pyramid in pyramids:
+        if hasattr(pyramid, "getExists"):  # QGIS >= 3.20
+            exists, cols, rows = pyramid.getExists(), pyramid.getXDim(), pyramid.getYDim()
+        else:
+            exists, cols, rows = pyramid.exists, pyramid.xDim, pyramid.yDim
+        if exists and cols > 0 and rows > 0:
+            sizes.append((cols, rows))
+    return sizes
+
+
+class RasterTileCache:
+    """LRU cache of raster tiles, keyed by layer id, band, overview level
+    (grid size) and tile index.
+
+    Readers with their own tiling (COG blocks) cache their tiles under their
+    own keys, whose first item identifies the reader or the layer.
+    Tiles are evicted, least recently used first, when their total size
+    exceeds the memory budget. The tiles of a layer are dropped when the
+    layer is removed, reloaded or its data source changes. Tiles can be
+    prefetched from a background thread, the cache is guarded by a lock.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget  # bytes
+        # (layer id, band, grid cols, grid rows, tile row, tile col) -> array
+        self.tiles = OrderedDict()
+        self.size = 0
+        self.sources = {}  # layer id -> data source of its cached tiles
+        self.watched = set()  # ids of layers whose change signals are connected
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def canSample(layer):
+        """True if the raster layer can be read by blocks (its provider has a size)."""
+        provider = layer.dataProvider()
+        return provider is not None and provider.xSize() > 0 and provider.ySize() > 0
+
+    def setBudget(self, budget):
+        with self.lock:
+            self.budget = budget
+            self._evict()
+
+    def clear(self):
+        with self.lock:
+            self.tiles.clear()
+            self.size = 0
+            self.sources.clear()
+
+    def invalidateLayer(self, layerId):
+        with self.lock:
+            for key in [key for key in self.tiles if key[0] == layerId]:
+                self.size -= self.tiles.pop(key).nbytes
+            self.sources.pop(layerId, None)
+
+    def _checkSource(self, layer):
+        layerId = layer.id()
+        if layerId not in self.watched:
+            self.watched.add(layerId)
+            layer.dataChanged.connect(lambda: self.invalidateLayer(layerId))
+            layer.willBeDeleted.connect(lambda: self.watched.discard(layerId))
+        source = layer.source()
+        with self.lock:
+            if self.sources.get(layerId) != source:
+                self.invalidateLayer(layerId)
+                self.sources[layerId] = source
+
+    def _evict(self):
+        while self.size > self.budget and self.tiles:
+            _, values = self.tiles.popitem(last=False)
+            self.size -= values.nbytes
+
+    def insert(self, key, values):
+        """Cache the array values under key, its first item is the layer id
+        (or another id given to invalidateLayer)."""
+        with self.lock:
+            if key not in self.tiles:
+                self.tiles[key] = values
+                self.size += values.nbytes
+                self._evict()
+
+    def lookup(self, key):
+        """Return the array cached under key, None on a miss."""
+        with self.lock:
+            values = self.tiles.get(key)
+            if values is not None:
+                self.tiles.move_to_end(key)
+            return values
+
+    def tile(self, layer, band, grid, tileRow, tileCol):
+        """Return the values of a tile of grid, read from the provider on a miss."""
+        self._checkSource(layer)
+        key = (layer.id(), band, grid.cols, grid.rows, tileRow, tileCol)
+        values = self.lookup(key)
+        if values is not None:
+            return values
+        extent, rows, cols = grid.tileExtent(tileRow, tileCol)
+        provider = layer.dataProvider()
+        values = blockToArray(
+            provider.block(band, extent, cols, rows), rows, cols, noDataRanges(provider, band)
+        )
+        self.insert(key, values)
+        return values
+
+    def prepare(self, layer):
+        """Register the data source of a layer before its tiles are prefetched."""
+        self._checkSource(layer)
+
+    def prefetch(self, layerId, source, provider, band, grid, tileRow, tileCol):
+        """Read a tile into the cache if it is missing, in a background thread.
+
+        provider is a clone of the layer data provider owned by the thread,
+        the tile is dropped if the data source of the layer changed meanwhile.
+        """
+        key = (layerId, band, grid.cols, grid.rows, tileRow, tileCol)
+        with self.lock:
+            if key in self.tiles or self.sources.get(layerId) != source:
+                return
+        extent, rows, cols = grid.tileExtent(tileRow, tileCol)
+        values = blockToArray(
+            provider.block(band, extent, cols, rows), rows, cols, noDataRanges(provider, band)
+        )
+        with self.lock:
+            if self.sources.get(layerId) == source:
+                self.insert(key, values)
+
+    def sample(self, layer, band, x, y, step=None):
+        """Return the values of band at the coordinates x, y (layer crs) as
+        float array, NaN outside the raster and for no data.
+
+        With a step (distance between the samples, in layer units) the values
+        are read from the coarsest overview whose pixels are not larger.
+        """
+        grid = RasterGrid.forStep(layer.dataProvider(), step)
+        z = np.full(len(x), np.nan)
+        row, col, inside = grid.pixels(x, y)
+        if not len(row):
+            return z
+        index = np.flatnonzero(inside)
+        tileIds = (row // TILE_SIZE) * grid.tileCols + col // TILE_SIZE
+        order = np.argsort(tileIds, kind="stable")
+        tileIds, starts = np.unique(tileIds[order], return_index=True)
+        for tileId, start, end in zip(tileIds, starts, np.append(starts[1:], len(order))):
+            tileRow, tileCol = divmod(int(tileId), grid.tileCols)
+            values = self.tile(layer, band, grid, tileRow, tileCol)
+            selected = order[start:end]
+            z[index[selected]] = values[
+                row[selected] - tileRow * TILE_SIZE, col[selected] - tileCol * TILE_SIZE
+            ]
+        return z
+
+
+_tileCache = None
+
+
+def tileCache():
+    """Return the tile cache shared by all profiles and layers."""
+    global _tileCache
+    if _tileCache is None:
+        size = QSettings().value("profiletool/tileCacheSize", DEFAULT_CACHE_SIZE, type=int)
+        _tileCache = RasterTileCache(size * 1024 * 1024)
+        QgsProject.instance().layerWillBeRemoved.connect(_tileCache.invalidateLayer)
+    return _tileCache
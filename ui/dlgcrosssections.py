@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------
+#
+# Profile
+# Copyright (C) 2012  Patrice Verchere
+# -----------------------------------------------------------
+#
+# licensed under the terms of GNU GPL 2
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# ---------------------------------------------------------------------
+import os
+
+from qgis.core import QgsMapLayer, QgsPointXY, QgsRectangle, QgsWkbTypes
+from qgis.gui import QgsRubberBand
+from qgis.PyQt import uic
+from qgis.PyQt.QtCore import QSettings, Qt
+from qgis.PyQt.QtGui import QColor
+from qgis.PyQt.QtWidgets import QDialog, QMessageBox
+
+from .. import pyqtgraph as pg
+from ..tools.crosssections import sampleSections, saveSections, stationedSections
+from ..tools.plottingtool import getSaveFileName
+
+uiFilePath = os.path.abspath(os.path.join(os.path.dirname(__file__), "crosssections.ui"))
+FormClass = uic.loadUiType(uiFilePath)[0]
+
+
+class DlgCrossSections(QDialog, FormClass):
+    """Cross sections at a fixed station interval along the profile line.
+
+    The sections of the current profile line (drawn or selected feature)
+    are sampled on a raster of the profile table, shown one at a time with
+    the station slider (and on the map) and exported in bulk.
+    """
+
+    def __init__(self, iface, profiletoolcore, parent=None):
+        QDialog.__init__(self, parent)
+        self.setupUi(self)
+        self.iface = iface
+        self.profiletoolcore = profiletoolcore
+        self.sections = None
+        self.z = None  # station x offset values of the sections
+
+        mdl = profiletoolcore.dockwidget.mdl
+        for i in range(mdl.rowCount()):
+            layer = mdl.item(i, 5).data(Qt.ItemDataRole.EditRole)
+            if layer.type() == QgsMapLayer.RasterLayer:
+                band = mdl.item(i, 3).data(Qt.ItemDataRole.EditRole)
+                self.layerComboBox.addItem("%s#%d" % (layer.name(), band), (layer, band))
+        if self.layerComboBox.count():
+            self.offsetStepSpinBox.setValue(self._mapPixelSize(self.layerComboBox.itemData(0)[0]))
+
+        self.plotWdg = pg.PlotWidget()
+        self.plotWdg.showGrid(True, True, 0.5)
+        self.plotWdg.setLabel("bottom", self.tr("Offset"))
+        self.frame_for_plot.layout().addWidget(self.plotWdg)
+        self.curve = self.plotWdg.plot(pen=pg.mkPen("b", width=2))
+
+        # the section shown, on the map
+        self.rubberband = QgsRubberBand(iface.mapCanvas(), QgsWkbTypes.GeometryType.LineGeometry)
+        self.rubberband.setWidth(2)
+        self.rubberband.setColor(QColor(Qt.GlobalColor.blue))
+
+        self.generateButton.clicked.connect(self.generate)
+        self.stationSlider.valueChanged.connect(self.showStation)
+        self.exportButton.clicked.connect(self.export)
+        self.closeButton.clicked.connect(self.close)
+        self.finished.connect(
+            lambda result: self.rubberband.reset(QgsWkbTypes.GeometryType.LineGeometry)
+        )
+
+    def _mapPixelSize(self, layer):
+        """Return the pixel size of a raster layer in map units, the offsets
+        of the sections are in map units."""
+        pixel = min(layer.rasterUnitsPerPixelX(), layer.rasterUnitsPerPixelY())
+        center = layer.extent().center()
+        extent = QgsRectangle(center.x(), center.y(), center.x() + pixel, center.y() + pixel)
+        mapExtent = self.iface.mapCanvas().mapSettings().layerExtentToOutputExtent(layer, extent)
+        return min(mapExtent.width(), mapExtent.height()) or pixel
+
+    def generate(self):
+        points = self.profiletoolcore.pointstoDraw
+        if self.layerComboBox.currentIndex() < 0 or not points or len(points) < 2:
+            QMessageBox.warning(
+                self,
+                "Profile tool",
+                self.tr("Draw or select a profile line and add a raster first"),
+            )
+            return
+        layer, band = self.layerComboBox.currentData()
+        try:
+            self.sections = stationedSections(
+                points,
+                self.spacingSpinBox.value(),
+                self.widthSpinBox.value(),
+                self.offsetStepSpinBox.value(),
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "Profile tool", str(e))
+            return
+        self.z = sampleSections(
+            self.iface, self.profiletoolcore.toolrenderer.tool, self.sections, layer, band
+        )
+        self.iface.mainWindow().statusBar().showMessage("")
+        self.plotWdg.setLabel("left", "%s#%d" % (layer.name(), band))
+        self.stationSlider.setEnabled(True)
+        self.exportButton.setEnabled(True)
+        self.stationSlider.setRange(0, len(self.sections["stations"]) - 1)
+        self.stationSlider.setValue(0)
+        self.showStation(0)
+        self.plotWdg.getViewBox().autoRange()
+
+    def showStation(self, index):
+        if self.sections is None:
+            return
+        stations = self.sections["stations"]
+        self.stationLabel.setText(
+            self.tr("Station %.2f (%d/%d)") % (stations[index], index + 1, len(stations))
+        )
+        self.curve.setData(self.sections["offsets"], self.z[index], connect="finite")
+        self.rubberband.reset(QgsWkbTypes.GeometryType.LineGeometry)
+        for i in (0, -1):
+            self.rubberband.addPoint(
+                QgsPointXY(self.sections["x"][index, i], self.sections["y"][index, i])
+            )
+
+    def export(self):
+        fileName = getSaveFileName(
+            parent=self,
+            caption="Save As",
+            directory=os.path.join(self.profiletoolcore.loaddirectory or "", "sections.csv"),
+            filter="CSV (*.csv);;TSV (*.tsv *.txt)",
+        )
+        if fileName:
+            self.profiletoolcore.loaddirectory = os.path.dirname(fileName)
+            QSettings().setValue("profiletool/lastdirectory", self.profiletoolcore.loaddirectory)
+            saveSections(self.sections, self.z, fileName)
@@ -26,20 +26,25 @@
 import os
 from contextlib import suppress
 
+import numpy as np
 from qgis.core import (
+    Qgis,
     QgsFeature,
     QgsField,
+    QgsFields,
     QgsGeometry,
     QgsMapLayer,
     QgsPointXY,
     QgsProject,
+    QgsVectorFileWriter,
     QgsVectorLayer,
+    QgsWkbTypes,
 )
 
 # from qgis.gui import *
 # from qgis.PyQt import QtCore, QtGui, uic
 from qgis.PyQt import uic
-from qgis.PyQt.QtCore import QModelIndex, Qt, QVariant, pyqtSignal
+from qgis.PyQt.QtCore import QSettings, Qt, QVariant, pyqtSignal
 from qgis.PyQt.QtGui import QStandardItemModel
 from qgis.PyQt.QtWidgets import (
     QApplication,
@@ -53,21 +58,19 @@ from qgis.PyQt.QtWidgets import (
 )
 
 # plugin import
-from ..tools.plottingtool import PlottingTool
+from ..tools.plottingtool import PlottingTool, getSaveFileName
+from ..tools.plottingtool import has_mpl as matplotlib_loaded
+from ..tools.profileexport import profileToText, saveProfile
+from ..tools.profiletablemodel import ProfileTableModel
 from ..tools.tableviewtool import TableViewTool
-
-try:
-    import matplotlib  # noqa:F401
-    from matplotlib import *  # noqa:F403,F401
-
-    matplotlib_loaded = True
-except ImportError:
-    matplotlib_loaded = False
-
+from .dlgcrosssections import DlgCrossSections
 
 uiFilePath = os.path.abspath(os.path.join(os.path.dirname(__file__), "profiletool.ui"))
 FormClass = uic.loadUiType(uiFilePath)[0]
 
+# resolution modes of the items of resolutionComboBox
+RESOLUTION_MODES = ("limited", "full", "adaptive")
+
 
 class PTDockWidget(QDockWidget, FormClass):
 
@@ -117,6 +120,11 @@ class PTDockWidget(QDockWidget, FormClass):
         self.selectionmethod = 0
         self.plotlibrary = None  # The plotting library to use
         self.showcursor = True
+        # coordinate tab widgets, rebuilt only when the tab is visible
+        self.coordGroupBoxes = []
+        self.coordTableViews = []
+        self.coordinateTabDirty = True
+        self.crossSectionsDialog = None
 
         # Signals
         self.butSaveAs.clicked.connect(self.saveAs)
@@ -130,10 +138,15 @@ class PTDockWidget(QDockWidget, FormClass):
         self.pushButton_reinitview.clicked.connect(self.reScalePlot)
         self.checkBox_showcursor.stateChanged.connect(self.showCursor)
         self.cbLiveUpdate.stateChanged.connect(self.liveUpdateChanged)
-        self.fullResolutionCheckBox.stateChanged.connect(self.refreshPlot)
+        self.resolutionComboBox.currentIndexChanged.connect(self._onResolutionChanged)
+        self.adaptiveToleranceSpinBox.valueChanged.connect(self._onAdaptiveToleranceChanged)
+        self.swathCheckBox.stateChanged.connect(self.refreshPlot)
+        self.swathWidthSpinBox.valueChanged.connect(self._onSwathWidthChanged)
         self.profileInterpolationCheckBox.stateChanged.connect(self.refreshPlot)
 
+        self.crossSectionsButton.clicked.connect(self.showCrossSections)
         self.cbSameAxisScale.stateChanged.connect(self._onSameAxisScaleStateChanged)
+        self.tabWidget.currentChanged.connect(self._onTabChanged)
 
     # ********************************************************************************
     # init things ****************************************************************
@@ -336,6 +349,28 @@ class PTDockWidget(QDockWidget, FormClass):
         #
         self.profiletoolcore.updateProfil(self.profiletoolcore.pointstoDraw, False, True)
 
+    def showCrossSections(self):
+        self.crossSectionsDialog = DlgCrossSections(self.iface, self.profiletoolcore, self)
+        self.crossSectionsDialog.show()
+
+    def resolutionMode(self):
+        """The resolution mode of the raster profiles, see DataReaderTool."""
+        if not self.profileInterpolationCheckBox.isChecked():
+            return "samples"
+        return RESOLUTION_MODES[self.resolutionComboBox.currentIndex()]
+
+    def _onResolutionChanged(self, index):
+        self.adaptiveToleranceSpinBox.setEnabled(RESOLUTION_MODES[index] == "adaptive")
+        self.refreshPlot()
+
+    def _onAdaptiveToleranceChanged(self, value):
+        if self.resolutionMode() == "adaptive":
+            self.refreshPlot()
+
+    def _onSwathWidthChanged(self, value):
+        if self.swathCheckBox.isChecked():
+            self.refreshPlot()
+
     def _onClick(self, index1):  # action when clicking the tableview
         self.tableViewTool.onClick(self.iface, self, self.mdl, self.plotlibrary, index1)
 
@@ -371,185 +406,235 @@ class PTDockWidget(QDockWidget, FormClass):
             groupTitle += "_band_{}".format(band)
         return groupTitle.replace(" ", "_")
 
-    def updateCoordinateTab(self):
+    def invalidateCoordinateTab(self):
+        """Marks the coordinate tab as outdated.
 
-        try:  # Reinitializing the table tab
-            self.VLayout = self.scrollAreaWidgetContents.layout()
-            while 1:
-                child = self.VLayout.takeAt(0)
-                if not child:
-                    break
-                child.widget().deleteLater()
-        except Exception:
+        The tab is only rebuilt when it is visible, either now or when the
+        user switches to it.
+        """
+        self.coordinateTabDirty = True
+        if self.tabWidget.currentWidget() is self.tab_2:
+            self.updateCoordinateTab()
+
+    def _onTabChanged(self, index):
+        if self.tabWidget.widget(index) is self.tab_2 and self.coordinateTabDirty:
+            self.updateCoordinateTab()
+
+    def updateCoordinateTab(self):
+        self.coordinateTabDirty = False
+        if self.scrollAreaWidgetContents.layout() is None:
             self.VLayout = QVBoxLayout(self.scrollAreaWidgetContents)
             self.VLayout.setContentsMargins(9, -1, -1, -1)
-        # Setup the table tab
-        self.groupBox = []
-        self.profilePushButton = []
-        self.coordsPushButton = []
-        self.tolayerPushButton = []
-        self.tableView = []
-        self.verticalLayout = []
-        if self.mdl.rowCount() != self.profiletoolcore.profiles:
+        else:
+            self.VLayout = self.scrollAreaWidgetContents.layout()
+
+        profiles = self.profiletoolcore.profiles
+        if profiles is None or len(profiles) != self.mdl.rowCount():
             # keep the number of profiles and the model in sync.
             self.profiletoolcore.updateProfil(self.profiletoolcore.pointstoDraw, False, False)
-        for i in range(0, self.mdl.rowCount()):
-            self.groupBox.append(QGroupBox(self.scrollAreaWidgetContents))
-            sizePolicy = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-            self.groupBox[i].setSizePolicy(sizePolicy)
-            profileTitle = self._profile_name(self.profiletoolcore.profiles[i])
-
-            self.groupBox[i].setTitle(
-                QApplication.translate("GroupBox" + str(i), profileTitle, None)
+            profiles = self.profiletoolcore.profiles
+
+        # Group boxes are reused between updates, only the surplus is removed
+        while len(self.coordGroupBoxes) > len(profiles):
+            self.coordGroupBoxes.pop().deleteLater()
+            self.coordTableViews.pop()
+        for i in range(len(self.coordGroupBoxes), len(profiles)):
+            self._addCoordinateGroupBox(i)
+
+        for i, profile in enumerate(profiles):
+            self.coordGroupBoxes[i].setTitle(
+                QApplication.translate("GroupBox" + str(i), self._profile_name(profile), None)
             )
-            self.groupBox[i].setObjectName("groupBox" + str(i))
-
-            self.verticalLayout.append(QVBoxLayout(self.groupBox[i]))
-            self.verticalLayout[i].setObjectName("verticalLayout")
-            # The table
-            self.tableView.append(QTableView(self.groupBox[i]))
-            sizePolicy = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-            self.tableView[i].setSizePolicy(sizePolicy)
-            self.tableView[i].setObjectName("tableView" + str(i))
-            # font = QFont("Arial", 8)
-            column = len(self.profiletoolcore.profiles[i]["l"])
-            self.mdl2 = QStandardItemModel(2, column)
-            for j in range(len(self.profiletoolcore.profiles[i]["l"])):
-                self.mdl2.setData(
-                    self.mdl2.index(0, j, QModelIndex()), self.profiletoolcore.profiles[i]["l"][j]
-                )
-                # self.mdl2.setData(self.mdl2.index(0, j, QModelIndex())  ,font ,QtCore.Qt.FontRole)
-                self.mdl2.setData(
-                    self.mdl2.index(1, j, QModelIndex()), self.profiletoolcore.profiles[i]["z"][j]
-                )
-                # self.mdl2.setData(self.mdl2.index(1, j, QModelIndex())  ,font ,QtCore.Qt.FontRole)
-            self.tableView[i].verticalHeader().setDefaultSectionSize(18)
-            self.tableView[i].horizontalHeader().setDefaultSectionSize(60)
-            self.tableView[i].setModel(self.mdl2)
-            # 2 * header (1 header + 1 horz slider) + nrows + a small margin
-            minTableHeight = (
-                2 * self.tableView[i].horizontalHeader().height()
-                + sum(
-                    self.tableView[i].rowHeight(j)
-                    for j in range(self.tableView[i].model().rowCount())
+            oldModel = self.coordTableViews[i].model()
+            self.coordTableViews[i].setModel(
+                ProfileTableModel(
+                    profile,
+                    coordDecimals=self._coordDecimals(profile),
+                    parent=self.coordTableViews[i],
                 )
-                + 6
-            )  # extra safety margin
-            self.tableView[i].setMinimumHeight(minTableHeight)
-
-            self.verticalLayout[i].addWidget(self.tableView[i])
-
-            self.horizontalLayout = QHBoxLayout()
-
-            # the copy to clipboard button
-            self.profilePushButton.append(QPushButton(self.groupBox[i]))
-            sizePolicy = QSizePolicy(
-                QSizePolicy.Policy.Expanding, QSizePolicy.Policy.MinimumExpanding
-            )
-            self.profilePushButton[i].setSizePolicy(sizePolicy)
-            self.profilePushButton[i].setText(
-                QApplication.translate("GroupBox", "Copy to clipboard", None)
-            )
-            self.profilePushButton[i].setObjectName(str(i))
-            self.horizontalLayout.addWidget(self.profilePushButton[i])
-
-            # button to copy to clipboard with coordinates
-            self.coordsPushButton.append(QPushButton(self.groupBox[i]))
-            sizePolicy = QSizePolicy(
-                QSizePolicy.Policy.Expanding, QSizePolicy.Policy.MinimumExpanding
             )
-            self.coordsPushButton[i].setSizePolicy(sizePolicy)
-            self.coordsPushButton[i].setText(
-                QApplication.translate("GroupBox", "Copy to clipboard (with coordinates)", None)
-            )
-
-            # button to copy to clipboard with coordinates
-            self.tolayerPushButton.append(QPushButton(self.groupBox[i]))
-            sizePolicy = QSizePolicy(
-                QSizePolicy.Policy.Expanding, QSizePolicy.Policy.MinimumExpanding
-            )
-            self.tolayerPushButton[i].setSizePolicy(sizePolicy)
-            self.tolayerPushButton[i].setText(
-                QApplication.translate("GroupBox", "Create Temporary layer", None)
-            )
-
-            self.coordsPushButton[i].setObjectName(str(i))
-            self.horizontalLayout.addWidget(self.coordsPushButton[i])
-
-            self.tolayerPushButton[i].setObjectName(str(i))
-            self.horizontalLayout.addWidget(self.tolayerPushButton[i])
+            if oldModel is not None:
+                oldModel.deleteLater()
+
+    def _addCoordinateGroupBox(self, i):
+        groupBox = QGroupBox(self.scrollAreaWidgetContents)
+        sizePolicy = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        groupBox.setSizePolicy(sizePolicy)
+        groupBox.setObjectName("groupBox" + str(i))
+
+        verticalLayout = QVBoxLayout(groupBox)
+        verticalLayout.setObjectName("verticalLayout")
+        # The table
+        tableView = QTableView(groupBox)
+        sizePolicy = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        tableView.setSizePolicy(sizePolicy)
+        tableView.setObjectName("tableView" + str(i))
+        tableView.verticalHeader().setDefaultSectionSize(18)
+        tableView.horizontalHeader().setStretchLastSection(True)
+        # header + a few rows + a small margin
+        minTableHeight = (
+            tableView.horizontalHeader().height()
+            + 8 * tableView.verticalHeader().defaultSectionSize()
+            + 6
+        )  # extra safety margin
+        tableView.setMinimumHeight(minTableHeight)
+        verticalLayout.addWidget(tableView)
+
+        horizontalLayout = QHBoxLayout()
+        sizePolicy = QSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.MinimumExpanding)
+        for text, slot in (
+            ("Copy to clipboard", self.copyTable),
+            ("Copy to clipboard (with coordinates)", self.copyTableAndCoords),
+            ("Create Temporary layer", self.createTemporaryLayer),
+            ("Save to file", self.saveTable),
+            ("Save as layer", self.saveLayer),
+        ):
+            button = QPushButton(groupBox)
+            button.setSizePolicy(sizePolicy)
+            button.setText(QApplication.translate("GroupBox", text, None))
+            # the button's name is the index of its profile
+            button.setObjectName(str(i))
+            button.clicked.connect(slot)
+            horizontalLayout.addWidget(button)
 
-            self.horizontalLayout.addStretch(0)
-            self.verticalLayout[i].addLayout(self.horizontalLayout)
+        horizontalLayout.addStretch(0)
+        verticalLayout.addLayout(horizontalLayout)
 
-            self.VLayout.addWidget(self.groupBox[i])
+        self.VLayout.addWidget(groupBox)
+        self.coordGroupBoxes.append(groupBox)
+        self.coordTableViews.append(tableView)
 
-            self.profilePushButton[i].clicked.connect(self.copyTable)
-            self.coordsPushButton[i].clicked.connect(self.copyTableAndCoords)
-            self.tolayerPushButton[i].clicked.connect(self.createTemporaryLayer)
+    def _coordDecimals(self, profile):
+        return 8 if profile["layer"].crs().isGeographic() else 3
 
     def copyTable(self):  # Writing the table to clipboard in excel form
         nr = int(self.sender().objectName())
+        profile = self.profiletoolcore.profiles[nr]
         self.clipboard = QApplication.clipboard()
-        text = ""
-        for i in range(len(self.profiletoolcore.profiles[nr]["l"])):
-            text += (
-                str(self.profiletoolcore.profiles[nr]["l"][i])
-                + "\t"
-                + str(self.profiletoolcore.profiles[nr]["z"][i])
-                + "\n"
-            )
-        self.clipboard.setText(text)
+        self.clipboard.setText(profileToText(profile, ("l", "z")))
 
     def copyTableAndCoords(self):  # Writing the table with coordinates to clipboard in excel form
         nr = int(self.sender().objectName())
+        profile = self.profiletoolcore.profiles[nr]
         self.clipboard = QApplication.clipboard()
-        text = ""
-        for i in range(len(self.profiletoolcore.profiles[nr]["l"])):
-            text += (
-                str(self.profiletoolcore.profiles[nr]["l"][i])
-                + "\t"
-                + str(self.profiletoolcore.profiles[nr]["x"][i])
-                + "\t"
-                + str(self.profiletoolcore.profiles[nr]["y"][i])
-                + "\t"
-                + str(self.profiletoolcore.profiles[nr]["z"][i])
-                + "\n"
-            )
-        self.clipboard.setText(text)
+        self.clipboard.setText(profileToText(profile, ("l", "x", "y", "z")))
+
+    def saveTable(self):  # Writing the table with coordinates to a csv/tsv file
+        nr = int(self.sender().objectName())
+        profile = self.profiletoolcore.profiles[nr]
+        fileName = getSaveFileName(
+            parent=self.iface.mainWindow(),
+            caption="Save As",
+            directory=os.path.join(
+                self.profiletoolcore.loaddirectory or "", self._profile_name(profile) + ".csv"
+            ),
+            filter="CSV (*.csv);;TSV (*.tsv *.txt)",
+        )
+        if fileName:
+            self.profiletoolcore.loaddirectory = os.path.dirname(fileName)
+            QSettings().setValue("profiletool/lastdirectory", self.profiletoolcore.loaddirectory)
+            saveProfile(profile, fileName)
 
     def createTemporaryLayer(self):
         nr = int(self.sender().objectName())
-        type = "Point?crs=" + str(self.profiletoolcore.profiles[nr]["layer"].crs().authid())
-        name = "ProfileTool_{}".format(self._profile_name(self.profiletoolcore.profiles[nr]))
-        vl = QgsVectorLayer(type, name, "memory")
-        pr = vl.dataProvider()
-        vl.startEditing()
-        # add fields
-        pr.addAttributes([QgsField("Value", QVariant.Double)])
-        vl.updateFields()
-        # Add features to layer
-        for i in range(len(self.profiletoolcore.profiles[nr]["l"])):
-            fet = QgsFeature(vl.fields())
-            # set geometry
-            fet.setGeometry(
-                QgsGeometry.fromPointXY(
-                    QgsPointXY(
-                        self.profiletoolcore.profiles[nr]["x"][i],
-                        self.profiletoolcore.profiles[nr]["y"][i],
-                    )
+        self._createProfileLayer(nr)
+
+    def saveLayer(self):  # Writing the profile points to a GeoPackage/FlatGeobuf file
+        nr = int(self.sender().objectName())
+        profile = self.profiletoolcore.profiles[nr]
+        fileName = getSaveFileName(
+            parent=self.iface.mainWindow(),
+            caption="Save As",
+            directory=os.path.join(
+                self.profiletoolcore.loaddirectory or "", self._profile_name(profile) + ".gpkg"
+            ),
+            filter="GeoPackage (*.gpkg);;FlatGeobuf (*.fgb)",
+        )
+        if fileName:
+            self.profiletoolcore.loaddirectory = os.path.dirname(fileName)
+            QSettings().setValue("profiletool/lastdirectory", self.profiletoolcore.loaddirectory)
+            self._createProfileLayer(nr, fileName)
+
+    def _profileLayerAttributes(self, nr):
+        """Returns the fields and the attribute rows of the point layer of profile nr.
+
+        Besides the chainage and the profile's own value, the values of all
+        other profiled layers are interpolated at the profile's chainage.
+        """
+        profiles = self.profiletoolcore.profiles
+        l = np.asarray(profiles[nr]["l"], dtype=float)
+        fields = QgsFields()
+        fields.append(QgsField("Distance", QVariant.Double))
+        fields.append(QgsField("Value", QVariant.Double))
+        columns = [l, np.asarray(profiles[nr]["z"], dtype=float)]
+        for i, profile in enumerate(profiles):
+            if i == nr:
+                continue
+            name = self._profile_name(profile)
+            if fields.lookupField(name) != -1:
+                name += "_{}".format(i)
+            fields.append(QgsField(name, QVariant.Double))
+            other_l = np.asarray(profile["l"], dtype=float)
+            if len(other_l):
+                columns.append(
+                    np.interp(l, other_l, np.asarray(profile["z"], dtype=float), np.nan, np.nan)
                 )
+            else:
+                columns.append(np.full(len(l), np.nan))
+        values = np.column_stack(columns)
+        # NaN are written as NULL
+        rows = np.where(np.isnan(values), None, values).tolist()
+        return fields, rows
+
+    def _createProfileLayer(self, nr, fileName=None):
+        """Creates a point layer from profile nr and adds it to the project.
+
+        The layer is a memory layer, or a GeoPackage/FlatGeobuf layer written
+        to fileName. All features are built first and added in one batch.
+        """
+        profile = self.profiletoolcore.profiles[nr]
+        crs = profile["layer"].crs()
+        name = "ProfileTool_{}".format(self._profile_name(profile))
+        fields, rows = self._profileLayerAttributes(nr)
+
+        features = []
+        for x, y, attributes in zip(profile["x"], profile["y"], rows):
+            fet = QgsFeature(fields)
+            fet.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(float(x), float(y))))
+            fet.setAttributes(attributes)
+            features.append(fet)
+
+        if fileName is None:
+            vl = QgsVectorLayer("Point?crs=" + str(crs.authid()), name, "memory")
+            pr = vl.dataProvider()
+            pr.addAttributes(fields.toList())
+            vl.updateFields()
+            pr.addFeatures(features)
+            vl.updateExtents()
+        else:
+            options = QgsVectorFileWriter.SaveVectorOptions()
+            if fileName.lower().endswith(".fgb"):
+                options.driverName = "FlatGeobuf"
+            else:
+                options.driverName = "GPKG"
+                options.layerName = name
+            writer = QgsVectorFileWriter.create(
+                fileName,
+                fields,
+                QgsWkbTypes.Type.Point,
+                crs,
+                QgsProject.instance().transformContext(),
+                options,
             )
-            # set attributes
-            fet.setAttributes([self.profiletoolcore.profiles[nr]["z"][i]])
-            pr.addFeatures([fet])
-        vl.commitChanges()
-        # labeling/enabled
-        if False:
-            labelsettings = vl.labeling().settings()
-            labelsettings.enabled = True
-
-        # vl.setCustomProperty("labeling/enabled", "true")
+            if writer.hasError() != QgsVectorFileWriter.WriterError.NoError:
+                self.iface.messageBar().pushMessage(
+                    "Profile Tool", writer.errorMessage(), level=Qgis.Warning
+                )
+                return
+            writer.addFeatures(features)
+            del writer  # flush and close the file
+            vl = QgsVectorLayer(fileName, name, "ogr")
+
         # show layer
         QgsProject.instance().addMapLayer(vl)
 